@@ -0,0 +1,163 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Weight of the latest request in the moving average of service time
+SERVICE_TIME_WEIGHT = 0.1
+
+class AdmissionController:
+    """Caps concurrent predictions and sheds what cannot be served in time.
+
+    Up to max_in_flight requests are scored at once.  Up to max_queue
+    more wait for a slot, each for at most queue_timeout seconds; any
+    request beyond that, or still waiting at its deadline, is rejected
+    straight away so the caller can retry instead of piling on latency.
+    A waiting request holds a server thread, so max_in_flight + max_queue
+    should stay below the thread count to leave threads for /health.
+    """
+    def __init__(self, max_in_flight, max_queue, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = {'queue_full': 0, 'timeout': 0}
+        self.queue_wait_ms = 0.0
+        self.service_seconds = None
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Wait for a slot; returns (admitted, reason) where reason says why not"""
+        with self._condition:
+            if self.in_flight < self.max_in_flight and not self.waiting:
+                self.in_flight += 1
+                self.admitted += 1
+                return True, None
+            if self.waiting >= self.max_queue:
+                self.shed['queue_full'] += 1
+                return False, 'queue_full'
+
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed['timeout'] += 1
+                        # A release may have woken us at the deadline; pass it on
+                        if self.in_flight < self.max_in_flight:
+                            self._condition.notify()
+                        return False, 'timeout'
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            self.queued += 1
+            self.queue_wait_ms += 1000 * (time.monotonic() - start)
+            return True, None
+
+    def release(self, service_seconds=None):
+        with self._condition:
+            self.in_flight -= 1
+            if service_seconds is not None:
+                if self.service_seconds is None:
+                    self.service_seconds = service_seconds
+                else:
+                    self.service_seconds += SERVICE_TIME_WEIGHT * (service_seconds - self.service_seconds)
+            self._condition.notify()
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained (at least 1)"""
+        with self._condition:
+            backlog = self.in_flight + self.waiting
+            service = self.service_seconds or 0.0
+        return max(1, math.ceil(service * backlog / max(1, self.max_in_flight)))
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'queue_timeout_ms': 1000 * self.queue_timeout,
+                'in_flight': self.in_flight,
+                'queue_depth': self.waiting,
+                'peak_queue_depth': self.peak_waiting,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'mean_queue_wait_ms': self.queue_wait_ms / self.queued if self.queued else None,
+                'shed': dict(self.shed),
+                'shed_total': sum(self.shed.values()),
+                'mean_service_ms': 1000 * self.service_seconds if self.service_seconds is not None else None
+            }
+
+def limits(config):
+    """(max_in_flight, max_queue, queue_timeout) from the serving config.
+
+    By default half the server threads score (or as many as the scoring
+    pool has processes) and the queue takes the rest but one, so /health
+    always has a thread to run on.
+    """
+    threads = max(1, config['threads'])
+    max_in_flight = config.get('max_in_flight') or config['scoring_processes'] or max(1, threads // 2)
+    max_queue = config.get('max_queue')
+    if max_queue is None:
+        max_queue = max(0, threads - max_in_flight - 1)
+    return max_in_flight, max_queue, config['queue_timeout']
+
+def install(app, endpoints, config=None):
+    """Admit requests to the given Flask endpoints through an AdmissionController.
+
+    Every other route, /health included, bypasses the queue.
+    """
+    from flask import g, jsonify, request
+
+    import serving
+
+    controller = AdmissionController(*limits(config or serving.load_config()))
+    endpoints = set(endpoints)
+
+    @app.before_request
+    def admit():
+        if request.endpoint not in endpoints:
+            return None
+        admitted, reason = controller.acquire()
+        if not admitted:
+            response = jsonify({
+                'error': 'Server is overloaded, please retry',
+                'reason': reason,
+                'timestamp': datetime.now().isoformat()
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = str(controller.retry_after())
+            return response
+        g.admission_start = time.perf_counter()
+        return None
+
+    @app.teardown_request
+    def finish(exception=None):
+        start = g.pop('admission_start', None)
+        if start is not None:
+            controller.release(time.perf_counter() - start)
+
+    @app.route('/admin/admission', methods=['GET'])
+    def admission_stats():
+        """In-flight predictions, queue depth and shed counts for this process"""
+        # In production, you might want to secure this endpoint
+        return jsonify({
+            **controller.stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+
+    logger.info(f"Admission control: {controller.max_in_flight} in flight, "
+                f"{controller.max_queue} queued for up to {1000 * controller.queue_timeout:.0f} ms")
+    return controller
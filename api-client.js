@@ -6,6 +6,28 @@ class HeartTreatmentAPI {
     this.baseUrl = baseUrl
   }
 
+  /**
+   * Fetch exported parameters through the API's /artifacts route: the
+   * manifest gives a versioned URL the browser caches for good, so repeat
+   * loads download nothing and first loads get the gzipped file.  Falls
+   * back to the static file next to the page.
+   */
+  async fetchParameters(name) {
+    try {
+      const manifest = await (await fetch(`${this.baseUrl}/artifacts`)).json()
+      const entry = manifest.artifacts[name]
+      if (entry) {
+        const response = await fetch(`${this.baseUrl}${entry.url}`)
+        if (response.ok) {
+          return response
+        }
+      }
+    } catch (error) {
+      console.warn("Artifact API unavailable, loading the static file:", error)
+    }
+    return fetch(name)
+  }
+
   async healthCheck() {
     try {
       const response = await fetch(`${this.baseUrl}/health`)
@@ -16,7 +38,7 @@ class HeartTreatmentAPI {
     }
   }
 
-  async predictTreatment(patientData) {
+  async predictTreatment(patientData, retries = 2) {
     try {
       const response = await fetch(`${this.baseUrl}/predict`, {
         method: "POST",
@@ -26,6 +48,13 @@ class HeartTreatmentAPI {
         body: JSON.stringify(patientData),
       })
 
+      // Overloaded server: wait as long as it asks, then try again
+      if (response.status === 503 && retries > 0) {
+        const seconds = Number(response.headers.get("Retry-After")) || 1
+        await new Promise((resolve) => setTimeout(resolve, seconds * 1000))
+        return this.predictTreatment(patientData, retries - 1)
+      }
+
       if (!response.ok) {
         const errorData = await response.json()
         throw new Error(errorData.error || "Prediction failed")
@@ -38,6 +67,33 @@ class HeartTreatmentAPI {
     }
   }
 
+  // Scores a patient stored on the server (see savePatients) from the ID alone
+  async predictById(patientId) {
+    return this.predictTreatment({ patient_id: patientId })
+  }
+
+  async savePatients(patients) {
+    try {
+      const response = await fetch(`${this.baseUrl}/patients`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ patients }),
+      })
+
+      if (!response.ok) {
+        const errorData = await response.json()
+        throw new Error(errorData.error || "Saving patients failed")
+      }
+
+      return await response.json()
+    } catch (error) {
+      console.error("Saving patients failed:", error)
+      throw error
+    }
+  }
+
   async getModelInfo() {
     try {
       const response = await fetch(`${this.baseUrl}/model-info`)
@@ -1,15 +1,22 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.svm import SVC
 import joblib
 import os
+import time
+import threading
 from datetime import datetime
 import logging
+from serving import scoring_pool
+import model_store
+from audit_log import AuditLog
+from patient_schema import PatientSchema, SchemaError
+import profiling
+from fast_json import json_response
+from evaluate_models import load_evaluation
+import warmup
+import admission
+import memory_stats
+import artifacts
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,20 +25,59 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
+# Opt-in request profiling (HEART_PROFILING=1), no hooks otherwise
+profiling.install(app)
+
+MODEL_VERSION = '1.0'
+
+# Every /predict input and output, written in the background
+audit_log = AuditLog()
+
+# Bounded concurrency and fast 503s for /predict; /health is never queued
+admission.install(app, ['predict_treatment'])
+
+# Warm-up state behind /readyz (see warmup.py)
+readiness = warmup.Readiness()
+
+# How often scoring checks the model files for updates
+RELOAD_CHECK_SECONDS = 5.0
+
+def models_mtime(models_dir='models'):
+    """Latest modification time of the served model files"""
+    files = ['scaler.pkl', 'aspirin_model.pkl', 'heparin_model.pkl', model_store.BUNDLE_FILE, model_store.JOINT_FILE]
+    paths = [os.path.join(models_dir, name) for name in files]
+    return max((os.path.getmtime(path) for path in paths if os.path.exists(path)), default=None)
+
 class HeartTreatmentPredictor:
     def __init__(self):
         self.scaler = None
         self.aspirin_model = None
         self.heparin_model = None
+        # Optional JointRBFSVM scoring both targets from one kernel evaluation
+        self.joint_model = None
+        self.memory = None
         self.feature_columns = [
             'age', 'anaemia', 'creatinine_phosphokinase', 'diabetes',
             'ejection_fraction', 'high_blood_pressure', 'platelets',
             'serum_creatinine', 'serum_sodium', 'sex', 'smoking', 'time'
         ]
+        self.schema = PatientSchema(self.feature_columns)
         self.is_trained = False
+        self.models_mtime = None
+        self._last_reload_check = 0.0
+        # The served models are swapped under _swap_lock; _reloading is
+        # held while a background reload is running
+        self._swap_lock = threading.Lock()
+        self._reloading = threading.Lock()
         
     def load_data_and_train(self, csv_path):
         """Load data and train models"""
+        # Training-only dependencies, kept out of the serving import path
+        import pandas as pd
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.svm import SVC
+        
         try:
             # Load the dataset
             df = pd.read_csv(csv_path)
@@ -43,7 +89,6 @@ class HeartTreatmentPredictor:
             y_heparin = df["heparin"]
             
             # Split data
-            from sklearn.model_selection import train_test_split
             X_train, X_test, y_aspirin_train, y_aspirin_test, y_heparin_train, y_heparin_test = train_test_split(
                 X, y_aspirin, y_heparin, test_size=0.2, random_state=42
             )
@@ -72,6 +117,8 @@ class HeartTreatmentPredictor:
             
             # Save models
             self.save_models()
+            self.measure_memory()
+            self.warm_up()
             
             return {
                 'aspirin_accuracy': aspirin_accuracy,
@@ -90,6 +137,14 @@ class HeartTreatmentPredictor:
             joblib.dump(self.scaler, 'models/scaler.pkl')
             joblib.dump(self.aspirin_model, 'models/aspirin_model.pkl')
             joblib.dump(self.heparin_model, 'models/heparin_model.pkl')
+            # Keep an existing joint model and shared bundle in sync with the new pickles
+            if os.path.exists(model_store.joint_path('models')):
+                _, self.joint_model = model_store.build_joint('models')
+            if os.path.exists(model_store.bundle_path('models')):
+                model_store.build_bundle('models')
+            # Scoring processes and other workers reload when they see the
+            # new files; this process already has the models
+            self.models_mtime = models_mtime('models')
             logger.info("Models saved successfully")
         except Exception as e:
             logger.error(f"Error saving models: {str(e)}")
@@ -97,34 +152,113 @@ class HeartTreatmentPredictor:
     def load_models(self):
         """Load pre-trained models"""
         try:
-            self.scaler = joblib.load('models/scaler.pkl')
-            self.aspirin_model = joblib.load('models/aspirin_model.pkl')
-            self.heparin_model = joblib.load('models/heparin_model.pkl')
-            self.is_trained = True
-            logger.info("Models loaded successfully")
+            mtime = models_mtime('models')
+            
+            # Prefer the shared memory-mapped bundle (see model_store.py)
+            bundle_file = model_store.bundle_path('models')
+            if os.path.exists(bundle_file):
+                bundle = model_store.load_bundle(bundle_file)
+                models = (bundle['scaler'], bundle['aspirin_model'], bundle['heparin_model'],
+                          bundle.get('joint_model'))
+                logger.info(f"Models mapped from {bundle_file}")
+            else:
+                joint_model = None
+                if os.path.exists(model_store.joint_path('models')):
+                    joint_model = joblib.load(model_store.joint_path('models'))
+                models = (joblib.load('models/scaler.pkl'), joblib.load('models/aspirin_model.pkl'),
+                          joblib.load('models/heparin_model.pkl'), joint_model)
+                logger.info("Models loaded successfully")
+            
+            with self._swap_lock:
+                self.scaler, self.aspirin_model, self.heparin_model, self.joint_model = models
+                self.models_mtime = mtime
+                self.is_trained = True
+            self.measure_memory()
+            self.warm_up()
             return True
         except Exception as e:
             logger.error(f"Error loading models: {str(e)}")
             return False
     
-    def predict(self, patient_data):
-        """Make predictions for a patient"""
+    def reload_if_changed(self):
+        """Reload in the background when the model files have changed.
+        
+        /train updates only the process that trained; the scoring pool's
+        processes and the other workers pick the new files up here, at
+        most RELOAD_CHECK_SECONDS later.
+        """
+        now = time.monotonic()
+        if now - self._last_reload_check < RELOAD_CHECK_SECONDS:
+            return
+        self._last_reload_check = now
+        mtime = models_mtime('models')
+        if (mtime is not None and mtime != self.models_mtime
+                and self._reloading.acquire(blocking=False)):
+            logger.info("Model files changed, reloading in the background")
+            threading.Thread(target=self._background_reload, name='model-reload', daemon=True).start()
+    
+    def _background_reload(self):
+        try:
+            self.load_models()
+        finally:
+            self._reloading.release()
+    
+    def measure_memory(self):
+        """Record the size of each loaded model (served on /admin/memory)"""
+        self.memory = memory_stats.model_sizes({
+            'scaler': self.scaler,
+            'aspirin_model': self.aspirin_model,
+            'heparin_model': self.heparin_model,
+            'joint_model': self.joint_model
+        })
+        memory_stats.log_model_sizes(self.memory)
+    
+    def warm_up(self, models_dir='models'):
+        """Score representative patients, one at a time as /predict does, before reporting ready"""
+        if warmup.WARMUP_ROWS <= 0:
+            readiness.skip()
+            return
+        X, source = warmup.warmup_features(self.feature_columns, models_dir)
+        name = 'joint' if self.joint_model is not None else 'svm'
+        readiness.run({name: lambda features: [self.predict(features[i:i + 1]) for i in range(len(features))]},
+                      X, source=source)
+    
+    def warm_up_worker(self):
+        """Warm up the loaded models again in a freshly forked worker.
+        
+        A worker forked from a preloaded master inherits the master's
+        ready state, but not its BLAS threads or touched model pages.
+        """
+        if not self.is_trained:
+            return
+        readiness.reset()
+        self.warm_up()
+    
+    def predict(self, features):
+        """Make predictions for a patient validated by self.schema"""
         if not self.is_trained:
             raise ValueError("Models not trained or loaded")
         
+        # The scaler and models of one load, even if a reload swaps them meanwhile
+        with self._swap_lock:
+            scaler, aspirin_model, heparin_model, joint_model = (
+                self.scaler, self.aspirin_model, self.heparin_model, self.joint_model)
+        
         try:
-            # Convert to DataFrame with correct column order
-            df = pd.DataFrame([patient_data], columns=self.feature_columns)
-            
             # Scale the features
-            patient_scaled = self.scaler.transform(df)
+            patient_scaled = scaler.transform(features)
             
             # Get predictions and probabilities
-            aspirin_prob = self.aspirin_model.predict_proba(patient_scaled)[0][1]
-            heparin_prob = self.heparin_model.predict_proba(patient_scaled)[0][1]
-            
-            aspirin_prediction = self.aspirin_model.predict(patient_scaled)[0]
-            heparin_prediction = self.heparin_model.predict(patient_scaled)[0]
+            if joint_model is not None:
+                scores = joint_model.predict_all(patient_scaled)
+                aspirin_prob, aspirin_prediction = scores['aspirin'][0][0], scores['aspirin'][1][0]
+                heparin_prob, heparin_prediction = scores['heparin'][0][0], scores['heparin'][1][0]
+            else:
+                aspirin_prob = aspirin_model.predict_proba(patient_scaled)[0][1]
+                heparin_prob = heparin_model.predict_proba(patient_scaled)[0][1]
+                
+                aspirin_prediction = aspirin_model.predict(patient_scaled)[0]
+                heparin_prediction = heparin_model.predict(patient_scaled)[0]
             
             return {
                 'aspirin': {
@@ -146,13 +280,29 @@ class HeartTreatmentPredictor:
 # Initialize predictor
 predictor = HeartTreatmentPredictor()
 
+def score_patient(features):
+    """Score one patient (module-level so the scoring pool can run it)"""
+    predictor.reload_if_changed()
+    return predictor.predict(features)
+
+# Model sizes and opt-in per-stage allocations (HEART_MEMORY_TRACKING=1)
+memory_stats.install(app, lambda: predictor.memory)
+
+# Exported model files for the browser, with ETags and gzip variants
+artifacts.install(app)
+
+# /livez and /readyz for orchestrators; /health stays as it was
+warmup.install(app, readiness, lambda: predictor.is_trained)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'models_loaded': predictor.is_trained
+        'models_loaded': predictor.is_trained,
+        'ready': predictor.is_trained and readiness.ready,
+        'warmup': readiness.stats()['last_warmup']
     })
 
 @app.route('/train', methods=['POST'])
@@ -165,11 +315,14 @@ def train_models():
         if not os.path.exists(csv_path):
             return jsonify({'error': 'CSV file not found'}), 400
         
-        results = predictor.load_data_and_train(csv_path)
+        # Peak allocations of loading, splitting, scaling and fitting
+        with memory_stats.measure_peak() as training_memory:
+            results = predictor.load_data_and_train(csv_path)
         
         return jsonify({
             'message': 'Models trained successfully',
             'results': results,
+            'training_memory': training_memory,
             'timestamp': datetime.now().isoformat()
         })
         
@@ -180,37 +333,51 @@ def train_models():
 def predict_treatment():
     """Predict treatment recommendations for a patient"""
     try:
+        start = time.perf_counter()
+        
         # Get patient data from request
         patient_data = request.json
         
-        # Validate required fields
-        required_fields = [
-            'age', 'anaemia', 'creatinine_phosphokinase', 'diabetes',
-            'ejection_fraction', 'high_blood_pressure', 'platelets',
-            'serum_creatinine', 'serum_sodium', 'sex', 'smoking', 'time'
-        ]
-        
-        missing_fields = [field for field in required_fields if field not in patient_data]
-        if missing_fields:
+        # Validate and coerce all 12 features in one step
+        try:
+            with memory_stats.tracker.stage('predict', 'validate'):
+                features = predictor.schema.coerce_one(patient_data)
+        except SchemaError as e:
             return jsonify({
-                'error': f'Missing required fields: {missing_fields}'
+                'error': str(e),
+                'errors': e.errors
             }), 400
         
-        # Extract patient data in correct order
-        patient_values = [patient_data[field] for field in required_fields]
+        validated = time.perf_counter()
         
         # Make prediction
-        predictions = predictor.predict(patient_values)
+        with memory_stats.tracker.stage('predict', 'score'):
+            predictions = scoring_pool.run(score_patient, features)
+        scored = time.perf_counter()
         
         # Add metadata
         response = {
             'predictions': predictions,
             'patient_id': patient_data.get('patient_id', 'Unknown'),
             'timestamp': datetime.now().isoformat(),
-            'model_version': '1.0'
+            'model_version': MODEL_VERSION
         }
         
-        return jsonify(response)
+        # Queued for the background writer, never written inline
+        audit_log.record(
+            patient_data.get('patient_id'),
+            features[0],
+            predictions,
+            MODEL_VERSION,
+            {
+                'validate_ms': 1000 * (validated - start),
+                'score_ms': 1000 * (scored - validated),
+                'total_ms': 1000 * (time.perf_counter() - start)
+            }
+        )
+        
+        with memory_stats.tracker.stage('predict', 'serialize'):
+            return json_response(response)
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -229,6 +396,7 @@ def model_info():
         'features': predictor.feature_columns,
         'targets': ['aspirin', 'heparin'],
         'kernel': 'rbf',
+        'evaluation': load_evaluation('models'),
         'status': 'ready',
         'timestamp': datetime.now().isoformat()
     })
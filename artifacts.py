@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import os
+import threading
+from datetime import datetime
+
+# Exported files the API serves, by the name used in the URL
+ARTIFACTS = {
+    'model_parameters.json': 'model_parameters.json',
+    'models/model_parameters.json': os.path.join('models', 'model_parameters.json'),
+    'parity_report.json': 'parity_report.json'
+}
+
+GZIP_SUFFIX = '.gz'
+GZIP_LEVEL = 9
+
+# Versioned URLs never change content, so browsers may keep them for a year;
+# 'latest' is revalidated with its ETag on every use
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+LATEST_CACHE = 'no-cache'
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def precompress(path):
+    """Write path.gz next to an exported file; returns (raw bytes, gzip bytes).
+
+    The gzip header carries no timestamp, so the same export always gives
+    the same .gz file.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    compressed = gzip.compress(data, GZIP_LEVEL, mtime=0)
+    temporary = f'{path}{GZIP_SUFFIX}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(compressed)
+    os.replace(temporary, path + GZIP_SUFFIX)
+    return len(data), len(compressed)
+
+class ArtifactStore:
+    """Content hashes of the exported artifacts, recomputed when a file changes.
+
+    The version in an artifact's URL is the first 16 hex digits of its
+    SHA-256, and the full hash is its ETag.  The .gz variant written by
+    precompress() is only used while it is newer than the file itself.
+    """
+    def __init__(self, artifacts=ARTIFACTS):
+        self.artifacts = artifacts
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """{'path', 'sha256', 'version', 'bytes', 'gzip_path'} or None if not exported"""
+        path = self.artifacts.get(name)
+        if path is None or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(name)
+        if cached is None or cached[0] != key:
+            cached = (key, sha256_file(path))
+            with self._lock:
+                self._hashes[name] = cached
+        sha256 = cached[1]
+
+        gzip_path = path + GZIP_SUFFIX
+        if not (os.path.exists(gzip_path) and os.stat(gzip_path).st_mtime_ns >= stat.st_mtime_ns):
+            gzip_path = None
+        return {'path': path, 'sha256': sha256, 'version': sha256[:16], 'bytes': stat.st_size,
+                'gzip_path': gzip_path}
+
+    def manifest(self):
+        entries = {}
+        for name in self.artifacts:
+            entry = self.get(name)
+            if entry is not None:
+                entries[name] = {
+                    'url': f"/artifacts/{entry['version']}/{name}",
+                    'etag': entry['sha256'],
+                    'bytes': entry['bytes'],
+                    'gzip_bytes': os.path.getsize(entry['gzip_path']) if entry['gzip_path'] else None
+                }
+        return entries
+
+def install(app, store=None):
+    """Register /artifacts (the manifest) and /artifacts/<version>/<name>"""
+    from flask import Response, jsonify, request
+
+    store = store or ArtifactStore()
+
+    @app.route('/artifacts', methods=['GET'])
+    def artifact_manifest():
+        """Current versioned URL and ETag of every exported artifact"""
+        response = jsonify({'artifacts': store.manifest(), 'timestamp': datetime.now().isoformat()})
+        response.headers['Cache-Control'] = LATEST_CACHE
+        return response
+
+    @app.route('/artifacts/<version>/<path:name>', methods=['GET'])
+    def artifact(version, name):
+        """An exported artifact; version is its content version from the manifest, or 'latest'"""
+        entry = store.get(name)
+        if entry is None:
+            return jsonify({'error': 'Artifact not found', 'available': sorted(store.manifest())}), 404
+        if version not in ('latest', entry['version']):
+            # Superseded by a newer export; only the current version is kept
+            return jsonify({
+                'error': 'Artifact version not available',
+                'current': f"/artifacts/{entry['version']}/{name}"
+            }), 404
+
+        use_gzip = entry['gzip_path'] is not None and request.accept_encodings['gzip']
+        # Each encoding is a different representation, so it gets its own strong ETag
+        etag = entry['sha256'] + ('-gzip' if use_gzip else '')
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            with open(entry['gzip_path'] if use_gzip else entry['path'], 'rb') as f:
+                response = Response(f.read(), mimetype='application/json')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = LATEST_CACHE if version == 'latest' else IMMUTABLE_CACHE
+        return response
+
+    return store
@@ -0,0 +1,234 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = os.environ.get('HEART_AUDIT_DB', os.path.join('audit', 'predictions.db'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    patient_id TEXT,
+    features TEXT NOT NULL,
+    aspirin_probability REAL,
+    aspirin_recommendation INTEGER,
+    heparin_probability REAL,
+    heparin_recommendation INTEGER,
+    model_version TEXT,
+    latencies TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_patient ON predictions (patient_id, timestamp);
+'''
+
+INSERT = '''
+INSERT INTO predictions (
+    timestamp, patient_id, features, aspirin_probability, aspirin_recommendation,
+    heparin_probability, heparin_recommendation, model_version, latencies
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def connect(db_path):
+    """Open the audit database, creating the table and index if needed"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    # WAL lets several worker processes append while the CLI reads
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+class AuditLog:
+    """Records every prediction without blocking the request.
+
+    record() only puts a row on a bounded queue; a background thread
+    drains it and inserts rows in batches, one transaction per batch.
+    If the queue stays full for block_timeout seconds the row is dropped
+    and counted, so memory stays bounded when the disk cannot keep up.
+    """
+    def __init__(self, db_path=DEFAULT_DB, max_queue=10000, batch_size=500,
+                 flush_interval=0.5, block_timeout=0.05):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each worker starts its own writer
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def record(self, patient_id, features, predictions, model_version, latencies):
+        """Queue one prediction for writing"""
+        self._ensure_started()
+        row = (
+            datetime.now().isoformat(),
+            None if patient_id is None else str(patient_id),
+            json.dumps([float(value) for value in features]),
+            predictions['aspirin']['probability'],
+            int(predictions['aspirin']['recommendation']),
+            predictions['heparin']['probability'],
+            int(predictions['heparin']['recommendation']),
+            model_version,
+            json.dumps(latencies)
+        )
+        try:
+            self.queue.put(row, timeout=self.block_timeout)
+        except queue.Full:
+            self._drop(1)
+
+    def record_batch(self, patient_ids, features, scores, model_version, latencies):
+        """Queue one row per scored patient from predict_batch() arrays.
+
+        The rows share the batch's timestamp, model version and latencies.
+        Once the queue has stayed full for block_timeout the rest of the
+        batch is dropped, so a batch waits at most that long.
+        """
+        self._ensure_started()
+        timestamp = datetime.now().isoformat()
+        latencies = json.dumps(latencies)
+        rows = zip(
+            patient_ids, features.tolist(),
+            scores['aspirin_probability'].tolist(), scores['aspirin_recommendation'].tolist(),
+            scores['heparin_probability'].tolist(), scores['heparin_recommendation'].tolist()
+        )
+        for queued, (patient_id, row, ap, ar, hp, hr) in enumerate(rows):
+            try:
+                self.queue.put((
+                    timestamp,
+                    None if patient_id is None else str(patient_id),
+                    json.dumps(row), ap, int(ar), hp, int(hr),
+                    model_version,
+                    latencies
+                ), timeout=self.block_timeout)
+            except queue.Full:
+                self._drop(len(patient_ids) - queued)
+                return
+
+    def _drop(self, count):
+        previous = self.dropped
+        self.dropped += count
+        if previous // 1000 != self.dropped // 1000 or previous == 0:
+            logger.error(f"Audit queue full, {self.dropped} rows dropped so far")
+
+    def _run(self):
+        connection = connect(self.db_path)
+        while True:
+            try:
+                row = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if row is None:
+                break
+
+            batch = [row]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    row = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+
+            try:
+                with connection:
+                    connection.executemany(INSERT, batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.error(f"Error writing audit rows: {str(e)}")
+
+            if stop:
+                break
+        connection.close()
+
+    def close(self, timeout=5.0):
+        """Flush queued rows and stop the writer thread"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped
+        }
+
+def patient_history(patient_id, db_path=DEFAULT_DB, limit=50):
+    """Return the most recent predictions for a patient, newest first"""
+    connection = connect(db_path)
+    connection.row_factory = sqlite3.Row
+    try:
+        rows = connection.execute(
+            'SELECT * FROM predictions WHERE patient_id = ? ORDER BY timestamp DESC LIMIT ?',
+            (str(patient_id), limit)
+        ).fetchall()
+    finally:
+        connection.close()
+
+    history = []
+    for row in rows:
+        entry = dict(row)
+        entry['features'] = json.loads(entry['features'])
+        entry['latencies'] = json.loads(entry['latencies']) if entry['latencies'] else {}
+        history.append(entry)
+    return history
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the prediction audit log')
+    parser.add_argument('patient_id', help='patient ID to look up')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--json', action='store_true', help='print raw JSON')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"✗ Audit database {args.db} not found")
+        return
+
+    history = patient_history(args.patient_id, args.db, args.limit)
+    if args.json:
+        print(json.dumps(history, indent=2))
+        return
+
+    print(f"Prediction history for patient {args.patient_id}")
+    print("=" * 60)
+    if not history:
+        print("No predictions recorded")
+    for entry in history:
+        print(f"{entry['timestamp']}  model {entry['model_version']}")
+        print(f"  Aspirin: {entry['aspirin_probability']:.3f} "
+              f"({'recommended' if entry['aspirin_recommendation'] else 'not recommended'})")
+        print(f"  Heparin: {entry['heparin_probability']:.3f} "
+              f"({'recommended' if entry['heparin_recommendation'] else 'not recommended'})")
+        print(f"  Latency (ms): {entry['latencies']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import pickle
+import time
+import tracemalloc
+
+import numpy as np
+
+from memory_stats import object_size
+from numpy_inference import PRECISIONS, CompiledRBFSVM, JointRBFSVM, RBFSVM, parity_report
+from patient_schema import FEATURE_CONSTRAINTS
+
+BENCHMARK_FILE = 'benchmark.json'
+BATCH_SIZES = [1, 32, 299]
+
+def load_features(csv_path, feature_names):
+    """Raw feature matrix for every row of the clinical CSV"""
+    data = np.genfromtxt(csv_path, delimiter=',', names=True)
+    return np.column_stack([data[name] for name in feature_names])
+
+def load_inputs(models_dir, csv_path):
+    """Saved models plus every row of the clinical CSV, scaled"""
+    models = {}
+    for name in ('scaler', 'aspirin_model', 'heparin_model', 'feature_names'):
+        with open(os.path.join(models_dir, f'{name}.pkl'), 'rb') as f:
+            models[name] = pickle.load(f)
+    X = load_features(csv_path, models['feature_names'])
+    return models, models['scaler'].transform(X)
+
+def time_call(func, X, min_seconds=0.2):
+    """Median milliseconds per call, repeating until min_seconds has passed"""
+    func(X)
+    timings = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds or len(timings) < 5:
+        t = time.perf_counter()
+        func(X)
+        timings.append(time.perf_counter() - t)
+    return 1000 * float(np.median(timings))
+
+def benchmark_precisions(models, X_scaled, batch_sizes=BATCH_SIZES):
+    """predict_proba latency for sklearn and each NumPy precision"""
+    results = {}
+    for target in ('aspirin', 'heparin'):
+        model = models[f'{target}_model']
+        scorers = {'sklearn': (model.predict_proba, None)}
+        for precision in PRECISIONS:
+            variant = RBFSVM.from_sklearn(model, precision)
+            scorers[f'numpy_{precision}'] = (variant.predict_proba, parity_report(model, variant, X_scaled))
+
+        results[target] = {}
+        for name, (predict_proba, parity) in scorers.items():
+            entry = {f'batch_{n}_ms': time_call(predict_proba, X_scaled[:n]) for n in batch_sizes}
+            if parity is not None:
+                entry['parity'] = parity
+            results[target][name] = entry
+    return results
+
+def benchmark_compiled(models, X_raw, batch_sizes=BATCH_SIZES):
+    """Scaler plus predict_proba from raw features: sklearn, NumPy and compiled"""
+    scaler = models['scaler']
+    binary = [name for name in models['feature_names'] if FEATURE_CONSTRAINTS[name][0] == 'binary']
+    results = {}
+    for target in ('aspirin', 'heparin'):
+        model = models[f'{target}_model']
+        variant = RBFSVM.from_sklearn(model)
+        compiled = CompiledRBFSVM(model, scaler, models['feature_names'], binary)
+        scorers = {
+            'sklearn': (lambda X: model.predict_proba(scaler.transform(X)), None),
+            'numpy_float64': (lambda X: variant.predict_proba(scaler.transform(X)), None),
+            'compiled': (compiled.predict_proba,
+                         parity_report(model, compiled, scaler.transform(X_raw), X_raw))
+        }
+        results[target] = {}
+        for name, (predict_proba, parity) in scorers.items():
+            entry = {f'batch_{n}_ms': time_call(predict_proba, X_raw[:n]) for n in batch_sizes}
+            if parity is not None:
+                entry['parity'] = parity
+            results[target][name] = entry
+    return results
+
+def benchmark_joint(models, X_scaled, batch_sizes=BATCH_SIZES):
+    """Both targets: two separate models against one JointRBFSVM"""
+    separate = {target: models[f'{target}_model'] for target in ('aspirin', 'heparin')}
+    numpy_separate = {target: RBFSVM.from_sklearn(model) for target, model in separate.items()}
+    joint = JointRBFSVM.from_sklearn(separate)
+
+    prob = joint.predict_all(X_scaled)
+    parity = {
+        'max_probability_difference': max(
+            float(np.max(np.abs(prob[target][0] - model.predict_proba(X_scaled)[:, 1])))
+            for target, model in separate.items()),
+        'recommendation_flips': sum(
+            int(np.sum(prob[target][1] != model.predict(X_scaled))) for target, model in separate.items()),
+        'bytes': int(joint.nbytes)
+    }
+    scorers = {
+        'sklearn_pair': (lambda X: [model.predict_proba(X) for model in separate.values()], None),
+        'numpy_pair': (lambda X: [model.predict_proba(X) for model in numpy_separate.values()], None),
+        'joint': (joint.predict_all, parity)
+    }
+    results = {}
+    for name, (predict, parity) in scorers.items():
+        entry = {f'batch_{n}_ms': time_call(predict, X_scaled[:n]) for n in batch_sizes}
+        if parity is not None:
+            entry['parity'] = parity
+        results[name] = entry
+    return {'aspirin+heparin': results}
+
+def allocation_peak(func, X):
+    """Peak bytes allocated by one call (after a warm-up call)"""
+    func(X)
+    tracemalloc.start()
+    try:
+        func(X)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark_memory(models, X_raw, batch_sizes=BATCH_SIZES):
+    """Model size and peak allocation per predict_proba call, from raw features.
+
+    Allocations made inside libsvm's C code are not traced, so the sklearn
+    peaks only cover the Python and NumPy side of the call.
+    """
+    scaler = models['scaler']
+    binary = [name for name in models['feature_names'] if FEATURE_CONSTRAINTS[name][0] == 'binary']
+    results = {}
+    for target in ('aspirin', 'heparin'):
+        model = models[f'{target}_model']
+        variants = {'sklearn': (model, lambda X, model=model: model.predict_proba(scaler.transform(X)))}
+        for precision in PRECISIONS:
+            variant = RBFSVM.from_sklearn(model, precision)
+            variants[f'numpy_{precision}'] = (variant, lambda X, variant=variant:
+                                              variant.predict_proba(scaler.transform(X)))
+        compiled = CompiledRBFSVM(model, scaler, models['feature_names'], binary)
+        variants['compiled'] = (compiled, compiled.predict_proba)
+
+        results[target] = {}
+        for name, (obj, predict_proba) in variants.items():
+            entry = {'model_bytes': object_size(obj)['heap_bytes']}
+            for n in batch_sizes:
+                entry[f'batch_{n}_peak_bytes'] = allocation_peak(predict_proba, X_raw[:n])
+            results[target][name] = entry
+    return results
+
+def print_memory(results):
+    for target, variants in results.items():
+        print(f"\nmemory: {target}")
+        for name, entry in variants.items():
+            peaks = '  '.join(f"{key[:-11].replace('_', '=')} {value / 1024:.1f}kB"
+                              for key, value in entry.items() if key.endswith('_peak_bytes'))
+            print(f"  {name:15s} model {entry['model_bytes'] / 1024:.1f}kB  peak {peaks}")
+
+def print_results(section, results):
+    for target, scorers in results.items():
+        print(f"\n{section}: {target}")
+        for name, entry in scorers.items():
+            timings = '  '.join(f"{key[:-3].replace('_', '=')} {value:.3f}ms"
+                                for key, value in entry.items() if key.endswith('_ms'))
+            line = f"  {name:15s} {timings}"
+            if 'parity' in entry:
+                parity = entry['parity']
+                line += (f"  max diff {parity['max_probability_difference']:.1e}, "
+                         f"{parity['recommendation_flips']} flips, {parity['bytes']} bytes")
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Inference micro-benchmarks for the saved SVM models')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--csv', default='new heart clinical.csv')
+    parser.add_argument('--output', default=BENCHMARK_FILE)
+    args = parser.parse_args()
+
+    models, X_scaled = load_inputs(args.models_dir, args.csv)
+
+    print("Inference Benchmark")
+    print("=" * 60)
+    results = {
+        'precisions': benchmark_precisions(models, X_scaled),
+        'compiled': benchmark_compiled(models, load_features(args.csv, models['feature_names'])),
+        'joint': benchmark_joint(models, X_scaled),
+        'memory': benchmark_memory(models, load_features(args.csv, models['feature_names']))
+    }
+    for section in ('precisions', 'compiled', 'joint'):
+        print_results(section, results[section])
+    print_memory(results['memory'])
+
+    results['timestamp'] = str(np.datetime64('now'))
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
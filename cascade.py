@@ -0,0 +1,163 @@
+"""Tune the confidence-gated cascade served as the 'cascade' model set.
+
+Patients are scored by the logistic regressions first, and only those
+whose probability falls inside a per-target uncertainty band are passed
+on to the full model set (the SVMs by default).  This script fits the
+logistic regressions on simple_setup.py's training split, picks the
+narrowest bands that keep the cascade's recommendations within a
+tolerance of the full set's on half of the held-out split, checks them
+on the other half and writes models/cascade.json.
+
+    python cascade.py --tolerance 0.01 --full svm
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from benchmark import time_call
+from incremental import holdout_split
+from model_registry import CASCADE_FILE, TARGETS, CascadeModelSet, LinearStage, discover_model_sets
+
+DEFAULT_TOLERANCE = 0.01
+
+# Candidate band edges are this many quantiles of the cheap probabilities
+QUANTILES = 101
+
+def fit_linear_stage(X_train, labels):
+    """Logistic regressions for both targets, fitted on X_train, as one LinearStage.
+
+    They are fitted here rather than taken from export_models.py, whose
+    split differs from simple_setup.py's: its training rows overlap the
+    held-out rows the bands are tuned on.
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler().fit(X_train)
+    X_scaled = scaler.transform(X_train)
+    models = {target: LogisticRegression(max_iter=1000).fit(X_scaled, labels[target]) for target in TARGETS}
+    return LinearStage(scaler, models)
+
+def tune_band(probability, full_recommendation, tolerance, quantiles=QUANTILES):
+    """(low, high) escalating the fewest patients with disagreement <= tolerance.
+
+    Patients outside the band keep the cheap recommendation (probability
+    above 0.5), so the disagreement is the share of all patients outside
+    the band where that differs from the full model.  Escalating everyone,
+    (0, 1), always qualifies.
+    """
+    wrong = (probability > 0.5) != full_recommendation
+    edges = np.unique(np.append(np.quantile(probability, np.linspace(0, 1, quantiles)), 0.5))
+    best = (1.0, 0.0, 1.0)
+    for low in edges[edges <= 0.5]:
+        for high in edges[edges >= 0.5]:
+            inside = (probability >= low) & (probability <= high)
+            if np.mean(wrong & ~inside) <= tolerance and np.mean(inside) < best[0]:
+                best = (float(np.mean(inside)), float(low), float(high))
+    return best[1], best[2]
+
+def compare(cascade, full_set, X):
+    """Escalation rate and agreement with the full set for each target"""
+    scores = cascade.predict_batch(X)
+    reference = full_set.predict_batch(X)
+    results = {}
+    for target in TARGETS:
+        results[f'{target}_escalation_rate'] = float(np.mean(scores[f'{target}_stage'] != 'lr'))
+        results[f'{target}_agreement'] = float(np.mean(
+            scores[f'{target}_recommendation'] == reference[f'{target}_recommendation']))
+    escalated = np.zeros(len(X), dtype=bool)
+    for target in TARGETS:
+        escalated |= scores[f'{target}_stage'] != 'lr'
+    results['escalation_rate'] = float(np.mean(escalated))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune the cheap-model-first cascade')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--csv', default='new heart clinical.csv')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='largest share of patients whose recommendation may differ from the full model')
+    parser.add_argument('--full', default='svm',
+                        help="model set answering uncertain patients; the held-out rows are only unseen "
+                             "by sets trained on simple_setup.py's split, such as 'svm'")
+    args = parser.parse_args()
+
+    sets = discover_model_sets(args.models_dir)
+    if args.full not in sets:
+        print(f"❌ Model set not found: {args.full}. Available: {sorted(sets)}")
+        return 1
+    full_set = sets[args.full]
+
+    with open(os.path.join(args.models_dir, 'feature_names.pkl'), 'rb') as f:
+        feature_names = pickle.load(f)
+    X_train, train_labels, X_val, _ = holdout_split(args.csv, feature_names)
+    stage = fit_linear_stage(X_train, train_labels)
+    # Bands are chosen on one half and checked on the other
+    X_tune, X_check = X_val[0::2], X_val[1::2]
+
+    print("Cascade Tuning")
+    print("=" * 60)
+    # The held-out split is small, so the rates below are coarse estimates
+    print(f"  Bands tuned on {len(X_tune)} held-out patients and checked on {len(X_check)}; "
+          f"one patient moves a check rate by {1 / len(X_check):.1%}")
+    probability = stage.predict_proba(X_tune)
+    reference = full_set.predict_batch(X_tune)
+    bands = {
+        target: tune_band(probability[:, i], reference[f'{target}_recommendation'], args.tolerance)
+        for i, target in enumerate(TARGETS)
+    }
+    cascade = CascadeModelSet('cascade', stage, full_set, bands, source=args.models_dir)
+    tuned, checked = compare(cascade, full_set, X_tune), compare(cascade, full_set, X_check)
+
+    # Latency for one patient: the cascade pays the linear stage always and
+    # the full set on the escalated share
+    full_ms = time_call(full_set.predict_batch, X_check[:1])
+    cheap_ms = time_call(stage.predict_proba, X_check[:1])
+    expected_ms = cheap_ms + checked['escalation_rate'] * full_ms
+    full_batch_ms = time_call(full_set.predict_batch, X_check)
+    cascade_batch_ms = time_call(cascade.predict_batch, X_check)
+
+    for target in TARGETS:
+        low, high = bands[target]
+        print(f"  {target}: band [{low:.3f}, {high:.3f}], escalated "
+              f"{checked[f'{target}_escalation_rate']:.1%}, agreement {checked[f'{target}_agreement']:.2%} "
+              f"(tuning half {tuned[f'{target}_agreement']:.2%})")
+        if 1 - checked[f'{target}_agreement'] > args.tolerance:
+            print(f"  ⚠️  {target} disagreement on the check half exceeds the tolerance of {args.tolerance:.2%}")
+    print(f"  Escalated patients: {checked['escalation_rate']:.1%} of {len(X_check)}")
+    print(f"  One patient: {args.full} {full_ms:.3f} ms, linear stage {cheap_ms:.3f} ms, "
+          f"cascade ~{expected_ms:.3f} ms")
+    print(f"  Batch of {len(X_check)}: {args.full} {full_batch_ms:.2f} ms, cascade {cascade_batch_ms:.2f} ms")
+
+    config = {
+        'full': args.full,
+        'linear_stage': stage.to_params(),
+        'tolerance': args.tolerance,
+        'bands': {target: list(band) for target, band in bands.items()},
+        'validation': {
+            'csv': args.csv,
+            'tune_rows': len(X_tune),
+            'check_rows': len(X_check),
+            'tune': tuned,
+            'check': checked,
+            'full_ms': full_ms,
+            'cheap_ms': cheap_ms,
+            'expected_ms': expected_ms,
+            'full_batch_ms': full_batch_ms,
+            'cascade_batch_ms': cascade_batch_ms
+        },
+        'created': datetime.now().isoformat()
+    }
+    path = os.path.join(args.models_dir, CASCADE_FILE)
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+    print(f"\n✓ Cascade written to {path} (served as the 'cascade' model set)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
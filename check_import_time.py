@@ -0,0 +1,78 @@
+import argparse
+import subprocess
+import sys
+
+# Import-time budget (ms) and modules that must not load, per entry point.
+# Serving must not pull in training-only libraries; exporting the SVM
+# must not need xgboost or the other model families.
+BUDGETS = {
+    'simple_app': (600, ['pandas', 'xgboost', 'sklearn.ensemble', 'sklearn.linear_model']),
+    'app': (600, ['pandas', 'xgboost', 'sklearn.ensemble', 'sklearn.linear_model']),
+    'export_my_model': (300, ['pandas', 'sklearn', 'xgboost']),
+    'export_models': (2500, ['xgboost', 'sklearn.ensemble', 'sklearn.linear_model', 'sklearn.svm'])
+}
+
+def measure_import(module):
+    """Import module in a fresh interpreter with -X importtime.
+
+    Returns the cumulative import time in ms and the set of modules loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    total_us = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if 'cumulative' in cumulative:
+            continue
+        name = name.strip()
+        loaded.add(name)
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, loaded
+
+def check_module(module, budget_ms, forbidden):
+    """Check one entry point, returning a list of problems"""
+    elapsed_ms, loaded = measure_import(module)
+    problems = []
+    if elapsed_ms > budget_ms:
+        problems.append(f"import took {elapsed_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+    for name in forbidden:
+        if name in loaded:
+            problems.append(f"imports {name} at module load")
+    return elapsed_ms, problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Check import time of the entry points')
+    parser.add_argument('modules', nargs='*', default=list(BUDGETS))
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help='multiply every budget, e.g. 2 on a slow machine')
+    args = parser.parse_args()
+
+    print("Import Time Check")
+    print("=" * 40)
+
+    failed = False
+    for module in args.modules:
+        budget_ms, forbidden = BUDGETS[module]
+        budget_ms *= args.budget_scale
+        elapsed_ms, problems = check_module(module, budget_ms, forbidden)
+        if problems:
+            failed = True
+            print(f"✗ {module}: {elapsed_ms:.0f} ms")
+            for problem in problems:
+                print(f"    - {problem}")
+        else:
+            print(f"✓ {module}: {elapsed_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
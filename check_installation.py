@@ -1,5 +1,28 @@
 import sys
 import os
+import json
+import math
+import time
+import argparse
+from datetime import datetime
+
+PROBE_FILE = 'hardware_probe.json'
+
+# Batch sizes timed by the inference micro-benchmarks
+PROBE_BATCH_SIZES = [1, 8, 32, 128, 512, 2048]
+
+# A batch size is "fast enough" once its per-row time is within this
+# factor of the best per-row time
+BATCH_ROWS_TOLERANCE = 1.1
+
+# Below this single-patient latency a scoring pool's round trip costs
+# more than it saves
+POOL_MIN_MS = 2.0
+
+# Share of available memory the workers may use, and the share one
+# training chunk may use
+WORKER_MEMORY_SHARE = 0.8
+TRAINING_MEMORY_SHARE = 0.25
 
 def check_python():
     print("Python Installation Check")
@@ -32,6 +55,18 @@ def check_packages():
             print(f"✗ {package_name}")
             missing.append(package_name)
     
+    # Used when present, with a slower fallback otherwise
+    optional = {
+        'orjson': 'orjson (faster JSON responses)',
+        'threadpoolctl': 'threadpoolctl (BLAS thread detection and limits)'
+    }
+    for import_name, description in optional.items():
+        try:
+            __import__(import_name)
+            print(f"✓ {description}")
+        except ImportError:
+            print(f"- {description}: optional, pip install {import_name}")
+    
     if missing:
         print(f"\nTo install missing packages, run:")
         print(f"pip install {' '.join(missing)}")
@@ -54,13 +89,241 @@ def check_files():
         else:
             print(f"✗ {file}")
 
+def cgroup_cpu_limit():
+    """CPU quota of the container in cores, or None when there is none"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+def available_memory_mb():
+    """Memory available to new processes, capped by the container limit"""
+    available = None
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    available = int(line.split()[1]) / 1024
+    except OSError:
+        try:
+            available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        except (AttributeError, ValueError, OSError):
+            pass
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                limit = int(f.read()) / (1024 * 1024)
+            available = min(available, limit) if available else limit
+        except (OSError, ValueError):
+            pass
+    return available
+
+def check_hardware():
+    print("\nHardware Check")
+    print("=" * 30)
+    
+    logical = os.cpu_count() or 1
+    try:
+        usable = len(os.sched_getaffinity(0))
+    except AttributeError:
+        usable = logical
+    quota = cgroup_cpu_limit()
+    cores = max(1, min(usable, math.floor(quota)) if quota else usable)
+    print(f"CPU cores: {logical} logical, {usable} usable"
+          + (f", container quota {quota:g}" if quota else "") + f" -> {cores}")
+    
+    memory = available_memory_mb()
+    print(f"Available memory: {memory:.0f} MB" if memory else "Available memory: unknown")
+    
+    blas = []
+    try:
+        import numpy  # noqa: F401 (loads the BLAS library threadpoolctl inspects)
+        from threadpoolctl import threadpool_info
+        for pool in threadpool_info():
+            blas.append({key: pool.get(key) for key in
+                         ('user_api', 'internal_api', 'version', 'num_threads', 'threading_layer')})
+            print(f"{pool.get('internal_api')} {pool.get('version') or ''}: "
+                  f"{pool.get('num_threads')} threads ({pool.get('user_api')})")
+    except ImportError:
+        print("BLAS: unknown (install threadpoolctl to detect it)")
+    
+    thread_env = {name: os.environ[name] for name in
+                  ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS') if name in os.environ}
+    if thread_env:
+        print(f"Thread environment: {thread_env}")
+    
+    return {'cores': cores, 'logical_cores': logical, 'cgroup_cpu_quota': quota,
+            'available_memory_mb': memory, 'blas': blas, 'thread_env': thread_env}
+
+def time_ms(func, X, min_seconds=0.1):
+    """Median milliseconds per call"""
+    import numpy as np
+    
+    func(X)
+    timings = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds or len(timings) < 3:
+        t = time.perf_counter()
+        func(X)
+        timings.append(time.perf_counter() - t)
+    return 1000 * float(np.median(timings))
+
+def probe_models(models_dir='models'):
+    """The saved scaler and aspirin SVM, or a synthetic model of the same shape"""
+    import pickle
+    import numpy as np
+    from numpy_inference import RBFSVM
+    
+    try:
+        with open(os.path.join(models_dir, 'scaler.pkl'), 'rb') as f:
+            scaler = pickle.load(f)
+        with open(os.path.join(models_dir, 'aspirin_model.pkl'), 'rb') as f:
+            model = pickle.load(f)
+        return scaler.transform, model.predict_proba, RBFSVM.from_sklearn(model), 'models'
+    except (OSError, pickle.UnpicklingError, AttributeError):
+        rng = np.random.default_rng(0)
+        svm = RBFSVM(rng.normal(size=(240, 12)), rng.normal(size=240), 0.0, 1 / 12)
+        mean, scale = np.zeros(12), np.ones(12)
+        return (lambda X: (X - mean) / scale), None, svm, 'synthetic'
+
+def run_benchmarks(hardware, models_dir='models'):
+    """Time scaling and kernel evaluation at each batch size, and BLAS threading"""
+    print("\nInference Micro-benchmarks")
+    print("=" * 30)
+    try:
+        import numpy as np
+        from model_store import memory_usage
+        scale, predict_proba, svm, source = probe_models(models_dir)
+    except ImportError as e:
+        print(f"✗ Skipped: {e}")
+        return None
+    
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(max(PROBE_BATCH_SIZES), 12))
+    results = {'source': source, 'batches': {}}
+    print(f"Model: {source} ({len(svm.support_vectors)} support vectors)")
+    for n in PROBE_BATCH_SIZES:
+        entry = {
+            'scale_ms': time_ms(scale, X[:n]),
+            'kernel_ms': time_ms(svm.decision_function, X[:n])
+        }
+        if predict_proba is not None:
+            entry['sklearn_ms'] = time_ms(predict_proba, X[:n])
+        results['batches'][n] = entry
+        print(f"  batch {n:5d}: " + '  '.join(
+            f"{key[:-3]} {value:.3f}ms ({1000 * value / n:.1f}us/row)" for key, value in entry.items()))
+    
+    # Does the kernel evaluation gain anything from more than one BLAS thread?
+    results['blas_speedup'] = None
+    try:
+        from threadpoolctl import threadpool_limits
+        largest = X[:max(PROBE_BATCH_SIZES)]
+        with threadpool_limits(limits=1):
+            single = time_ms(svm.decision_function, largest)
+        results['blas_speedup'] = single / results['batches'][max(PROBE_BATCH_SIZES)]['kernel_ms']
+        print(f"  BLAS threads: {results['blas_speedup']:.2f}x faster with all threads than with one")
+    except ImportError:
+        pass
+    
+    rss = memory_usage().get('rss_kb')
+    results['worker_rss_mb'] = rss / 1024 if rss else None
+    return results
+
+def recommend_config(hardware, results):
+    """Serving settings that keep workers x pool processes x BLAS threads within the cores"""
+    cores = hardware['cores']
+    batches = results['batches']
+    single_ms = batches[1].get('sklearn_ms', batches[1]['kernel_ms']) + batches[1]['scale_ms']
+    
+    # Scoring one patient is too quick to be worth a process hop
+    scoring_processes = 0 if single_ms < POOL_MIN_MS else 2
+    workers = max(1, cores // max(1, scoring_processes))
+    
+    # Every worker holds its own copy of whatever is not in the shared bundle
+    if hardware['available_memory_mb'] and results.get('worker_rss_mb'):
+        fits = int(WORKER_MEMORY_SHARE * hardware['available_memory_mb'] // results['worker_rss_mb'])
+        workers = max(1, min(workers, fits))
+    
+    busy_processes = workers * max(1, scoring_processes)
+    blas_threads = max(1, cores // busy_processes)
+    if results.get('blas_speedup') is not None and results['blas_speedup'] < 1.2:
+        blas_threads = 1
+    
+    # Smallest batch whose per-row time is close to the best per-row time
+    per_row = {n: entry['kernel_ms'] / n for n, entry in batches.items()}
+    best = min(per_row.values())
+    batch_rows = min(n for n, value in per_row.items() if value <= BATCH_ROWS_TOLERANCE * best)
+    
+    config = {
+        'workers': workers,
+        'threads': 4,
+        'scoring_processes': scoring_processes,
+        'blas_threads': blas_threads,
+        'batch_rows': batch_rows
+    }
+    if hardware['available_memory_mb']:
+        from train_out_of_core import DEFAULT_COMPONENTS
+        
+        # One chunk's features, scaled copy and random-feature map, in float64
+        bytes_per_row = 8 * (12 + 12 + DEFAULT_COMPONENTS)
+        rows = TRAINING_MEMORY_SHARE * hardware['available_memory_mb'] * 1024 * 1024 / bytes_per_row
+        config['training_chunk_rows'] = int(min(1000000, max(1000, rows // 1000 * 1000)))
+    return config
+
+def write_config(config, hardware, results, path=None):
+    """Merge the recommendation into serving_config.json; the probe goes to hardware_probe.json"""
+    import serving
+    
+    path = path or serving.CONFIG_FILE
+    existing = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+    existing.update(config)
+    with open(path, 'w') as f:
+        json.dump(existing, f, indent=2)
+    with open(PROBE_FILE, 'w') as f:
+        json.dump({'hardware': hardware, 'benchmarks': results, 'recommended': config,
+                   'timestamp': datetime.now().isoformat()}, f, indent=2)
+    print(f"\n✓ Recommended settings written to {path} (details in {PROBE_FILE})")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check the installation and probe the hardware')
+    parser.add_argument('--write-config', nargs='?', const='serving_config.json', metavar='PATH',
+                        help='write the recommended serving settings (default serving_config.json)')
+    parser.add_argument('--models-dir', default='models')
+    args = parser.parse_args()
+    
     check_python()
     check_packages()
     check_files()
+    hardware = check_hardware()
+    results = run_benchmarks(hardware, args.models_dir)
+    if results is not None:
+        config = recommend_config(hardware, results)
+        print("\nRecommended serving settings")
+        print("=" * 30)
+        for key, value in config.items():
+            print(f"{key}: {value}")
+        if args.write_config:
+            write_config(config, hardware, results, args.write_config)
     
     print("\nNext Steps:")
     print("1. If packages are missing, install them with pip")
     print("2. Make sure 'new heart clinical.csv' is in this directory")
     print("3. Run: python simple_setup.py")
     print("4. Run: python simple_app.py")
+    print("5. Optional: python check_installation.py --write-config to tune serving for this machine")
@@ -160,6 +160,7 @@ def main():
     if len(working_packages) >= 4:  # Need at least numpy, pandas, sklearn, flask
         print("\n🎉 Minimum requirements met! You can proceed with setup.")
         print("Next step: python minimal_setup.py")
+        print("Then: python check_installation.py --write-config to tune serving for this machine")
     else:
         print("\n⚠️  Some critical packages are missing. See alternative solutions above.")
 
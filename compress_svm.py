@@ -0,0 +1,143 @@
+import argparse
+import copy
+import json
+import os
+import pickle
+
+import numpy as np
+
+from benchmark import load_inputs, time_call
+from incremental import holdout_split
+
+COMPRESSION_FILE = 'compression.json'
+TARGETS = ['aspirin', 'heparin']
+DEFAULT_BUDGETS = [20, 50, 100, 150]
+
+def rbf_kernel(A, B, gamma):
+    sq_dist = (np.einsum('ij,ij->i', A, A)[:, np.newaxis] - 2 * A @ B.T
+               + np.einsum('ij,ij->i', B, B))
+    return np.exp(-gamma * np.maximum(sq_dist, 0))
+
+def reduced_set(model, budget, ridge=1e-8, seed=42):
+    """Approximate an RBF SVC's decision function with `budget` vectors.
+
+    The basis points are k-means centres of the support vectors, weighted
+    by |dual coefficient|.  The new coefficients minimise the feature-space
+    distance between the original and reduced weight vectors, which is the
+    linear system K_zz beta = K_zs alpha.  The intercept and the Platt
+    parameters are kept, since the decision function is what is preserved.
+    """
+    from sklearn.cluster import KMeans
+
+    sv = model.support_vectors_
+    alpha = model.dual_coef_[0]
+    if budget >= len(sv):
+        return model
+
+    kmeans = KMeans(n_clusters=budget, n_init=4, random_state=seed)
+    kmeans.fit(sv, sample_weight=np.abs(alpha))
+    Z = kmeans.cluster_centers_
+
+    gamma = model._gamma
+    K_zz = rbf_kernel(Z, Z, gamma) + ridge * np.eye(budget)
+    beta = np.linalg.solve(K_zz, rbf_kernel(Z, sv, gamma) @ alpha)
+    return with_support_vectors(model, Z, beta)
+
+def with_support_vectors(model, support_vectors, dual_coef):
+    """Copy of a fitted binary SVC scoring with new vectors and coefficients.
+
+    libsvm stores the vectors grouped by class, negative coefficients
+    (class 0) first, with the sign-flipped coefficients in _dual_coef_.
+    """
+    order = np.argsort(dual_coef > 0, kind='stable')
+    support_vectors = np.ascontiguousarray(support_vectors[order], dtype=np.float64)
+    dual_coef = dual_coef[order]
+    n_negative = int(np.sum(dual_coef <= 0))
+
+    compressed = copy.deepcopy(model)
+    compressed.support_vectors_ = support_vectors
+    compressed.dual_coef_ = dual_coef[np.newaxis, :]
+    compressed._dual_coef_ = -compressed.dual_coef_
+    compressed._n_support = np.array([n_negative, len(dual_coef) - n_negative], dtype=np.int32)
+    # Basis points are not training rows, so there are no indices to keep
+    compressed.support_ = np.arange(len(dual_coef), dtype=np.int32)
+    return compressed
+
+def score(model, reference, X_all, X_test, y_test):
+    """Holdout accuracy, agreement with the original and scoring latency"""
+    prob = model.predict_proba(X_all)[:, 1]
+    reference_prob = reference.predict_proba(X_all)[:, 1]
+    return {
+        'support_vectors': int(len(model.support_vectors_)),
+        'holdout_accuracy': float(np.mean(model.predict(X_test) == y_test)),
+        'agreement': float(np.mean(model.predict(X_all) == reference.predict(X_all))),
+        'max_probability_difference': float(np.max(np.abs(prob - reference_prob))),
+        'single_ms': time_call(model.predict_proba, X_all[:1]),
+        'batch_ms': time_call(model.predict_proba, X_all)
+    }
+
+def compress(models_dir='models', csv_path='new heart clinical.csv', budgets=DEFAULT_BUDGETS):
+    """Compress both SVMs at every budget and report latency against accuracy.
+
+    Returns (report, compressed) where compressed maps each budget to the
+    reduced models.
+    """
+    models, X_all = load_inputs(models_dir, csv_path)
+    _, _, X_test, test_labels = holdout_split(csv_path, models['feature_names'])
+    X_test = models['scaler'].transform(X_test)
+
+    report = {}
+    compressed = {}
+    for target in TARGETS:
+        model = models[f'{target}_model']
+        report[target] = {'original': score(model, model, X_all, X_test, test_labels[target])}
+        for budget in budgets:
+            reduced = reduced_set(model, budget)
+            compressed.setdefault(budget, {})[f'{target}_model'] = reduced
+            report[target][str(budget)] = score(reduced, model, X_all, X_test, test_labels[target])
+
+    for budget in budgets:
+        compressed[budget]['scaler'] = models['scaler']
+        compressed[budget]['feature_names'] = models['feature_names']
+    return report, compressed
+
+def save_models(output_dir, models):
+    """Write the models in the layout simple_setup.py produces"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name in ('scaler', 'aspirin_model', 'heparin_model', 'feature_names'):
+        with open(os.path.join(output_dir, f'{name}.pkl'), 'wb') as f:
+            pickle.dump(models[name], f)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compress the SVMs to a support-vector budget')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--csv', default='new heart clinical.csv')
+    parser.add_argument('--budgets', type=int, nargs='+', default=DEFAULT_BUDGETS,
+                        help='support-vector budgets to report')
+    parser.add_argument('--budget', type=int, help='budget whose models are written to --output-dir')
+    parser.add_argument('--output-dir', default='models_compressed')
+    args = parser.parse_args()
+
+    budgets = sorted(set(args.budgets + ([args.budget] if args.budget else [])))
+
+    print("SVM Support-Vector Compression")
+    print("=" * 70)
+    report, compressed = compress(args.models_dir, args.csv, budgets)
+
+    for target, rows in report.items():
+        print(f"\n{target}")
+        print(f"  {'budget':>8s} {'SVs':>5s} {'accuracy':>9s} {'agreement':>10s} "
+              f"{'max diff':>9s} {'single':>9s} {'batch':>9s}")
+        for budget, row in rows.items():
+            print(f"  {budget:>8s} {row['support_vectors']:5d} {row['holdout_accuracy']:9.3f} "
+                  f"{row['agreement']:10.3f} {row['max_probability_difference']:9.3f} "
+                  f"{row['single_ms']:7.3f}ms {row['batch_ms']:7.3f}ms")
+
+    if args.budget:
+        save_models(args.output_dir, compressed[args.budget])
+        with open(os.path.join(args.output_dir, COMPRESSION_FILE), 'w') as f:
+            json.dump({'budget': args.budget, 'report': report}, f, indent=2)
+        print(f"\n✓ Models compressed to {args.budget} support vectors saved to {args.output_dir}/")
+
+if __name__ == "__main__":
+    main()
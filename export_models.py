@@ -2,17 +2,30 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.svm import SVC
-from xgboost import XGBClassifier
+import argparse
 import json
 import joblib
 import os
+from artifacts import precompress
+import model_store
 
-def export_models_to_js():
+ALGORITHMS = ['logistic_regression', 'random_forest', 'svm', 'xgboost']
+
+def export_models_to_js(algorithms=ALGORITHMS):
+    """Train and export the selected algorithms.
+
+    Model classes are imported only for the algorithms being exported, so
+    an SVM-only export does not need xgboost installed.
+    """
     print("Exporting your ML models for browser use...")
     
+    if 'xgboost' in algorithms:
+        try:
+            from xgboost import XGBClassifier
+        except ImportError:
+            print("xgboost is not installed, skipping XGBoost export (pip install xgboost)")
+            algorithms = [a for a in algorithms if a != 'xgboost']
+    
     # Create models directory if it doesn't exist
     os.makedirs('models', exist_ok=True)
     
@@ -46,110 +59,9 @@ def export_models_to_js():
         'feature_names': feature_names
     }
     
-    # Train all models
-    print("Training models...")
-    
-    # 1. Logistic Regression
-    lr_aspirin = LogisticRegression(max_iter=1000)
-    lr_heparin = LogisticRegression(max_iter=1000)
-    lr_aspirin.fit(X_train_scaled, y_aspirin_train)
-    lr_heparin.fit(X_train_scaled, y_heparin_train)
-    
-    # 2. Random Forest
-    rf_aspirin = RandomForestClassifier(n_estimators=100, random_state=42)
-    rf_heparin = RandomForestClassifier(n_estimators=100, random_state=42)
-    rf_aspirin.fit(X_train_scaled, y_aspirin_train)
-    rf_heparin.fit(X_train_scaled, y_heparin_train)
-    
-    # 3. SVM
-    svm_aspirin = SVC(kernel='rbf', probability=True, random_state=42)
-    svm_heparin = SVC(kernel='rbf', probability=True, random_state=42)
-    svm_aspirin.fit(X_train_scaled, y_aspirin_train)
-    svm_heparin.fit(X_train_scaled, y_heparin_train)
-    
-    # 4. XGBoost
-    xgb_aspirin = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
-    xgb_heparin = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
-    xgb_aspirin.fit(X_train_scaled, y_aspirin_train)
-    xgb_heparin.fit(X_train_scaled, y_heparin_train)
-    
-    # Extract model parameters
-    print("Extracting model parameters...")
-    
-    # 1. Logistic Regression parameters
-    lr_aspirin_params = {
-        'coefficients': lr_aspirin.coef_[0].tolist(),
-        'intercept': lr_aspirin.intercept_[0].tolist(),
-        'classes': lr_aspirin.classes_.tolist()
-    }
-    
-    lr_heparin_params = {
-        'coefficients': lr_heparin.coef_[0].tolist(),
-        'intercept': lr_heparin.intercept_[0].tolist(),
-        'classes': lr_heparin.classes_.tolist()
-    }
-    
-    # 2. SVM parameters (for RBF kernel)
-    svm_aspirin_params = {
-        'support_vectors': svm_aspirin.support_vectors_.tolist(),
-        'dual_coef': svm_aspirin.dual_coef_[0].tolist(),
-        'intercept': svm_aspirin.intercept_[0].tolist(),
-        'gamma': float(svm_aspirin._gamma) if hasattr(svm_aspirin, '_gamma') else 'auto',
-        'classes': svm_aspirin.classes_.tolist()
-    }
-    
-    svm_heparin_params = {
-        'support_vectors': svm_heparin.support_vectors_.tolist(),
-        'dual_coef': svm_heparin.dual_coef_[0].tolist(),
-        'intercept': svm_heparin.intercept_[0].tolist(),
-        'gamma': float(svm_heparin._gamma) if hasattr(svm_heparin, '_gamma') else 'auto',
-        'classes': svm_heparin.classes_.tolist()
-    }
-    
-    # 3. Random Forest - extract decision trees (simplified)
-    # For browser use, we'll use a simplified version with feature importances
-    rf_aspirin_params = {
-        'feature_importances': rf_aspirin.feature_importances_.tolist(),
-        'n_estimators': rf_aspirin.n_estimators,
-        'classes': rf_aspirin.classes_.tolist()
-    }
-    
-    rf_heparin_params = {
-        'feature_importances': rf_heparin.feature_importances_.tolist(),
-        'n_estimators': rf_heparin.n_estimators,
-        'classes': rf_heparin.classes_.tolist()
-    }
-    
-    # 4. XGBoost - extract feature importances
-    xgb_aspirin_params = {
-        'feature_importances': xgb_aspirin.feature_importances_.tolist(),
-        'classes': [int(c) for c in xgb_aspirin.classes_]
-    }
-    
-    xgb_heparin_params = {
-        'feature_importances': xgb_heparin.feature_importances_.tolist(),
-        'classes': [int(c) for c in xgb_heparin.classes_]
-    }
-    
     # Create model export object
     model_export = {
         'scaler': scaler_params,
-        'logistic_regression': {
-            'aspirin': lr_aspirin_params,
-            'heparin': lr_heparin_params
-        },
-        'svm': {
-            'aspirin': svm_aspirin_params,
-            'heparin': svm_heparin_params
-        },
-        'random_forest': {
-            'aspirin': rf_aspirin_params,
-            'heparin': rf_heparin_params
-        },
-        'xgboost': {
-            'aspirin': xgb_aspirin_params,
-            'heparin': xgb_heparin_params
-        },
         'metadata': {
             'export_date': str(np.datetime64('now')),
             'feature_names': feature_names,
@@ -157,16 +69,121 @@ def export_models_to_js():
         }
     }
     
+    # Trained models by display name, for the sample predictions below
+    trained = {}
+    
+    print("Training models...")
+    
+    # 1. Logistic Regression
+    if 'logistic_regression' in algorithms:
+        from sklearn.linear_model import LogisticRegression
+        lr_aspirin = LogisticRegression(max_iter=1000)
+        lr_heparin = LogisticRegression(max_iter=1000)
+        lr_aspirin.fit(X_train_scaled, y_aspirin_train)
+        lr_heparin.fit(X_train_scaled, y_heparin_train)
+        
+        model_export['logistic_regression'] = {
+            'aspirin': {
+                'coefficients': lr_aspirin.coef_[0].tolist(),
+                'intercept': lr_aspirin.intercept_[0].tolist(),
+                'classes': lr_aspirin.classes_.tolist()
+            },
+            'heparin': {
+                'coefficients': lr_heparin.coef_[0].tolist(),
+                'intercept': lr_heparin.intercept_[0].tolist(),
+                'classes': lr_heparin.classes_.tolist()
+            }
+        }
+        joblib.dump(lr_aspirin, 'models/lr_aspirin.pkl')
+        joblib.dump(lr_heparin, 'models/lr_heparin.pkl')
+        trained['Logistic Regression'] = (lr_aspirin, lr_heparin)
+    
+    # 2. Random Forest - extract decision trees (simplified)
+    # For browser use, we'll use a simplified version with feature importances
+    if 'random_forest' in algorithms:
+        from sklearn.ensemble import RandomForestClassifier
+        rf_aspirin = RandomForestClassifier(n_estimators=100, random_state=42)
+        rf_heparin = RandomForestClassifier(n_estimators=100, random_state=42)
+        rf_aspirin.fit(X_train_scaled, y_aspirin_train)
+        rf_heparin.fit(X_train_scaled, y_heparin_train)
+        
+        model_export['random_forest'] = {
+            'aspirin': {
+                'feature_importances': rf_aspirin.feature_importances_.tolist(),
+                'n_estimators': rf_aspirin.n_estimators,
+                'classes': rf_aspirin.classes_.tolist()
+            },
+            'heparin': {
+                'feature_importances': rf_heparin.feature_importances_.tolist(),
+                'n_estimators': rf_heparin.n_estimators,
+                'classes': rf_heparin.classes_.tolist()
+            }
+        }
+        trained['Random Forest'] = (rf_aspirin, rf_heparin)
+    
+    # 3. SVM parameters (for RBF kernel)
+    if 'svm' in algorithms:
+        from sklearn.svm import SVC
+        svm_aspirin = SVC(kernel='rbf', probability=True, random_state=42)
+        svm_heparin = SVC(kernel='rbf', probability=True, random_state=42)
+        svm_aspirin.fit(X_train_scaled, y_aspirin_train)
+        svm_heparin.fit(X_train_scaled, y_heparin_train)
+        
+        model_export['svm'] = {
+            'aspirin': {
+                'support_vectors': svm_aspirin.support_vectors_.tolist(),
+                'dual_coef': svm_aspirin.dual_coef_[0].tolist(),
+                'intercept': svm_aspirin.intercept_[0].tolist(),
+                'gamma': float(svm_aspirin._gamma) if hasattr(svm_aspirin, '_gamma') else 'auto',
+                'classes': svm_aspirin.classes_.tolist()
+            },
+            'heparin': {
+                'support_vectors': svm_heparin.support_vectors_.tolist(),
+                'dual_coef': svm_heparin.dual_coef_[0].tolist(),
+                'intercept': svm_heparin.intercept_[0].tolist(),
+                'gamma': float(svm_heparin._gamma) if hasattr(svm_heparin, '_gamma') else 'auto',
+                'classes': svm_heparin.classes_.tolist()
+            }
+        }
+        joblib.dump(svm_aspirin, 'models/svm_aspirin.pkl')
+        joblib.dump(svm_heparin, 'models/svm_heparin.pkl')
+        trained['SVM'] = (svm_aspirin, svm_heparin)
+    
+    # 4. XGBoost - extract feature importances
+    if 'xgboost' in algorithms:
+        xgb_aspirin = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
+        xgb_heparin = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
+        xgb_aspirin.fit(X_train_scaled, y_aspirin_train)
+        xgb_heparin.fit(X_train_scaled, y_heparin_train)
+        
+        model_export['xgboost'] = {
+            'aspirin': {
+                'feature_importances': xgb_aspirin.feature_importances_.tolist(),
+                'classes': [int(c) for c in xgb_aspirin.classes_]
+            },
+            'heparin': {
+                'feature_importances': xgb_heparin.feature_importances_.tolist(),
+                'classes': [int(c) for c in xgb_heparin.classes_]
+            }
+        }
+        trained['XGBoost'] = (xgb_aspirin, xgb_heparin)
+    
     # Save to JSON file
     with open('models/model_parameters.json', 'w') as f:
         json.dump(model_export, f)
+    # Precompressed variant for the API's /artifacts route
+    raw, compressed = precompress('models/model_parameters.json')
+    print(f"Model parameters: {raw / 1024:.1f} kB, {compressed / 1024:.1f} kB gzipped")
+    
+    # Save the scaler for the svm_*/lr_* pickles under its own name:
+    # models/scaler.pkl belongs to simple_setup.py's differently split models
+    joblib.dump(scaler, 'models/export_scaler.pkl')
     
-    # Also save the full models using joblib for backup
-    joblib.dump(scaler, 'models/scaler.pkl')
-    joblib.dump(lr_aspirin, 'models/lr_aspirin.pkl')
-    joblib.dump(lr_heparin, 'models/lr_heparin.pkl')
-    joblib.dump(svm_aspirin, 'models/svm_aspirin.pkl')
-    joblib.dump(svm_heparin, 'models/svm_heparin.pkl')
+    # Keep an existing shared bundle in sync with the new pickles; the
+    # registry prefers the bundle's export_svm/export_lr entries
+    if os.path.exists(model_store.bundle_path('models')):
+        model_store.build_bundle('models')
+        print("Shared model bundle rebuilt")
     
     # Test predictions on a sample
     sample_patient = X_test.iloc[0].values
@@ -177,17 +194,16 @@ def export_models_to_js():
         print(f"{feature}: {sample_patient[i]}")
     
     print("\nModel predictions for sample patient:")
-    print(f"Logistic Regression - Aspirin: {lr_aspirin.predict_proba(sample_scaled)[0][1]:.4f}")
-    print(f"Logistic Regression - Heparin: {lr_heparin.predict_proba(sample_scaled)[0][1]:.4f}")
-    print(f"SVM - Aspirin: {svm_aspirin.predict_proba(sample_scaled)[0][1]:.4f}")
-    print(f"SVM - Heparin: {svm_heparin.predict_proba(sample_scaled)[0][1]:.4f}")
-    print(f"Random Forest - Aspirin: {rf_aspirin.predict_proba(sample_scaled)[0][1]:.4f}")
-    print(f"Random Forest - Heparin: {rf_heparin.predict_proba(sample_scaled)[0][1]:.4f}")
-    print(f"XGBoost - Aspirin: {xgb_aspirin.predict_proba(sample_scaled)[0][1]:.4f}")
-    print(f"XGBoost - Heparin: {xgb_heparin.predict_proba(sample_scaled)[0][1]:.4f}")
+    for name, (aspirin_model, heparin_model) in trained.items():
+        print(f"{name} - Aspirin: {aspirin_model.predict_proba(sample_scaled)[0][1]:.4f}")
+        print(f"{name} - Heparin: {heparin_model.predict_proba(sample_scaled)[0][1]:.4f}")
     
     print("\n✅ Models exported successfully to 'models/model_parameters.json'")
     print("You can now use these models in your web application!")
 
 if __name__ == "__main__":
-    export_models_to_js()
+    parser = argparse.ArgumentParser(description='Export trained models for browser use')
+    parser.add_argument('--algorithms', nargs='+', choices=ALGORITHMS, default=ALGORITHMS,
+                        help='algorithms to train and export (default: all)')
+    args = parser.parse_args()
+    export_models_to_js(args.algorithms)
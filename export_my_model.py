@@ -1,9 +1,22 @@
+import argparse
 import pickle
 import json
 import numpy as np
+from numpy_inference import PRECISIONS, RBFSVM, parity_report
+from artifacts import precompress
 
-def export_svm_model():
-    """Export your trained SVM models to JavaScript format"""
+def load_dataset_features(csv_path, feature_names):
+    """Feature matrix for every row of the clinical CSV"""
+    data = np.genfromtxt(csv_path, delimiter=',', names=True)
+    return np.column_stack([data[name] for name in feature_names])
+
+def export_svm_model(precision='float64', csv_path='new heart clinical.csv'):
+    """Export your trained SVM models to JavaScript format
+    
+    precision is 'float64', 'float32' or 'int8' (per-feature scales).
+    A parity report against the original models over the whole dataset is
+    written to parity_report.json.
+    """
     try:
         # Load your trained models
         print("Loading your trained models...")
@@ -25,22 +38,29 @@ def export_svm_model():
         # For SVM models, we need to extract the decision function parameters
         # This is more complex for RBF kernel SVMs
         
+        X_scaled = scaler.transform(load_dataset_features(csv_path, feature_names))
+        parity = {}
+        
         def extract_svm_params(model, model_name):
+            # gamma='scale' is resolved to its fitted value in _gamma
+            variant = RBFSVM.from_sklearn(model, precision)
             params = {
                 'model_type': 'SVM',
                 'kernel': 'rbf',  # Assuming RBF kernel
-                'n_support': model.n_support_.tolist() if hasattr(model, 'n_support_') else [],
-                'support_vectors': model.support_vectors_.tolist() if hasattr(model, 'support_vectors_') else [],
-                'dual_coef': model.dual_coef_.tolist() if hasattr(model, 'dual_coef_') else [],
-                'intercept': model.intercept_.tolist() if hasattr(model, 'intercept_') else [],
-                'gamma': float(model.gamma) if hasattr(model, 'gamma') else 'scale',
-                'classes': model.classes_.tolist() if hasattr(model, 'classes_') else [0, 1]
+                'n_support': model.n_support_.tolist() if hasattr(model, 'n_support_') else []
             }
+            params.update(variant.to_params())
+            
+            # Check the exported parameters, not just the in-memory variant
+            parity[model_name.lower()] = parity_report(model, RBFSVM.from_params(params), X_scaled)
             
             print(f"{model_name} model parameters extracted:")
             print(f"  - Support vectors: {len(params['support_vectors'])}")
             print(f"  - Gamma: {params['gamma']}")
             print(f"  - Intercept: {params['intercept']}")
+            print(f"  - Precision: {precision}, max probability difference "
+                  f"{parity[model_name.lower()]['max_probability_difference']:.2e}, "
+                  f"{parity[model_name.lower()]['recommendation_flips']} recommendation flips")
             
             return params
         
@@ -67,16 +87,26 @@ def export_svm_model():
             'metadata': {
                 'export_date': str(np.datetime64('now')),
                 'model_version': '1.0',
+                'precision': precision,
                 'description': 'Exported SVM models for heart treatment prediction'
             }
         }
         
-        # Save to JSON file
+        # Save to JSON file; compact, since browsers download every byte
         with open('model_parameters.json', 'w') as f:
-            json.dump(model_export, f, indent=2)
+            json.dump(model_export, f, separators=(',', ':'))
+        
+        with open('parity_report.json', 'w') as f:
+            json.dump(parity, f, indent=2)
+        
+        # Precompressed variants for the API's /artifacts route
+        raw, compressed = precompress('model_parameters.json')
+        precompress('parity_report.json')
         
         print("\n✅ SUCCESS!")
-        print("Model parameters exported to 'model_parameters.json'")
+        print(f"Model parameters exported to 'model_parameters.json' ({raw / 1024:.1f} kB, "
+              f"{compressed / 1024:.1f} kB gzipped)")
+        print("Parity report written to 'parity_report.json'")
         print("You can now use this file with your JavaScript website!")
         
         return True
@@ -90,4 +120,8 @@ def export_svm_model():
 if __name__ == "__main__":
     print("Heart Treatment Model Exporter")
     print("=" * 40)
-    export_svm_model()
+    parser = argparse.ArgumentParser(description='Export the trained SVM models for JavaScript')
+    parser.add_argument('--precision', choices=PRECISIONS, default='float64',
+                        help='storage precision for support vectors and coefficients')
+    args = parser.parse_args()
+    export_svm_model(args.precision)
@@ -0,0 +1,106 @@
+import gzip
+import json
+
+import numpy as np
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TARGETS = ['aspirin', 'heparin']
+
+# Responses at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = 16384
+GZIP_LEVEL = 5
+
+def _default(obj):
+    """Fallback conversions for the standard library encoder"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj):
+    """Serialize to UTF-8 bytes; NumPy arrays are written without a Python list in between.
+
+    Uses orjson when it is installed and the standard library otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+def json_response(obj, status=200):
+    """A Flask JSON response, gzipped when it is large and the client accepts it"""
+    body = dumps(obj)
+    response = Response(body, status=status, mimetype='application/json')
+    if len(body) >= GZIP_MIN_BYTES and request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+    return response
+
+def confidence(scores, target):
+    probability = scores[f'{target}_probability']
+    return np.where(scores[f'{target}_recommendation'], probability, 1 - probability)
+
+def prediction_rows(scores):
+    """Per-patient prediction dicts from predict_batch() arrays.
+
+    Each array is converted to Python values with one tolist() call
+    instead of a float()/bool() call per value.  Scores from a cascade
+    also name the stage that answered each target.
+    """
+    columns = []
+    for target in TARGETS:
+        columns.append(zip(
+            scores[f'{target}_probability'].tolist(),
+            scores[f'{target}_recommendation'].tolist(),
+            confidence(scores, target).tolist()
+        ))
+    rows = [
+        {
+            target: {'probability': p, 'recommendation': r, 'confidence': c}
+            for target, (p, r, c) in zip(TARGETS, row)
+        }
+        for row in zip(*columns)
+    ]
+    for target in TARGETS:
+        if f'{target}_stage' in scores:
+            for row, stage in zip(rows, scores[f'{target}_stage'].tolist()):
+                row[target]['stage'] = stage
+    return rows
+
+def columnar_predictions(scores, valid_rows, count):
+    """One array per field for a batch of count patients.
+
+    Rows that failed validation are null.  When every row is valid the
+    NumPy arrays are handed to the encoder as they are.  scores is None
+    when no row was valid.
+    """
+    columns = {}
+    for target in TARGETS:
+        if scores is None:
+            for field in ('probability', 'recommendation', 'confidence'):
+                columns[f'{target}_{field}'] = [None] * count
+            continue
+        fields = {
+            'probability': scores[f'{target}_probability'],
+            'recommendation': scores[f'{target}_recommendation'],
+            'confidence': confidence(scores, target)
+        }
+        if f'{target}_stage' in scores:
+            fields['stage'] = scores[f'{target}_stage']
+        for field, values in fields.items():
+            if len(valid_rows) == count:
+                # orjson only writes contiguous arrays directly; [:, 1] slices are not
+                columns[f'{target}_{field}'] = np.ascontiguousarray(values)
+            else:
+                column = [None] * count
+                for row, value in zip(valid_rows, values.tolist()):
+                    column[row] = value
+                columns[f'{target}_{field}'] = column
+    return columns
@@ -0,0 +1,382 @@
+"""Server-side patient features, keyed by patient_id.
+
+Patients are kept in SQLite (primary-key index on patient_id) with an
+in-process LRU of recently used patients in front of it, so clients can
+send an ID instead of all 12 features.  The store can also hold the
+default model's predictions for every stored patient, recomputed when
+the models change.
+
+Import patients from a CSV in the training format with:
+    python feature_store.py import patients.csv --id-column patient_id
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from patient_schema import PatientSchema
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = os.environ.get('HEART_FEATURE_DB', os.path.join('store', 'patients.db'))
+
+# Patients kept in memory per process (0 turns the hot tier off)
+HOT_PATIENTS = int(os.environ.get('HEART_FEATURE_CACHE', '10000'))
+
+# IDs per IN (...) query, below SQLite's default variable limit
+LOOKUP_CHUNK = 500
+
+# Rows read, validated and written per transaction by import and refresh
+WRITE_CHUNK = 5000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id TEXT PRIMARY KEY,
+    features BLOB NOT NULL,
+    updated TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS predictions (
+    patient_id TEXT PRIMARY KEY,
+    model_key TEXT NOT NULL,
+    aspirin_probability REAL NOT NULL,
+    aspirin_recommendation INTEGER NOT NULL,
+    heparin_probability REAL NOT NULL,
+    heparin_recommendation INTEGER NOT NULL,
+    computed TEXT NOT NULL
+) WITHOUT ROWID;
+'''
+
+UPSERT_PATIENT = '''
+INSERT INTO patients (patient_id, features, updated) VALUES (?, ?, ?)
+ON CONFLICT (patient_id) DO UPDATE SET features = excluded.features, updated = excluded.updated
+'''
+
+UPSERT_PREDICTION = '''
+INSERT OR REPLACE INTO predictions (
+    patient_id, model_key, aspirin_probability, aspirin_recommendation,
+    heparin_probability, heparin_recommendation, computed
+) VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+def connect(db_path):
+    """Open the store, creating the tables if needed"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    # WAL lets every worker read while one imports or refreshes
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class FeatureStore:
+    """Validated feature rows by patient_id, with an LRU hot tier.
+
+    Rows are stored as float64 blobs in feature_names order; the order is
+    recorded in the database and a store written for other features is
+    refused.  Lookups take the hot tier first and fetch every miss with
+    one indexed IN (...) query per LOOKUP_CHUNK IDs.  The hot tier is
+    dropped whenever another process has committed a change, which
+    SQLite's data_version pragma reports.  The database file is only
+    created by the first write, so a server without a store pays nothing.
+    """
+    def __init__(self, db_path=DEFAULT_DB, hot_patients=HOT_PATIENTS):
+        self.db_path = db_path
+        self.hot_patients = hot_patients
+        self.feature_names = None
+        self.hot = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        self._data_version = None
+        self._lock = threading.RLock()
+
+    def open(self, feature_names):
+        """Set the feature order; raises ValueError if the store was written with another"""
+        with self._lock:
+            self.feature_names = list(feature_names)
+            self.hot.clear()
+            if os.path.exists(self.db_path):
+                try:
+                    self._check_features(self._connect())
+                except ValueError:
+                    self.feature_names = None
+                    raise
+
+    @property
+    def available(self):
+        return self.feature_names is not None
+
+    def _connect(self):
+        # Connections do not survive fork, so each process opens its own
+        if self._pid != os.getpid():
+            self._connection = connect(self.db_path)
+            self._pid = os.getpid()
+            self._data_version = None
+        return self._connection
+
+    def _check_features(self, connection):
+        row = connection.execute("SELECT value FROM meta WHERE key = 'feature_names'").fetchone()
+        if row is None:
+            with connection:
+                connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('feature_names', ?)",
+                                   (json.dumps(self.feature_names),))
+        elif json.loads(row[0]) != self.feature_names:
+            raise ValueError(f"Feature store {self.db_path} holds features {json.loads(row[0])}, "
+                             f"not {self.feature_names}")
+
+    def _sync(self, connection):
+        """Drop the hot tier if another connection has changed the database"""
+        version = connection.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._data_version:
+            self.hot.clear()
+            self._data_version = version
+
+    def _remember(self, patient_id, row):
+        if self.hot_patients <= 0:
+            return
+        self.hot[patient_id] = row
+        self.hot.move_to_end(patient_id)
+        while len(self.hot) > self.hot_patients:
+            self.hot.popitem(last=False)
+
+    def put_many(self, patient_ids, X):
+        """Insert or replace validated (n, 12) rows; their stored predictions are dropped"""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        ids = [str(patient_id) for patient_id in patient_ids]
+        now = datetime.now().isoformat()
+        with self._lock:
+            connection = self._connect()
+            self._check_features(connection)
+            with connection:
+                connection.executemany(UPSERT_PATIENT, ((patient_id, row.tobytes(), now)
+                                                        for patient_id, row in zip(ids, X)))
+                for chunk in _chunks(ids, LOOKUP_CHUNK):
+                    connection.execute(f"DELETE FROM predictions WHERE patient_id IN "
+                                       f"({','.join('?' * len(chunk))})", chunk)
+            self._sync(connection)
+            for patient_id, row in zip(ids, X):
+                self._remember(patient_id, row.copy())
+        return len(ids)
+
+    def get_many(self, patient_ids):
+        """Features for the given IDs in request order.
+
+        Returns (X, found) where found lists the positions in patient_ids
+        that are stored and X holds their rows.
+        """
+        ids = [str(patient_id) for patient_id in patient_ids]
+        rows = {}
+        with self._lock:
+            if os.path.exists(self.db_path):
+                connection = self._connect()
+                self._sync(connection)
+                unique = list(dict.fromkeys(ids))
+                missing = []
+                for patient_id in unique:
+                    row = self.hot.get(patient_id)
+                    if row is None:
+                        missing.append(patient_id)
+                    else:
+                        self.hot.move_to_end(patient_id)
+                        rows[patient_id] = row
+                self.hits += len(unique) - len(missing)
+                self.misses += len(missing)
+                for chunk in _chunks(missing, LOOKUP_CHUNK):
+                    query = f"SELECT patient_id, features FROM patients WHERE patient_id IN ({','.join('?' * len(chunk))})"
+                    for patient_id, blob in connection.execute(query, chunk):
+                        row = np.frombuffer(blob, dtype=np.float64)
+                        rows[patient_id] = row
+                        self._remember(patient_id, row)
+        found = [i for i, patient_id in enumerate(ids) if patient_id in rows]
+        X = np.array([rows[ids[i]] for i in found], dtype=np.float64).reshape(-1, len(self.feature_names))
+        return X, found
+
+    def import_csv(self, csv_path, id_column='patient_id', chunk_rows=WRITE_CHUNK):
+        """Load patients from a CSV with the 12 feature columns.
+
+        Rows failing validation are skipped and counted.  Without an
+        id_column the 1-based row number is the patient_id.  Returns
+        {'imported', 'skipped', 'errors'} with the first errors found.
+        """
+        import pandas as pd
+
+        schema = PatientSchema(self.feature_names)
+        imported = skipped = 0
+        errors = []
+        offset = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            missing = [name for name in self.feature_names if name not in chunk.columns]
+            if missing:
+                raise ValueError(f"{csv_path} has no column for {missing}")
+            if id_column in chunk.columns:
+                ids = chunk[id_column].astype(str).tolist()
+            else:
+                ids = [str(offset + i + 1) for i in range(len(chunk))]
+            X, row_errors = schema.coerce(chunk[self.feature_names].to_dict('records'))
+            bad = {error['row'] for error in row_errors}
+            for error in row_errors[:max(0, 20 - len(errors))]:
+                errors.append({**error, 'patient_id': ids[error['row']], 'row': offset + error['row'] + 1})
+            good = [i for i in range(len(chunk)) if i not in bad]
+            if good:
+                imported += self.put_many([ids[i] for i in good], X[good])
+            skipped += len(bad)
+            offset += len(chunk)
+        return {'imported': imported, 'skipped': skipped, 'errors': errors}
+
+    def predictions(self, patient_ids, model_key):
+        """Stored predictions computed with model_key, by patient_id (others are absent)"""
+        ids = list(dict.fromkeys(str(patient_id) for patient_id in patient_ids))
+        stored = {}
+        with self._lock:
+            if not os.path.exists(self.db_path):
+                return stored
+            connection = self._connect()
+            for chunk in _chunks(ids, LOOKUP_CHUNK):
+                query = (f"SELECT patient_id, aspirin_probability, aspirin_recommendation, heparin_probability, "
+                         f"heparin_recommendation FROM predictions WHERE model_key = ? AND patient_id IN "
+                         f"({','.join('?' * len(chunk))})")
+                for patient_id, *values in connection.execute(query, [model_key, *chunk]):
+                    stored[patient_id] = values
+        return stored
+
+    def refresh_predictions(self, score, model_key, force=False, chunk_rows=WRITE_CHUNK):
+        """Compute the missing or stale predictions with score(X) -> predict_batch() arrays.
+
+        Unless forced, only one process refreshes a given model_key: the
+        first to record it in the meta table, so workers loading the same
+        new models do not all rescore the store.  Rows are written a chunk
+        at a time; readers fall back to scoring until their rows are
+        fresh.  Returns the rows written, or None if another process has
+        the refresh.
+        """
+        with self._lock:
+            if not os.path.exists(self.db_path):
+                return None
+            connection = self._connect()
+            with connection:
+                claimed = connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('predictions_key', ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value WHERE value != excluded.value",
+                    (model_key,)).rowcount
+            if not claimed and not force:
+                return None
+            ids = [row[0] for row in connection.execute(
+                'SELECT patients.patient_id FROM patients LEFT JOIN predictions '
+                'ON predictions.patient_id = patients.patient_id AND predictions.model_key = ? '
+                'WHERE predictions.patient_id IS NULL', (model_key,))]
+
+        written = 0
+        for chunk in _chunks(ids, chunk_rows):
+            X, found = self.get_many(chunk)
+            if not found:
+                continue
+            written += self.put_predictions([chunk[i] for i in found], score(X), model_key)
+        logger.info(f"Stored predictions refreshed for {written} patients ({model_key})")
+        return written
+
+    def release_predictions(self):
+        """Let the next model load refresh the store again, e.g. after an import"""
+        with self._lock:
+            if os.path.exists(self.db_path):
+                connection = self._connect()
+                with connection:
+                    connection.execute("DELETE FROM meta WHERE key = 'predictions_key'")
+
+    def put_predictions(self, patient_ids, scores, model_key):
+        """Store predict_batch() arrays for stored patients, computed with model_key"""
+        now = datetime.now().isoformat()
+        rows = zip([str(patient_id) for patient_id in patient_ids],
+                   scores['aspirin_probability'].tolist(), scores['aspirin_recommendation'].tolist(),
+                   scores['heparin_probability'].tolist(), scores['heparin_recommendation'].tolist())
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(UPSERT_PREDICTION, (
+                    (patient_id, model_key, ap, int(ar), hp, int(hr), now)
+                    for patient_id, ap, ar, hp, hr in rows))
+        return len(patient_ids)
+
+    def stats(self, model_key=None):
+        """Store size, hot-tier hit rate and how many patients have predictions for model_key"""
+        with self._lock:
+            stats = {
+                'db_path': self.db_path,
+                'hot_patients': len(self.hot),
+                'hot_capacity': self.hot_patients,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / (self.hits + self.misses) if self.hits + self.misses else None,
+                'patients': 0,
+                'model_key': model_key,
+                'fresh_predictions': 0
+            }
+            if os.path.exists(self.db_path):
+                connection = self._connect()
+                stats['patients'] = connection.execute('SELECT COUNT(*) FROM patients').fetchone()[0]
+                if model_key is None:
+                    row = connection.execute("SELECT value FROM meta WHERE key = 'predictions_key'").fetchone()
+                    model_key = stats['model_key'] = row[0] if row else None
+                stats['fresh_predictions'] = connection.execute(
+                    'SELECT COUNT(*) FROM predictions WHERE model_key = ?', (model_key,)).fetchone()[0]
+            return stats
+
+def stored_scores(stored, patient_ids):
+    """predict_batch()-style arrays from FeatureStore.predictions() rows for patient_ids"""
+    values = np.array([stored[str(patient_id)] for patient_id in patient_ids], dtype=float).reshape(-1, 4)
+    return {
+        'aspirin_probability': values[:, 0],
+        'aspirin_recommendation': values[:, 1].astype(bool),
+        'heparin_probability': values[:, 2],
+        'heparin_recommendation': values[:, 3].astype(bool)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the patient feature store')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--models-dir', default='models')
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('import', help='import patients from a CSV')
+    load.add_argument('csv')
+    load.add_argument('--id-column', default='patient_id',
+                      help='column holding the patient ID (default patient_id; row numbers if absent)')
+    commands.add_parser('stats', help='patients stored and prediction freshness')
+    args = parser.parse_args()
+
+    with open(os.path.join(args.models_dir, 'feature_names.pkl'), 'rb') as f:
+        feature_names = pickle.load(f)
+    store = FeatureStore(args.db, hot_patients=0)
+    store.open(feature_names)
+
+    if args.command == 'import':
+        print(f"Importing patients from {args.csv}")
+        print("=" * 60)
+        report = store.import_csv(args.csv, args.id_column)
+        store.release_predictions()
+        for error in report['errors']:
+            print(f"  row {error['row']} ({error['patient_id']}): {error['field']} {error['error']}")
+        print(f"✓ {report['imported']} patients imported to {args.db}, {report['skipped']} skipped")
+        print("  Their predictions are stored when the API next loads its models, "
+              "or now with POST /admin/feature-store {\"refresh\": true}")
+    else:
+        print(json.dumps(store.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""gunicorn settings for the heart treatment prediction API.
+
+Values come from serving_config.json and HEART_* environment variables,
+see serving.py.  Usage: gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import gc
+import sys
+
+import serving
+
+_config = serving.load_config()
+
+bind = _config['bind']
+workers = _config['workers']
+threads = _config['threads']
+worker_class = 'gthread'
+timeout = _config['worker_timeout']
+
+# Load models in the master so workers share them copy-on-write
+preload_app = True
+
+def when_ready(server):
+    # Keep the garbage collector from touching (and so copying) the
+    # preloaded model objects in every worker
+    gc.freeze()
+
+def post_fork(server, worker):
+    # The master's warm-up readiness is inherited, its warm thread pools
+    # and touched pages are not: warm up again before this worker serves
+    app_module = sys.modules.get(_config['app'])
+    if app_module is not None:
+        app_module.predictor.warm_up_worker()
+    serving.scoring_pool.start(_config['scoring_processes'], _config['scoring_timeout'])
+
+def worker_exit(server, worker):
+    serving.scoring_pool.shutdown()
@@ -0,0 +1,298 @@
+import argparse
+import copy
+import json
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: waitress serves from one process, so the thread lock is enough
+    fcntl = None
+
+import numpy as np
+
+import model_store
+from patient_schema import PatientSchema, SchemaError
+
+STATE_FILE = 'update_state.json'
+LOCK_FILE = 'update.lock'
+NEW_ROWS_FILE = 'new_outcomes.csv'
+TARGETS = ['aspirin', 'heparin']
+
+# Fall back to a full retrain after this many incrementally added rows,
+# or when holdout accuracy drops this far below the last full retrain
+DEFAULT_MAX_INCREMENTAL_ROWS = 200
+DEFAULT_MAX_ACCURACY_DROP = 0.05
+
+_thread_lock = threading.Lock()
+
+@contextmanager
+def update_lock(models_dir):
+    """Hold the update lock for models_dir.
+
+    An flock on models/update.lock serialises updates across gunicorn
+    workers and the command line; closing the file releases it.
+    """
+    with _thread_lock:
+        with open(os.path.join(models_dir, LOCK_FILE), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+def load_state(models_dir):
+    path = os.path.join(models_dir, STATE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'rows_since_full': 0, 'full_retrain': None, 'updates': []}
+
+def save_state(models_dir, state):
+    with open(os.path.join(models_dir, STATE_FILE), 'w') as f:
+        json.dump(state, f, indent=2)
+
+def load_models(models_dir):
+    models = {}
+    for name in ('scaler', 'aspirin_model', 'heparin_model', 'feature_names'):
+        with open(os.path.join(models_dir, f'{name}.pkl'), 'rb') as f:
+            models[name] = pickle.load(f)
+    return models
+
+def save_models(models_dir, models):
+    """Write the models in the layout simple_setup.py produces.
+
+    Each file is written to a temporary name and moved into place, so a
+    server reloading meanwhile never reads a partly written pickle.
+    """
+    for name in ('scaler', 'aspirin_model', 'heparin_model'):
+        path = os.path.join(models_dir, f'{name}.pkl')
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump(models[name], f)
+        os.replace(temporary, path)
+    # Keep an existing joint model and shared bundle in sync with the new pickles
+    if os.path.exists(model_store.joint_path(models_dir)):
+        model_store.build_joint(models_dir)
+    if os.path.exists(model_store.bundle_path(models_dir)):
+        model_store.build_bundle(models_dir)
+
+def parse_rows(rows, feature_names):
+    """Validate labelled rows (dicts with the 12 features plus aspirin/heparin)"""
+    X, errors = PatientSchema(feature_names).coerce(rows)
+    for i, row in enumerate(rows):
+        for target in TARGETS:
+            if not isinstance(row, dict) or row.get(target) not in (0, 1, '0', '1', True, False):
+                errors.append({'row': i, 'field': target, 'error': 'label must be 0 or 1'})
+    if errors:
+        raise SchemaError(sorted(errors, key=lambda e: e['row']))
+    labels = {target: np.array([int(row[target]) for row in rows]) for target in TARGETS}
+    return X, labels
+
+def holdout_split(csv_path, feature_names):
+    """The train/test split used by simple_setup.py"""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(csv_path)
+    X = df[feature_names].to_numpy(dtype=float)
+    split = train_test_split(X, df['aspirin'].to_numpy(), df['heparin'].to_numpy(),
+                             test_size=0.2, random_state=42, stratify=df['aspirin'])
+    X_train, X_test, ya_train, ya_test, yh_train, yh_test = split
+    return X_train, {'aspirin': ya_train, 'heparin': yh_train}, X_test, {'aspirin': ya_test, 'heparin': yh_test}
+
+def merge_scaler(scaler, X_new):
+    """Fold new rows into the scaler's running mean and variance.
+
+    StandardScaler.partial_fit merges the new batch statistics with
+    n_samples_seen_ (Chan et al.), so the old rows are not needed.
+    """
+    scaler = copy.deepcopy(scaler)
+    scaler.partial_fit(X_new)
+    return scaler
+
+def update_svm(model, old_scaler, new_scaler, X_new, y_new):
+    """Refit an SVC on its own support vectors plus the new rows.
+
+    The support vectors are the only old rows that shape the decision
+    function, so they stand in for the full history.  They are moved into
+    the new scaler's space and gamma is pinned to the trained value, since
+    gamma='scale' would otherwise be recomputed from this small set.
+    """
+    from sklearn.base import clone
+
+    # For a binary SVC the sign of dual_coef_ gives each vector's class
+    sv_labels = model.classes_[(model.dual_coef_[0] > 0).astype(int)]
+    sv_raw = old_scaler.inverse_transform(model.support_vectors_)
+
+    X = np.vstack([new_scaler.transform(sv_raw), new_scaler.transform(X_new)])
+    y = np.concatenate([sv_labels, y_new])
+
+    updated = clone(model).set_params(gamma=model._gamma)
+    updated.fit(X, y)
+    return updated
+
+def full_retrain(X_train, labels):
+    """Retrain scaler and both SVMs from scratch, as simple_setup.py does"""
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.svm import SVC
+
+    scaler = StandardScaler().fit(X_train)
+    X_scaled = scaler.transform(X_train)
+    models = {'scaler': scaler}
+    for target in TARGETS:
+        model = SVC(kernel='rbf', C=1.0, gamma='scale', probability=True, random_state=42)
+        models[f'{target}_model'] = model.fit(X_scaled, labels[target])
+    return models
+
+def evaluate(models, X_test, labels):
+    """Holdout accuracy and probabilities for both targets"""
+    X_scaled = models['scaler'].transform(X_test)
+    metrics = {}
+    probabilities = {}
+    for target in TARGETS:
+        model = models[f'{target}_model']
+        metrics[f'{target}_accuracy'] = float(np.mean(model.predict(X_scaled) == labels[target]))
+        probabilities[target] = model.predict_proba(X_scaled)[:, 1]
+    return metrics, probabilities
+
+def compare(models, reference, X_test, labels):
+    """How far the incrementally updated models drift from a full retrain"""
+    metrics, probabilities = evaluate(models, X_test, labels)
+    ref_metrics, ref_probabilities = evaluate(reference, X_test, labels)
+    drift = {}
+    for target in TARGETS:
+        drift[target] = {
+            'accuracy': metrics[f'{target}_accuracy'],
+            'full_retrain_accuracy': ref_metrics[f'{target}_accuracy'],
+            'max_probability_difference': float(np.max(np.abs(probabilities[target] - ref_probabilities[target]))),
+            'agreement': float(np.mean((probabilities[target] >= 0.5) == (ref_probabilities[target] >= 0.5)))
+        }
+    return drift
+
+def append_rows(models_dir, rows, feature_names):
+    """Keep every labelled row so a full retrain can include it"""
+    import csv
+
+    path = os.path.join(models_dir, NEW_ROWS_FILE)
+    columns = feature_names + TARGETS
+    write_header = not os.path.exists(path)
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+
+def load_appended_rows(models_dir, feature_names):
+    import pandas as pd
+
+    path = os.path.join(models_dir, NEW_ROWS_FILE)
+    if not os.path.exists(path):
+        return np.empty((0, len(feature_names))), {target: np.empty(0, dtype=int) for target in TARGETS}
+    df = pd.read_csv(path)
+    return df[feature_names].to_numpy(dtype=float), {target: df[target].to_numpy() for target in TARGETS}
+
+def update(rows, models_dir='models', csv_path='new heart clinical.csv',
+           max_incremental_rows=DEFAULT_MAX_INCREMENTAL_ROWS,
+           max_accuracy_drop=DEFAULT_MAX_ACCURACY_DROP, compare_full=False):
+    """Fold newly labelled rows into the saved models.
+
+    Returns a report with the mode used ('incremental' or 'full'), the
+    holdout metrics and, when compared, the drift from a full retrain.
+    One update runs at a time per models_dir, across processes.
+    """
+    with update_lock(models_dir):
+        return _update(rows, models_dir, csv_path, max_incremental_rows, max_accuracy_drop, compare_full)
+
+def _update(rows, models_dir, csv_path, max_incremental_rows, max_accuracy_drop, compare_full):
+    models = load_models(models_dir)
+    feature_names = models['feature_names']
+    X_new, y_new = parse_rows(rows, feature_names)
+
+    state = load_state(models_dir)
+    append_rows(models_dir, rows, feature_names)
+    state['rows_since_full'] += len(rows)
+
+    X_train, train_labels, X_test, test_labels = holdout_split(csv_path, feature_names)
+
+    def retrain_everything():
+        X_extra, extra_labels = load_appended_rows(models_dir, feature_names)
+        X_all = np.vstack([X_train, X_extra])
+        labels_all = {t: np.concatenate([train_labels[t], extra_labels[t]]) for t in TARGETS}
+        return full_retrain(X_all, labels_all)
+
+    report = {'rows': len(rows), 'rows_since_full': state['rows_since_full']}
+
+    if state['full_retrain'] is None:
+        # Baseline for the drift check: the current models on the holdout
+        state['full_retrain'] = evaluate(models, X_test, test_labels)[0]
+
+    if state['rows_since_full'] > max_incremental_rows:
+        report['mode'] = 'full'
+        report['reason'] = f"more than {max_incremental_rows} rows since the last full retrain"
+        updated = retrain_everything()
+    else:
+        report['mode'] = 'incremental'
+        scaler = merge_scaler(models['scaler'], X_new)
+        updated = {'scaler': scaler}
+        for target in TARGETS:
+            updated[f'{target}_model'] = update_svm(
+                models[f'{target}_model'], models['scaler'], scaler, X_new, y_new[target])
+
+        metrics = evaluate(updated, X_test, test_labels)[0]
+        drops = {t: state['full_retrain'][f'{t}_accuracy'] - metrics[f'{t}_accuracy'] for t in TARGETS}
+        reference = None
+        if compare_full:
+            reference = retrain_everything()
+            report['drift'] = compare(updated, reference, X_test, test_labels)
+        if max(drops.values()) > max_accuracy_drop:
+            report['mode'] = 'full'
+            report['reason'] = f"holdout accuracy dropped by more than {max_accuracy_drop}"
+            updated = reference or retrain_everything()
+
+    report['metrics'] = evaluate(updated, X_test, test_labels)[0]
+    report['last_full_retrain_metrics'] = state['full_retrain']
+    if report['mode'] == 'full':
+        state['rows_since_full'] = 0
+        state['full_retrain'] = report['metrics']
+
+    updated['feature_names'] = feature_names
+    save_models(models_dir, updated)
+
+    report['timestamp'] = datetime.now().isoformat()
+    state['updates'] = (state['updates'] + [report])[-100:]
+    save_state(models_dir, state)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Fold newly labelled patients into the saved models')
+    parser.add_argument('rows_csv', help='CSV with the 12 features plus aspirin and heparin labels')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--csv', default='new heart clinical.csv', help='original training data')
+    parser.add_argument('--max-incremental-rows', type=int, default=DEFAULT_MAX_INCREMENTAL_ROWS)
+    parser.add_argument('--max-accuracy-drop', type=float, default=DEFAULT_MAX_ACCURACY_DROP)
+    parser.add_argument('--compare-full', action='store_true',
+                        help='also run a full retrain in memory to report drift')
+    args = parser.parse_args()
+
+    import pandas as pd
+    rows = pd.read_csv(args.rows_csv).to_dict(orient='records')
+
+    print("Incremental Model Update")
+    print("=" * 40)
+    report = update(rows, args.models_dir, args.csv, args.max_incremental_rows,
+                    args.max_accuracy_drop, args.compare_full)
+
+    print(f"Rows added: {report['rows']} ({report['rows_since_full']} since last full retrain)")
+    print(f"Mode: {report['mode']}" + (f" ({report['reason']})" if 'reason' in report else ''))
+    for target in TARGETS:
+        print(f"{target.capitalize()} holdout accuracy: {report['metrics'][f'{target}_accuracy']:.3f} "
+              f"(last full retrain {report['last_full_retrain_metrics'][f'{target}_accuracy']:.3f})")
+    for target, drift in report.get('drift', {}).items():
+        print(f"{target.capitalize()} vs full retrain: agreement {drift['agreement']:.3f}, "
+              f"max probability difference {drift['max_probability_difference']:.3f}")
+
+if __name__ == "__main__":
+    main()
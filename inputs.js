@@ -51,8 +51,10 @@ document.addEventListener("DOMContentLoaded", async () => {
       const selectedModel = document.querySelector('input[name="modelType"]:checked').value
       console.log("Selected model:", selectedModel)
 
-      // Set the active model
-      window.heartModels.setActiveModel(selectedModel)
+      // Set the active model; a partial export may not include it
+      if (!window.heartModels.setActiveModel(selectedModel)) {
+        throw new Error(`The ${selectedModel} model is not in the exported parameters`)
+      }
 
       // Collect form data
       const patientData = {
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+FEATURES = [
+    'age', 'anaemia', 'creatinine_phosphokinase', 'diabetes',
+    'ejection_fraction', 'high_blood_pressure', 'platelets',
+    'serum_creatinine', 'serum_sodium', 'sex', 'smoking', 'time'
+]
+
+PERCENTILES = [50, 90, 95, 99]
+
+def load_patients(csv_path):
+    """Read patient feature rows from the clinical CSV"""
+    with open(csv_path, newline='') as f:
+        return [{feature: float(row[feature]) for feature in FEATURES} for row in csv.DictReader(f)]
+
+def synthetic_cohort(size, seed=42):
+    """Random patients with plausible values, all within the API's validation ranges"""
+    rng = random.Random(seed)
+    patients = []
+    for _ in range(size):
+        patients.append({
+            'age': float(rng.randint(40, 95)),
+            'anaemia': int(rng.random() < 0.43),
+            'creatinine_phosphokinase': int(min(rng.lognormvariate(5.6, 1.0), 7861)),
+            'diabetes': int(rng.random() < 0.42),
+            'ejection_fraction': rng.randint(14, 80),
+            'high_blood_pressure': int(rng.random() < 0.35),
+            'platelets': float(round(min(max(rng.gauss(263000, 97000), 25000), 850000))),
+            'serum_creatinine': round(min(max(rng.lognormvariate(0.2, 0.45), 0.5), 9.4), 1),
+            'serum_sodium': int(min(max(rng.gauss(136.6, 4.4), 113), 148)),
+            'sex': int(rng.random() < 0.65),
+            'smoking': int(rng.random() < 0.32),
+            'time': rng.randint(4, 285)
+        })
+    return patients
+
+def timed_request(url, body=None):
+    """One HTTP call; returns (status, parsed JSON or None, latency in seconds)"""
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, None, time.perf_counter() - start
+    except Exception:
+        return None, None, time.perf_counter() - start
+    try:
+        payload = json.loads(payload)
+    except ValueError:
+        payload = None
+    return status, payload, time.perf_counter() - start
+
+def client_session(url, patient, patient_id=None):
+    """Replay api-client.js as results-api.js drives it: healthCheck, then predictTreatment.
+
+    The prediction is only sent when the health check reports the models
+    as loaded, like the browser.  Every /predict is written to the audit
+    log, so patient_id is left out unless one is given.  Returns per-call
+    latencies and an error label (None on success).
+    """
+    status, health, health_latency = timed_request(url + '/health')
+    result = {'health_s': health_latency, 'predict_s': None, 'error': None}
+    if status != 200:
+        result['error'] = f'health {status or "connection"}'
+        return result
+    if not (health or {}).get('models_loaded'):
+        result['error'] = 'models not loaded'
+        return result
+
+    body = patient if patient_id is None else dict(patient, patient_id=patient_id)
+    status, _, predict_latency = timed_request(url + '/predict', body)
+    result['predict_s'] = predict_latency
+    if status != 200:
+        result['error'] = f'predict {status or "connection"}'
+    return result
+
+def session_id(i, patient_ids):
+    return f'LT{i:06d}' if patient_ids else None
+
+def run_closed_loop(url, patients, sessions, concurrency, patient_ids=False):
+    """concurrency clients each run sessions back to back"""
+    def session(i):
+        start = time.perf_counter()
+        result = client_session(url, patients[i % len(patients)], session_id(i, patient_ids))
+        result['session_s'] = time.perf_counter() - start
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(session, range(sessions)))
+    return results, time.perf_counter() - start
+
+def run_open_loop(url, patients, rate, duration, max_in_flight, seed=42, patient_ids=False):
+    """Start sessions as a Poisson process at rate per second, for duration seconds.
+
+    Arrivals do not wait for earlier sessions to finish.  Session latency
+    is measured from the scheduled arrival, so time spent waiting for a
+    free client thread counts against the server instead of being hidden.
+    """
+    rng = random.Random(seed)
+    results = []
+    lock = threading.Lock()
+
+    def session(i, scheduled):
+        result = client_session(url, patients[i % len(patients)], session_id(i, patient_ids))
+        result['session_s'] = time.perf_counter() - scheduled
+        with lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        arrival = start
+        i = 0
+        while True:
+            arrival += rng.expovariate(rate)
+            if arrival - start > duration:
+                break
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(session, i, arrival)
+            i += 1
+    return results, time.perf_counter() - start
+
+def latency_summary(seconds):
+    values = 1000 * np.array([s for s in seconds if s is not None])
+    if not len(values):
+        return None
+    summary = {'mean_ms': float(values.mean())}
+    summary.update({f'p{p}_ms': float(np.percentile(values, p)) for p in PERCENTILES})
+    summary['max_ms'] = float(values.max())
+    return summary
+
+def summarize(url, mode, results, elapsed, **settings):
+    """Throughput, per-call latency percentiles and error breakdown"""
+    errors = {}
+    for result in results:
+        if result['error']:
+            errors[result['error']] = errors.get(result['error'], 0) + 1
+    requests = sum(1 + (result['predict_s'] is not None) for result in results)
+    return {
+        'url': url,
+        'mode': mode,
+        **settings,
+        'sessions': len(results),
+        'requests': requests,
+        'elapsed_s': elapsed,
+        'sessions_per_s': len(results) / elapsed,
+        'requests_per_s': requests / elapsed,
+        'error_rate': sum(errors.values()) / len(results) if results else 0.0,
+        'errors': errors,
+        'latency': {
+            'health': latency_summary(r['health_s'] for r in results),
+            'predict': latency_summary(r['predict_s'] for r in results),
+            'session': latency_summary(r['session_s'] for r in results)
+        }
+    }
+
+def print_table(reports):
+    columns = ['mean'] + [f'p{p}' for p in PERCENTILES] + ['max']
+    for report in reports:
+        load = (f"{report['rate']:g}/s for {report['duration']:g}s" if report['mode'] == 'open'
+                else f"concurrency {report['concurrency']}")
+        print(f"\n{report['url']} ({report['mode']} loop, {load})")
+        print(f"  {report['sessions']} sessions, {report['sessions_per_s']:.1f} sessions/s, "
+              f"{report['requests_per_s']:.1f} req/s, error rate {100 * report['error_rate']:.2f}%")
+        print(f"  {'ms':8s}" + ''.join(f"{column:>9s}" for column in columns))
+        for call, summary in report['latency'].items():
+            if summary is None:
+                continue
+            print(f"  {call:8s}" + ''.join(f"{summary[f'{column}_ms']:9.1f}" for column in columns))
+        for error, count in report['errors'].items():
+            print(f"  error: {error} x{count}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Load test the API by replaying the browser client (GET /health, then POST /predict)')
+    parser.add_argument('urls', nargs='+',
+                        help='Base URLs to test, e.g. http://localhost:5000 (debug) http://localhost:8000 (gunicorn)')
+    parser.add_argument('--csv', default='new heart clinical.csv')
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help='use N synthetic patients instead of the CSV')
+    parser.add_argument('--sessions', type=int, default=1000, help='closed loop: sessions to run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16],
+                        help='closed loop: concurrent clients (several values run one after another)')
+    parser.add_argument('--rate', type=float, nargs='+',
+                        help='open loop: session arrivals per second (several values run one after another)')
+    parser.add_argument('--duration', type=float, default=30.0, help='open loop: seconds per rate')
+    parser.add_argument('--max-in-flight', type=int, default=256, help='open loop: client thread limit')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--patient-ids', action='store_true',
+                        help="send a patient_id ('LT000000', ...) with each prediction; "
+                             "the server audits every prediction, so these runs show up in patient history")
+    parser.add_argument('--json', help='write the reports to this file')
+    args = parser.parse_args()
+
+    patients = synthetic_cohort(args.synthetic, args.seed) if args.synthetic else load_patients(args.csv)
+    random.Random(args.seed).shuffle(patients)
+
+    print("Heart Treatment API Load Test")
+    print("=" * 60)
+    reports = []
+    for url in args.urls:
+        url = url.rstrip('/')
+        if args.rate:
+            for rate in args.rate:
+                results, elapsed = run_open_loop(url, patients, rate, args.duration,
+                                                 args.max_in_flight, args.seed, args.patient_ids)
+                reports.append(summarize(url, 'open', results, elapsed, rate=rate, duration=args.duration))
+        else:
+            for concurrency in args.concurrency:
+                results, elapsed = run_closed_loop(url, patients, args.sessions, concurrency,
+                                                   args.patient_ids)
+                reports.append(summarize(url, 'closed', results, elapsed, concurrency=concurrency))
+
+    print_table(reports)
+
+    if len(args.urls) > 1 and not args.rate:
+        baseline = reports[0]['sessions_per_s']
+        print("=" * 60)
+        for report in reports[1:]:
+            print(f"{report['url']} (concurrency {report['concurrency']}): "
+                  f"{report['sessions_per_s'] / baseline:.2f}x throughput of {reports[0]['url']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n✓ Reports saved to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import logging
+import mmap
+import os
+import sys
+import threading
+import tracemalloc
+import types
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from model_store import memory_usage
+
+logger = logging.getLogger(__name__)
+
+# Allocation tracking per request stage is off unless HEART_MEMORY_TRACKING
+# is set; tracemalloc slows every allocation down while it is on.
+TRACKING = os.environ.get('HEART_MEMORY_TRACKING', '').lower() in ('1', 'true', 'yes')
+
+# Frames kept per traced allocation; 1 is enough for totals and peaks
+TRACE_FRAMES = 1
+
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+def _is_mapped(array):
+    """True if the array's memory comes from a file mapping"""
+    base = array
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return True
+        base = getattr(base, 'base', None)
+    return False
+
+def object_size(obj):
+    """Bytes reachable from obj: {'heap_bytes', 'mapped_bytes', 'arrays'}.
+
+    NumPy buffers are counted once each (views count their base) and
+    split into heap memory and pages mapped from a model bundle, which
+    workers share.  Other Python objects are counted with sys.getsizeof.
+    """
+    heap = mapped = arrays = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIPPED_TYPES):
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            owner = item
+            while isinstance(owner.base, np.ndarray):
+                owner = owner.base
+            if owner is not item and id(owner) in seen:
+                continue
+            seen.add(id(owner))
+            arrays += 1
+            heap += sys.getsizeof(item) - (item.nbytes if item.base is None else 0)
+            if _is_mapped(owner):
+                mapped += owner.nbytes
+            else:
+                heap += owner.nbytes
+            if item.dtype == object:
+                stack.extend(item.ravel().tolist())
+            continue
+        heap += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__'):
+            stack.append(item.__dict__)
+    return {'heap_bytes': heap, 'mapped_bytes': mapped, 'arrays': arrays}
+
+def model_sizes(objects):
+    """Size of each named object plus the process totals, for logging at load time"""
+    sizes = {name: object_size(obj) for name, obj in objects.items() if obj is not None}
+    return {
+        'models': sizes,
+        'total_heap_bytes': sum(size['heap_bytes'] for size in sizes.values()),
+        'total_mapped_bytes': sum(size['mapped_bytes'] for size in sizes.values()),
+        'process': memory_usage(),
+        'measured': datetime.now().isoformat()
+    }
+
+def log_model_sizes(report):
+    for name, size in report['models'].items():
+        logger.info(f"Memory: {name} {size['heap_bytes'] / 1024:.1f} kB heap, "
+                    f"{size['mapped_bytes'] / 1024:.1f} kB mapped")
+
+def peak_rss_mb():
+    """Peak resident memory of this process, or None where getrusage is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+
+@contextmanager
+def measure_peak():
+    """Track the Python/NumPy allocation peak of a block, e.g. a training step.
+
+    Yields a dict that is filled in on exit with peak_traced_mb (allocations
+    made inside the block, C extensions that bypass Python's allocator
+    excluded) and peak_rss_mb (the process high-water mark).
+    """
+    result = {}
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(TRACE_FRAMES)
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    try:
+        yield result
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        if started:
+            tracemalloc.stop()
+        result['peak_traced_mb'] = max(0, peak - baseline) / (1024 * 1024)
+        result['peak_rss_mb'] = peak_rss_mb()
+
+class StageTracker:
+    """Bytes allocated per request stage, measured with tracemalloc.
+
+    For each (endpoint, stage) it keeps the number of samples, the mean
+    memory still held when the stage ends and the largest peak seen
+    during it.  tracemalloc counts every thread, so concurrent requests
+    inflate each other's figures; measure under light load.  Scoring run
+    in the scoring process pool is not traced.
+    """
+    def __init__(self, enabled=TRACKING):
+        self.enabled = enabled
+        self.stats = {}
+        self._lock = threading.Lock()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+    @contextmanager
+    def stage(self, endpoint, name):
+        if not self.enabled:
+            yield
+            return
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            self._record(endpoint, name, current - before, peak - before)
+
+    def _record(self, endpoint, name, retained, peak):
+        with self._lock:
+            entry = self.stats.setdefault(f'{endpoint}.{name}', {'samples': 0, 'retained_bytes': 0,
+                                                                 'max_peak_bytes': 0})
+            entry['samples'] += 1
+            entry['retained_bytes'] += retained
+            entry['max_peak_bytes'] = max(entry['max_peak_bytes'], peak)
+
+    def summary(self):
+        with self._lock:
+            return {
+                key: {
+                    'samples': entry['samples'],
+                    'mean_retained_kb': entry['retained_bytes'] / entry['samples'] / 1024,
+                    'max_peak_kb': entry['max_peak_bytes'] / 1024
+                }
+                for key, entry in self.stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+# Shared tracker used by the Flask apps
+tracker = StageTracker()
+
+def install(app, model_report):
+    """Register GET/POST /admin/memory; model_report() returns the load-time breakdown"""
+    from flask import jsonify, request
+
+    @app.route('/admin/memory', methods=['GET', 'POST'])
+    def admin_memory():
+        """Model sizes, process memory and, when tracking is on, per-stage allocations.
+
+        POST {"reset": true} clears the stage statistics.
+        """
+        # In production, you might want to secure this endpoint
+        if request.method == 'POST' and (request.json or {}).get('reset'):
+            tracker.reset()
+        return jsonify({
+            'models': model_report(),
+            'process': memory_usage(),
+            'peak_rss_mb': peak_rss_mb(),
+            'stage_tracking': tracker.enabled,
+            'stages': tracker.summary(),
+            'timestamp': datetime.now().isoformat()
+        })
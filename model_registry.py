@@ -0,0 +1,520 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+
+import joblib
+import numpy as np
+
+import model_store
+from numpy_inference import CompiledRBFSVM, RBFSVM
+from patient_schema import FEATURE_CONSTRAINTS
+
+logger = logging.getLogger(__name__)
+
+ROUTING_FILE = 'routing.json'
+CASCADE_FILE = 'cascade.json'
+TARGETS = ['aspirin', 'heparin']
+
+# How often the routing file is checked for changes made by another worker
+ROUTING_CHECK_SECONDS = 5.0
+
+# Latency samples kept per model for the percentiles
+LATENCY_WINDOW = 1000
+
+# Weight of the latest escalated call in the cascade's full-model latency average
+FULL_LATENCY_WEIGHT = 0.1
+
+# Model sets built from the artifact families in models/:
+# name -> (scaler file, aspirin model file, heparin model file).
+# simple_setup.py and export_models.py split the data differently, so each
+# family is scored with the scaler fitted on its own training rows
+PICKLED_SETS = {
+    'svm': ('scaler', 'aspirin_model', 'heparin_model'),
+    'export_svm': ('export_scaler', 'svm_aspirin', 'svm_heparin'),
+    'export_lr': ('export_scaler', 'lr_aspirin', 'lr_heparin')
+}
+
+class JSONScaler:
+    """StandardScaler parameters from a JSON export"""
+    def __init__(self, mean, scale):
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=float) - self.mean) / self.scale
+
+class ModelSet:
+    """A scaler plus one model per target, scored together.
+
+    scaler is None for models that take raw features (CompiledRBFSVM).
+    """
+    def __init__(self, name, scaler, aspirin_model, heparin_model, source):
+        self.name = name
+        self.scaler = scaler
+        self.models = {'aspirin': aspirin_model, 'heparin': heparin_model}
+        self.source = source
+
+    def predict_batch(self, features):
+        """Same output as SimpleHeartPredictor.predict_batch"""
+        scaled = features if self.scaler is None else self.scaler.transform(features)
+        scores = {}
+        for target, model in self.models.items():
+            scores[f'{target}_probability'] = model.predict_proba(scaled)[:, 1]
+            scores[f'{target}_recommendation'] = np.asarray(model.predict(scaled)).astype(bool)
+        return scores
+
+    def score(self, features):
+        """(scores, usage) where usage is the call's cascade stage counts, None for other sets"""
+        return self.predict_batch(features), None
+
+class JointModelSet(ModelSet):
+    """Both targets from one JointRBFSVM kernel evaluation"""
+    def __init__(self, name, scaler, joint_model, source):
+        super().__init__(name, scaler, None, None, source)
+        self.models = {}
+        self.joint_model = joint_model
+
+    def predict_batch(self, features):
+        scores = {}
+        for target, (probability, prediction) in self.joint_model.predict_all(self.scaler.transform(features)).items():
+            scores[f'{target}_probability'] = probability
+            scores[f'{target}_recommendation'] = np.asarray(prediction).astype(bool)
+        return scores
+
+def compiled_model_set(name, scaler, aspirin_model, heparin_model, feature_names,
+                       source, tolerance=1e-9):
+    """Compile an SVC pair for raw features, or None if it does not match sklearn.
+
+    Parity is checked on the support vectors mapped back to raw features,
+    which covers the flag combinations the models were trained on.
+    """
+    binary = [name for name in feature_names if FEATURE_CONSTRAINTS.get(name, ('',))[0] == 'binary']
+    models = {}
+    for target, model in (('aspirin', aspirin_model), ('heparin', heparin_model)):
+        if getattr(model, 'kernel', None) != 'rbf' or len(model.classes_) != 2:
+            return None
+        compiled = CompiledRBFSVM(model, scaler, feature_names, binary)
+        probe = model.support_vectors_
+        difference = np.max(np.abs(compiled.predict_proba(scaler.inverse_transform(probe))[:, 1]
+                                   - model.predict_proba(probe)[:, 1]))
+        if difference > tolerance:
+            logger.warning(f"Compiled {target} model differs from sklearn by {difference:.2e}, not using it")
+            return None
+        models[target] = compiled
+    return ModelSet(name, None, models['aspirin'], models['heparin'], source)
+
+class LinearStage:
+    """Logistic regressions for both targets as one matrix product on raw features.
+
+    The scaler is folded into the weights, so scoring is a single
+    (n, 12) x (12, 2) product and a sigmoid.
+    """
+    def __init__(self, scaler, models):
+        weights = np.vstack([models[target].coef_[0] for target in TARGETS]) / scaler.scale_
+        self.weights = np.ascontiguousarray(weights.T)
+        self.intercepts = np.array([models[target].intercept_[0] for target in TARGETS]) - weights @ scaler.mean_
+
+    @classmethod
+    def from_params(cls, params):
+        """Rebuild a stage saved with to_params()"""
+        stage = cls.__new__(cls)
+        stage.weights = np.ascontiguousarray(params['weights'], dtype=float)
+        stage.intercepts = np.asarray(params['intercepts'], dtype=float)
+        return stage
+
+    def to_params(self):
+        return {'weights': self.weights.tolist(), 'intercepts': self.intercepts.tolist()}
+
+    def predict_proba(self, features):
+        """Positive-class probability, one column per target"""
+        decision = np.asarray(features, dtype=float) @ self.weights + self.intercepts
+        return 1.0 / (1.0 + np.exp(-decision))
+
+class CascadeModelSet(ModelSet):
+    """A cheap linear stage that hands uncertain patients to a full model set.
+
+    Every patient is scored by the logistic regressions first.  Where a
+    target's probability falls inside its band [low, high] the patient is
+    rescored by the full set and that target takes the full answer; the
+    other patients never reach it.  The bands are tuned by cascade.py.
+    Scores carry a {target}_stage array saying which stage answered.
+
+    Scoring may run in a pool process, so score() returns each call's
+    stage counts with the scores and the serving process adds them up
+    with record(); predict_batch() alone counts nothing.
+    """
+    def __init__(self, name, cheap, full_set, bands, source, full_call_ms=None):
+        super().__init__(name, None, None, None, source)
+        self.models = {}
+        self.cheap = cheap
+        self.full_set = full_set
+        self.bands = bands
+        self.calls = 0
+        self.rows = 0
+        self.escalated_calls = 0
+        self.escalated = {target: 0 for target in TARGETS}
+        self.escalated_rows = 0
+        self.cheap_ms = 0.0
+        # Seeded from the validation run until the first escalation is timed
+        self.full_call_ms = full_call_ms
+        self._lock = threading.Lock()
+
+    def predict_batch(self, features):
+        return self.score(features)[0]
+
+    def score(self, features):
+        start = time.perf_counter()
+        probability = self.cheap.predict_proba(features)
+        uncertain = np.zeros(probability.shape, dtype=bool)
+        scores = {}
+        for i, target in enumerate(TARGETS):
+            low, high = self.bands[target]
+            p = probability[:, i]
+            uncertain[:, i] = (p >= low) & (p <= high)
+            scores[f'{target}_probability'] = p.copy()
+            scores[f'{target}_recommendation'] = p > 0.5
+            scores[f'{target}_stage'] = np.full(len(p), 'lr', dtype='U16')
+        rows = np.flatnonzero(uncertain.any(axis=1))
+        cheap_ms = 1000 * (time.perf_counter() - start)
+
+        full_ms = None
+        if rows.size:
+            start = time.perf_counter()
+            full = self.full_set.predict_batch(features[rows])
+            full_ms = 1000 * (time.perf_counter() - start)
+            for i, target in enumerate(TARGETS):
+                take = uncertain[rows, i]
+                patients = rows[take]
+                for field in ('probability', 'recommendation'):
+                    scores[f'{target}_{field}'][patients] = full[f'{target}_{field}'][take]
+                scores[f'{target}_stage'][patients] = self.full_set.name
+        usage = {
+            'calls': 1,
+            'rows': len(probability),
+            'escalated_rows': int(rows.size),
+            'escalated': {target: int(uncertain[:, i].sum()) for i, target in enumerate(TARGETS)},
+            'cheap_ms': cheap_ms,
+            'full_ms': [] if full_ms is None else [full_ms]
+        }
+        return scores, usage
+
+    def record(self, usage):
+        """Add the stage counts of one or more score() calls"""
+        with self._lock:
+            self.calls += usage['calls']
+            self.rows += usage['rows']
+            self.escalated_rows += usage['escalated_rows']
+            for target, count in usage['escalated'].items():
+                self.escalated[target] += count
+            self.cheap_ms += usage['cheap_ms']
+            for full_ms in usage['full_ms']:
+                self.escalated_calls += 1
+                if self.full_call_ms is None:
+                    self.full_call_ms = full_ms
+                else:
+                    self.full_call_ms += FULL_LATENCY_WEIGHT * (full_ms - self.full_call_ms)
+
+    def stats(self):
+        """Escalation rates and the estimated latency saved by this process.
+
+        A call that never reached the full set saved one full-set call
+        (its moving average); every call paid for the linear stage.
+        """
+        with self._lock:
+            saved = None
+            if self.full_call_ms is not None:
+                saved = (self.calls - self.escalated_calls) * self.full_call_ms - self.cheap_ms
+            return {
+                'full_model': self.full_set.name,
+                'bands': self.bands,
+                'calls': self.calls,
+                'rows': self.rows,
+                'escalated_calls': self.escalated_calls,
+                'escalation_rate': self.escalated_rows / self.rows if self.rows else None,
+                **{f'{target}_escalation_rate': count / self.rows if self.rows else None
+                   for target, count in self.escalated.items()},
+                'mean_cheap_ms': self.cheap_ms / self.calls if self.calls else None,
+                'full_call_ms': self.full_call_ms,
+                'latency_saved_ms': saved
+            }
+
+def combine_usage(usages):
+    """Sum the usage of several score() calls, e.g. the chunks of one batch"""
+    usages = [usage for usage in usages if usage is not None]
+    if not usages:
+        return None
+    return {
+        'calls': sum(usage['calls'] for usage in usages),
+        'rows': sum(usage['rows'] for usage in usages),
+        'escalated_rows': sum(usage['escalated_rows'] for usage in usages),
+        'escalated': {target: sum(usage['escalated'][target] for usage in usages) for target in TARGETS},
+        'cheap_ms': sum(usage['cheap_ms'] for usage in usages),
+        'full_ms': [full_ms for usage in usages for full_ms in usage['full_ms']]
+    }
+
+def cascade_model_set(models_dir, sets, name='cascade'):
+    """The cascade described by models/cascade.json, or None.
+
+    The linear stage is stored in the file (cascade.py fits it); the full
+    set it hands uncertain patients to must be among the loaded sets.
+    """
+    path = os.path.join(models_dir, CASCADE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        config = json.load(f)
+    full = sets.get(config['full'])
+    if full is None:
+        logger.warning(f"Cascade needs model set {config['full']!r}, not using it")
+        return None
+    bands = {target: tuple(band) for target, band in config['bands'].items()}
+    return CascadeModelSet(name, LinearStage.from_params(config['linear_stage']), full, bands, source=path,
+                           full_call_ms=config.get('validation', {}).get('full_ms'))
+
+def discover_model_sets(models_dir='models', bundle=None, json_path='model_parameters.json',
+                        compressed_dir='models_compressed', out_of_core_dir='models_out_of_core'):
+    """Load every complete model set found on disk.
+
+    Pickled sets come from the memory-mapped bundle when one is given, so
+    they share its pages; 'joint' is the merged model written by
+    model_store.build_joint().  The JSON export is scored with
+    numpy_inference, and models compressed by compress_svm.py or trained by
+    train_out_of_core.py are picked up from their own directories.
+    """
+    def load(name):
+        if bundle is not None and name in bundle:
+            return bundle[name]
+        path = os.path.join(models_dir, model_store.MODEL_FILES[name])
+        return joblib.load(path) if os.path.exists(path) else None
+
+    sets = {}
+    for set_name, names in PICKLED_SETS.items():
+        objects = [load(name) for name in names]
+        if all(obj is not None for obj in objects):
+            sets[set_name] = ModelSet(set_name, *objects, source=models_dir)
+
+    scaler, joint_model = load('scaler'), load('joint_model')
+    if scaler is not None and joint_model is not None:
+        sets['joint'] = JointModelSet('joint', scaler, joint_model, source=models_dir)
+
+    if os.path.exists(json_path):
+        with open(json_path) as f:
+            params = json.load(f)
+        scaler = JSONScaler(params['scaler']['mean'], params['scaler']['scale'])
+        sets['json_svm'] = ModelSet('json_svm', scaler,
+                                    RBFSVM.from_params(params['aspirin_model']),
+                                    RBFSVM.from_params(params['heparin_model']),
+                                    source=json_path)
+
+    files = ['scaler.pkl', 'aspirin_model.pkl', 'heparin_model.pkl']
+    for set_name, directory in (('compressed', compressed_dir), ('out_of_core', out_of_core_dir)):
+        if all(os.path.exists(os.path.join(directory, name)) for name in files):
+            objects = [joblib.load(os.path.join(directory, name)) for name in files]
+            sets[set_name] = ModelSet(set_name, *objects, source=directory)
+
+    return sets
+
+class ModelMetrics:
+    """Request count, latency and agreement with the default set for one model"""
+    def __init__(self):
+        self.requests = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.compared = 0
+        self.agreed = {target: 0 for target in TARGETS}
+        self.warmup_ms = None
+
+    def summary(self):
+        latencies = np.array(self.latencies)
+        summary = {
+            'requests': self.requests,
+            'mean_ms': float(latencies.mean()) if len(latencies) else None,
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else None,
+            'compared': self.compared,
+            'warmup_ms': self.warmup_ms
+        }
+        for target, agreed in self.agreed.items():
+            summary[f'{target}_agreement'] = agreed / self.compared if self.compared else None
+        return summary
+
+class ModelRegistry:
+    """Named model sets kept resident, with per-request selection and A/B routing.
+
+    Routing sends split[name] percent of requests to each named set and the
+    rest to the default set; sets listed in shadow are only scored in the
+    background (see shadow.py).  In 'hash' mode the patient_id picks the
+    bucket, so a patient always gets the same model; in 'percentage' mode
+    each request is assigned at random.  The routing is stored in
+    models/routing.json so a change made through one worker reaches the
+    others.  Metrics are kept per process.
+    """
+    def __init__(self, models_dir='models', default='svm'):
+        self.models_dir = models_dir
+        self.sets = {}
+        self.routing = {'default': default, 'mode': 'percentage', 'split': {}, 'shadow': []}
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._routing_mtime = None
+        self._last_routing_check = 0.0
+
+    @property
+    def default(self):
+        return self.routing['default']
+
+    @property
+    def routing_path(self):
+        return os.path.join(self.models_dir, ROUTING_FILE)
+
+    def load(self, bundle=None, sets=None):
+        """(Re)load every model set found on disk, plus any given sets and the cascade over them"""
+        return self.install(self.discover(bundle, sets))
+
+    def discover(self, bundle=None, sets=None):
+        """Every model set found on disk plus the given sets and the cascade, without serving them"""
+        loaded = discover_model_sets(self.models_dir, bundle)
+        loaded.update(sets or {})
+        cascade = cascade_model_set(self.models_dir, loaded)
+        if cascade is not None:
+            loaded[cascade.name] = cascade
+        return loaded
+
+    def install(self, loaded):
+        """Serve the given model sets in place of the current ones"""
+        with self._lock:
+            self.sets = loaded
+            for name in loaded:
+                self.metrics.setdefault(name, ModelMetrics())
+        self._load_routing()
+        return sorted(loaded)
+
+    def _load_routing(self):
+        if not os.path.exists(self.routing_path):
+            return
+        mtime = os.path.getmtime(self.routing_path)
+        try:
+            with open(self.routing_path) as f:
+                routing = json.load(f)
+        except (OSError, ValueError) as e:
+            # Keep serving with the previous routing and retry on the next check
+            logger.warning(f"Could not read {self.routing_path}: {e}")
+            return
+        self._routing_mtime = mtime
+        try:
+            self._validate(routing)
+        except (KeyError, TypeError, ValueError):
+            # Keep serving with the previous routing
+            return
+        self.routing = routing
+
+    def _refresh_routing(self):
+        now = time.monotonic()
+        if now - self._last_routing_check < ROUTING_CHECK_SECONDS:
+            return
+        self._last_routing_check = now
+        if os.path.exists(self.routing_path) and os.path.getmtime(self.routing_path) != self._routing_mtime:
+            self._load_routing()
+
+    def _validate(self, routing):
+        names = [routing['default'], *routing['split'], *routing.get('shadow', [])]
+        unknown = [name for name in names if name not in self.sets]
+        if unknown:
+            raise ValueError(f"Unknown model sets: {unknown}. Available: {sorted(self.sets)}")
+        if routing['mode'] not in ('percentage', 'hash'):
+            raise ValueError("mode must be 'percentage' or 'hash'")
+        total = sum(routing['split'].values())
+        if any(share < 0 for share in routing['split'].values()) or total > 100:
+            raise ValueError("split percentages must be non-negative and add up to at most 100")
+
+    def set_routing(self, default=None, split=None, mode=None, shadow=None):
+        """Change the default set, traffic split and shadow sets, and persist them"""
+        routing = {
+            'default': default or self.routing['default'],
+            'mode': mode or self.routing['mode'],
+            'split': {name: float(share) for name, share in (split if split is not None else self.routing['split']).items()},
+            'shadow': list(shadow if shadow is not None else self.routing.get('shadow', []))
+        }
+        self._validate(routing)
+        self.routing = routing
+        # Written to a temporary file first, since other workers read it
+        temporary = f'{self.routing_path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(routing, f, indent=2)
+        os.replace(temporary, self.routing_path)
+        self._routing_mtime = os.path.getmtime(self.routing_path)
+        return routing
+
+    def choose(self, requested=None, patient_id=None):
+        """Name of the model set for a request.
+
+        An explicitly requested set always wins; raises KeyError if it is
+        not loaded.
+        """
+        if requested is not None:
+            if requested not in self.sets:
+                raise KeyError(requested)
+            return requested
+
+        self._refresh_routing()
+        routing = self.routing
+        if not routing['split']:
+            return routing['default']
+        if routing['mode'] == 'hash' and patient_id is not None:
+            bucket = zlib.crc32(str(patient_id).encode()) % 10000 / 100
+        else:
+            bucket = random.random() * 100
+        for name, share in routing['split'].items():
+            if bucket < share:
+                return name
+            bucket -= share
+        return routing['default']
+
+    def predict_batch(self, name, features):
+        return self.sets[name].predict_batch(features)
+
+    def score(self, name, features):
+        """(scores, usage) from a named set; pass usage back to record() or record_usage()"""
+        return self.sets[name].score(features)
+
+    def record(self, name, latency_ms, agreement=None, usage=None):
+        """Add one scored request; agreement maps target -> matched the default set"""
+        with self._lock:
+            metrics = self.metrics.setdefault(name, ModelMetrics())
+            metrics.requests += 1
+            metrics.latencies.append(latency_ms)
+            if agreement is not None:
+                metrics.compared += 1
+                for target, agreed in agreement.items():
+                    metrics.agreed[target] += int(agreed)
+        self.record_usage(name, usage)
+
+    def record_usage(self, name, usage):
+        """Add cascade stage counts returned by score(), possibly from a pool process"""
+        model_set = self.sets.get(name)
+        if usage is None or not isinstance(model_set, CascadeModelSet):
+            return
+        with self._lock:
+            self.metrics.setdefault(name, ModelMetrics())
+        model_set.record(usage)
+
+    def record_warmup(self, name, duration_ms):
+        """Store how long the start-up warm-up of a model set took"""
+        with self._lock:
+            self.metrics.setdefault(name, ModelMetrics()).warmup_ms = duration_ms
+
+    def stats(self):
+        with self._lock:
+            return {
+                'routing': self.routing,
+                'models': {
+                    name: {'source': self.sets[name].source if name in self.sets else None,
+                           **metrics.summary(),
+                           **({'cascade': self.sets[name].stats()}
+                              if isinstance(self.sets.get(name), CascadeModelSet) else {})}
+                    for name, metrics in self.metrics.items()
+                }
+            }
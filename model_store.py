@@ -0,0 +1,198 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+
+BUNDLE_FILE = 'model_bundle.joblib'
+JOINT_FILE = 'joint_model.pkl'
+
+# Artifacts written by simple_setup.py and export_models.py
+MODEL_FILES = {
+    'scaler': 'scaler.pkl',
+    'aspirin_model': 'aspirin_model.pkl',
+    'heparin_model': 'heparin_model.pkl',
+    'feature_names': 'feature_names.pkl',
+    'svm_aspirin': 'svm_aspirin.pkl',
+    'svm_heparin': 'svm_heparin.pkl',
+    'lr_aspirin': 'lr_aspirin.pkl',
+    'lr_heparin': 'lr_heparin.pkl',
+    'export_scaler': 'export_scaler.pkl',
+    'joint_model': JOINT_FILE
+}
+
+def bundle_path(models_dir='models'):
+    return os.path.join(models_dir, BUNDLE_FILE)
+
+def joint_path(models_dir='models'):
+    return os.path.join(models_dir, JOINT_FILE)
+
+def replace_dump(obj, path):
+    """joblib.dump to a temporary file, then move it over path.
+
+    Readers in other processes see either the old file or the new one,
+    never a partly written one.
+    """
+    temporary = f'{path}.{os.getpid()}.tmp'
+    joblib.dump(obj, temporary)
+    os.replace(temporary, path)
+
+def build_joint(models_dir='models'):
+    """Merge the aspirin and heparin SVMs into one JointRBFSVM (see numpy_inference.py)"""
+    from numpy_inference import JointRBFSVM
+
+    models = {
+        target: joblib.load(os.path.join(models_dir, MODEL_FILES[f'{target}_model']))
+        for target in ('aspirin', 'heparin')
+    }
+    joint = JointRBFSVM.from_sklearn(models)
+    path = joint_path(models_dir)
+    replace_dump(joint, path)
+    return path, joint
+
+def build_bundle(models_dir='models', path=None):
+    """Pack every model found in models_dir into one memory-mappable file.
+
+    joblib stores the numpy arrays (support vectors, dual coefficients,
+    scaler mean/scale, ...) uncompressed and aligned inside a single file,
+    so load_bundle() can map them instead of copying them.
+    """
+    bundle = {}
+    for name, filename in MODEL_FILES.items():
+        file_path = os.path.join(models_dir, filename)
+        if os.path.exists(file_path):
+            # joblib.load also reads files written with plain pickle
+            bundle[name] = joblib.load(file_path)
+
+    if not bundle:
+        raise ValueError(f"No model files found in {models_dir}")
+
+    path = path or bundle_path(models_dir)
+    # Serving workers map the bundle, so it is replaced rather than rewritten
+    replace_dump(bundle, path)
+    return path, sorted(bundle)
+
+def load_bundle(path, mmap_mode='c'):
+    """Load a model bundle with its arrays as views of the file.
+
+    Every process that loads the same bundle maps the same page-cache
+    pages, so model memory does not grow with the number of workers.
+    The default copy-on-write mapping is used because libsvm refuses
+    read-only buffers; scoring never writes to the arrays, so the pages
+    stay shared.
+    """
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+def shared_arrays(bundle):
+    """List (name, array) for the memory-mapped arrays in a bundle"""
+    arrays = []
+    for name, obj in bundle.items():
+        for attr, value in getattr(obj, '__dict__', {}).items():
+            if isinstance(value, np.memmap):
+                arrays.append((f"{name}.{attr}", value))
+    return arrays
+
+def memory_usage():
+    """Resident memory of this process in kB (Linux only).
+
+    pss splits shared pages between the processes mapping them, so the
+    sum of pss over all workers is their real memory footprint.
+    """
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Private_Clean:', 'Private_Dirty:'):
+                    usage[parts[0][:-1].lower() + '_kb'] = int(parts[1])
+    except OSError:
+        pass
+    return usage
+
+def _measure_worker(path, use_bundle, connection):
+    """Load the models in a fresh process and report its memory"""
+    if use_bundle:
+        bundle = load_bundle(path)
+    else:
+        models_dir = os.path.dirname(path)
+        bundle = {name: joblib.load(os.path.join(models_dir, filename))
+                  for name, filename in MODEL_FILES.items()
+                  if os.path.exists(os.path.join(models_dir, filename))}
+
+    # Touch every array the way scoring does
+    scaler = bundle['scaler']
+    sample = scaler.transform(np.asarray([scaler.mean_]))
+    for name in ('aspirin_model', 'heparin_model', 'svm_aspirin', 'svm_heparin'):
+        if name in bundle:
+            bundle[name].predict_proba(sample)
+
+    # Report only once every worker has loaded, so pss reflects sharing
+    connection.send('loaded')
+    connection.recv()
+    connection.send(memory_usage())
+    connection.recv()
+
+def measure_workers(path, workers, use_bundle=True):
+    """Start workers that each load the models and return their memory usage"""
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    connections = []
+    processes = []
+    for _ in range(workers):
+        parent, child = context.Pipe()
+        process = context.Process(target=_measure_worker, args=(path, use_bundle, child))
+        process.start()
+        # Close our copy of the child end so a crashed worker raises EOFError
+        child.close()
+        connections.append(parent)
+        processes.append(process)
+
+    for connection in connections:
+        connection.recv()
+    results = []
+    for connection in connections:
+        connection.send('report')
+        results.append(connection.recv())
+    for connection in connections:
+        connection.send('done')
+    for process in processes:
+        process.join()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared memory-mapped model bundle')
+    parser.add_argument('command', choices=['build', 'joint', 'measure'])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--no-mmap', action='store_true',
+                        help='measure: load separate pickles instead of the shared bundle')
+    args = parser.parse_args()
+
+    if args.command == 'joint':
+        path, joint = build_joint(args.models_dir)
+        print(f"✓ Wrote {path}: {len(joint.support_vectors)} shared support vectors for {joint.targets}")
+        return
+
+    if args.command == 'build':
+        path, names = build_bundle(args.models_dir)
+        print(f"✓ Wrote {path} ({os.path.getsize(path) / 1024:.1f} kB)")
+        print(f"✓ Models: {names}")
+        return
+
+    path = bundle_path(args.models_dir)
+    if not args.no_mmap and not os.path.exists(path):
+        print(f"✗ {path} not found. Run 'python model_store.py build' first.")
+        return
+
+    print(f"Memory per worker ({'pickles' if args.no_mmap else 'shared bundle'})")
+    print("=" * 40)
+    for workers in range(1, args.workers + 1):
+        results = measure_workers(path, workers, use_bundle=not args.no_mmap)
+        pss = [r.get('pss_kb', 0) for r in results]
+        rss = [r.get('rss_kb', 0) for r in results]
+        print(f"{workers} workers: mean rss {sum(rss) / workers / 1024:.1f} MB, "
+              f"mean pss {sum(pss) / workers / 1024:.1f} MB, total pss {sum(pss) / 1024:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,9 @@ class HeartTreatmentModels {
   async loadModels() {
     try {
       console.log("Loading heart treatment models...")
-      const response = await fetch("models/model_parameters.json")
+      // Through the API's versioned URL when api-client.js is loaded, else the static file
+      const url = "models/model_parameters.json"
+      const response = await (window.heartAPI ? window.heartAPI.fetchParameters(url) : fetch(url))
 
       if (!response.ok) {
         throw new Error(`Failed to load models: ${response.status} ${response.statusText}`)
@@ -41,41 +43,32 @@ class HeartTreatmentModels {
       this.featureNames = modelData.scaler.feature_names
       console.log("Feature names:", this.featureNames)
 
-      // Initialize Logistic Regression models
-      this.models.logisticRegression.aspirin = new LogisticRegressionModel(
-        modelData.logistic_regression.aspirin.coefficients,
-        modelData.logistic_regression.aspirin.intercept,
-      )
-
-      this.models.logisticRegression.heparin = new LogisticRegressionModel(
-        modelData.logistic_regression.heparin.coefficients,
-        modelData.logistic_regression.heparin.intercept,
-      )
-
-      // Initialize SVM models
-      this.models.svm.aspirin = new SVMModel(
-        modelData.svm.aspirin.support_vectors,
-        modelData.svm.aspirin.dual_coef,
-        modelData.svm.aspirin.intercept,
-        modelData.svm.aspirin.gamma,
-      )
-
-      this.models.svm.heparin = new SVMModel(
-        modelData.svm.heparin.support_vectors,
-        modelData.svm.heparin.dual_coef,
-        modelData.svm.heparin.intercept,
-        modelData.svm.heparin.gamma,
-      )
-
-      // Initialize Random Forest models (simplified)
-      this.models.randomForest.aspirin = new RandomForestModel(modelData.random_forest.aspirin.feature_importances)
-
-      this.models.randomForest.heparin = new RandomForestModel(modelData.random_forest.heparin.feature_importances)
-
-      // Initialize XGBoost models (simplified)
-      this.models.xgboost.aspirin = new XGBoostModel(modelData.xgboost.aspirin.feature_importances)
+      // A partial export (export_models.py --algorithms ...) only carries
+      // some families; the others stay unavailable
+      const builders = {
+        logisticRegression: [
+          "logistic_regression",
+          (params) => new LogisticRegressionModel(params.coefficients, params.intercept),
+        ],
+        svm: ["svm", (params) => new SVMModel(params.support_vectors, params.dual_coef, params.intercept, params.gamma)],
+        randomForest: ["random_forest", (params) => new RandomForestModel(params.feature_importances)],
+        xgboost: ["xgboost", (params) => new XGBoostModel(params.feature_importances)],
+      }
+      for (const [modelType, [key, build]] of Object.entries(builders)) {
+        if (modelData[key]) {
+          this.models[modelType].aspirin = build(modelData[key].aspirin)
+          this.models[modelType].heparin = build(modelData[key].heparin)
+        }
+      }
 
-      this.models.xgboost.heparin = new XGBoostModel(modelData.xgboost.heparin.feature_importances)
+      const available = this.availableModels()
+      if (available.length === 0) {
+        throw new Error("No models found in model_parameters.json")
+      }
+      if (!available.includes(this.activeModel)) {
+        this.activeModel = available[0]
+      }
+      console.log("Available models:", available)
 
       this.isLoaded = true
       console.log("✅ Models loaded successfully!")
@@ -87,12 +80,20 @@ class HeartTreatmentModels {
     }
   }
 
+  /**
+   * Model types present in the loaded export
+   * @returns {Array} - Model type names
+   */
+  availableModels() {
+    return Object.keys(this.models).filter((modelType) => this.models[modelType].aspirin !== null)
+  }
+
   /**
    * Set the active model type
    * @param {string} modelType - Model type (logisticRegression, svm, randomForest, xgboost)
    */
   setActiveModel(modelType) {
-    if (this.models[modelType]) {
+    if (this.models[modelType] && this.models[modelType].aspirin !== null) {
       this.activeModel = modelType
       console.log(`Active model set to: ${modelType}`)
       return true
@@ -14,7 +14,9 @@ class MyHeartTreatmentModel {
       console.log("Loading your actual ML models...")
 
       // Load the exported model parameters
-      const response = await fetch("model_parameters.json")
+      // Through the API's versioned URL when api-client.js is loaded, else the static file
+      const url = "model_parameters.json"
+      const response = await (window.heartAPI ? window.heartAPI.fetchParameters(url) : fetch(url))
       const modelData = await response.json()
 
       console.log("Model data loaded:", modelData.metadata)
@@ -105,9 +107,15 @@ class MyHeartTreatmentModel {
 class SVMPredictor {
   constructor(modelParams) {
     this.supportVectors = modelParams.support_vectors
+    // int8 exports store each feature as value * quant_scale[feature]
+    if (modelParams.quant_scale) {
+      this.supportVectors = this.supportVectors.map((sv) => sv.map((q, j) => q * modelParams.quant_scale[j]))
+    }
     this.dualCoef = modelParams.dual_coef[0] // First class dual coefficients
     this.intercept = modelParams.intercept[0]
     this.gamma = modelParams.gamma === "scale" ? 1.0 / this.supportVectors[0].length : modelParams.gamma
+    this.probA = modelParams.prob_a
+    this.probB = modelParams.prob_b
 
     console.log(`SVM initialized with ${this.supportVectors.length} support vectors`)
     console.log(`Gamma: ${this.gamma}, Intercept: ${this.intercept}`)
@@ -140,8 +148,11 @@ class SVMPredictor {
 
   // Convert decision score to probability using Platt scaling approximation
   decisionToProbability(decision) {
+    // Platt scaling with the exported sigmoid parameters, when available
+    if (this.probA !== undefined && this.probA !== null) {
+      return 1.0 - 1.0 / (1.0 + Math.exp(-decision * this.probA + this.probB))
+    }
     // This is a simplified approximation
-    // Real sklearn uses more sophisticated Platt scaling
     return 1.0 / (1.0 + Math.exp(-decision))
   }
 
@@ -0,0 +1,326 @@
+import numpy as np
+
+PRECISIONS = ('float64', 'float32', 'int8')
+
+def _platt(decision, prob_a, prob_b):
+    """P(class 1) from decision values, matching sklearn's predict_proba.
+
+    libsvm applies the Platt sigmoid to its own (sign-flipped) decision
+    value and then runs its iterative pairwise coupling, which stops at a
+    tolerance of 0.005 / k.  For two classes that loop is reproduced here
+    for the whole batch so the results match sklearn, not just the
+    closed-form sigmoid.
+    """
+    decision = np.asarray(decision, dtype=np.float64)
+    f = -decision * prob_a + prob_b
+    # Numerically stable 1 / (1 + exp(f)), clipped like libsvm
+    r = np.where(f >= 0, np.exp(-np.minimum(f, 700)) / (1 + np.exp(-np.minimum(f, 700))),
+                 1 / (1 + np.exp(np.maximum(f, -700))))
+    r = np.clip(r, 1e-7, 1 - 1e-7)
+
+    # r01 = P(class 0 beats class 1), r10 = 1 - r01
+    r01, r10 = r, 1 - r
+    q00, q11 = r10 ** 2, r01 ** 2
+    q01 = -r10 * r01
+    p0 = np.full_like(r, 0.5)
+    p1 = np.full_like(r, 0.5)
+    eps = 0.005 / 2
+    active = np.ones(r.shape, dtype=bool)
+    for _ in range(100):
+        qp0 = q00 * p0 + q01 * p1
+        qp1 = q01 * p0 + q11 * p1
+        pqp = p0 * qp0 + p1 * qp1
+        active &= np.maximum(np.abs(qp0 - pqp), np.abs(qp1 - pqp)) >= eps
+        if not active.any():
+            break
+        # Update p0 then p1, exactly as libsvm's multiclass_probability
+        for t in (0, 1):
+            qtt = q00 if t == 0 else q11
+            qpt = qp0 if t == 0 else qp1
+            diff = np.where(active, (-qpt + pqp) / qtt, 0.0)
+            if t == 0:
+                p0 = p0 + diff
+            else:
+                p1 = p1 + diff
+            pqp = (pqp + diff * (diff * qtt + 2 * qpt)) / (1 + diff) ** 2
+            qp0 = (qp0 + diff * (q00 if t == 0 else q01)) / (1 + diff)
+            qp1 = (qp1 + diff * (q01 if t == 0 else q11)) / (1 + diff)
+            p0 = p0 / (1 + diff)
+            p1 = p1 / (1 + diff)
+    return p1
+
+class RBFSVM:
+    """Binary RBF-kernel SVM scored with NumPy from exported parameters.
+
+    precision selects how the support vectors are stored and the kernel
+    computed: 'float64' (reference), 'float32', or 'int8' with one scale
+    per feature (vector = int8 value * quant_scale).
+    """
+    def __init__(self, support_vectors, dual_coef, intercept, gamma, prob_a=None, prob_b=None,
+                 classes=(0, 1), precision='float64', quant_scale=None):
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}")
+        self.precision = precision
+        self.dtype = np.float64 if precision == 'float64' else np.float32
+        self.gamma = float(gamma)
+        self.intercept = float(intercept)
+        self.prob_a = prob_a
+        self.prob_b = prob_b
+        self.classes = np.asarray(classes)
+        self.dual_coef = np.asarray(dual_coef, dtype=self.dtype).ravel()
+
+        if precision == 'int8':
+            if quant_scale is None:
+                support_vectors = np.asarray(support_vectors, dtype=np.float64)
+                quant_scale = np.abs(support_vectors).max(axis=0) / 127
+                quant_scale[quant_scale == 0] = 1.0
+                support_vectors = np.round(support_vectors / quant_scale)
+            self.quant_scale = np.asarray(quant_scale, dtype=np.float32)
+            self.support_vectors = np.asarray(support_vectors).astype(np.int8)
+            dequantized = self.support_vectors * self.quant_scale
+        else:
+            self.quant_scale = None
+            self.support_vectors = np.asarray(support_vectors, dtype=self.dtype)
+            dequantized = self.support_vectors
+        # ||sv||^2 for the expanded distance ||x||^2 - 2 x.sv + ||sv||^2
+        self.sv_sq_norms = np.einsum('ij,ij->i', dequantized, dequantized).astype(self.dtype)
+
+    @classmethod
+    def from_sklearn(cls, model, precision='float64'):
+        """Build from a fitted binary sklearn SVC with an RBF kernel"""
+        prob_a = getattr(model, 'probA_', None)
+        prob_b = getattr(model, 'probB_', None)
+        return cls(
+            model.support_vectors_,
+            model.dual_coef_[0],
+            model.intercept_[0],
+            model._gamma,
+            float(prob_a[0]) if prob_a is not None and len(prob_a) else None,
+            float(prob_b[0]) if prob_b is not None and len(prob_b) else None,
+            model.classes_,
+            precision
+        )
+
+    @classmethod
+    def from_params(cls, params):
+        """Build from the dict written by export_my_model.py"""
+        return cls(
+            params['support_vectors'],
+            params['dual_coef'],
+            params['intercept'][0] if isinstance(params['intercept'], list) else params['intercept'],
+            params['gamma'],
+            params.get('prob_a'),
+            params.get('prob_b'),
+            params.get('classes', [0, 1]),
+            params.get('precision', 'float64'),
+            params.get('quant_scale')
+        )
+
+    def to_params(self):
+        """Parameters for JSON export (float32 values rounded to float32 precision)"""
+        if self.precision == 'int8':
+            support_vectors = self.support_vectors.tolist()
+        elif self.precision == 'float32':
+            support_vectors = [[float(f'{v:.9g}') for v in row] for row in self.support_vectors]
+        else:
+            support_vectors = self.support_vectors.tolist()
+        params = {
+            'precision': self.precision,
+            'support_vectors': support_vectors,
+            'dual_coef': [[float(f'{v:.9g}') if self.dtype == np.float32 else float(v) for v in self.dual_coef]],
+            'intercept': [self.intercept],
+            'gamma': self.gamma,
+            'prob_a': self.prob_a,
+            'prob_b': self.prob_b,
+            'classes': self.classes.tolist()
+        }
+        if self.quant_scale is not None:
+            params['quant_scale'] = self.quant_scale.tolist()
+        return params
+
+    @property
+    def nbytes(self):
+        """Memory held by the support vectors and coefficients"""
+        total = self.support_vectors.nbytes + self.dual_coef.nbytes + self.sv_sq_norms.nbytes
+        if self.quant_scale is not None:
+            total += self.quant_scale.nbytes
+        return total
+
+    def decision_function(self, X):
+        """Decision values for scaled features X of shape (n, n_features)"""
+        X = np.asarray(X, dtype=self.dtype)
+        if self.precision == 'int8':
+            # x . (s * q) == (x * s) . q, so the int8 vectors are never expanded
+            cross = (X * self.quant_scale) @ self.support_vectors.T.astype(self.dtype)
+        else:
+            cross = X @ self.support_vectors.T
+        x_sq = np.einsum('ij,ij->i', X, X)[:, np.newaxis]
+        sq_dist = np.maximum(x_sq - 2 * cross + self.sv_sq_norms, 0)
+        return np.exp(-self.gamma * sq_dist) @ self.dual_coef + self.intercept
+
+    def predict_proba(self, X):
+        if self.prob_a is None:
+            raise ValueError("Model was exported without probability calibration")
+        p1 = _platt(self.decision_function(X), self.prob_a, self.prob_b)
+        return np.column_stack([1 - p1, p1])
+
+    def predict(self, X):
+        return self.classes[(self.decision_function(X) > 0).astype(int)]
+
+class CompiledRBFSVM:
+    """Binary RBF SVM compiled for raw (unscaled) patient features.
+
+    The scaler is folded in, and the binary features are tabulated: the
+    kernel factorises as exp(-gamma * (d_binary + d_continuous)), and the
+    binary part only depends on which of the 2**k flag combinations the
+    patient has.  exp(-gamma * d_binary) times the dual coefficients is
+    precomputed per combination and support vector, so a request only
+    computes distances over the continuous features and looks up one row
+    of the table.
+    """
+    def __init__(self, model, scaler, feature_names, binary_features):
+        feature_names = list(feature_names)
+        self.binary_idx = [feature_names.index(name) for name in binary_features]
+        self.continuous_idx = [i for i in range(len(feature_names)) if i not in self.binary_idx]
+        self.gamma = float(model._gamma)
+        self.intercept = float(model.intercept_[0])
+        prob_a = getattr(model, 'probA_', None)
+        prob_b = getattr(model, 'probB_', None)
+        self.prob_a = float(prob_a[0]) if prob_a is not None and len(prob_a) else None
+        self.prob_b = float(prob_b[0]) if prob_b is not None and len(prob_b) else None
+        self.classes = np.asarray(model.classes_)
+
+        sv = np.asarray(model.support_vectors_, dtype=np.float64)
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+        self.mean = mean[self.continuous_idx]
+        self.scale = scale[self.continuous_idx]
+        self.support_vectors = np.ascontiguousarray(sv[:, self.continuous_idx])
+        self.sv_sq_norms = np.einsum('ij,ij->i', self.support_vectors, self.support_vectors)
+
+        k = len(self.binary_idx)
+        # Row c holds the flags of combination c, bit j for binary feature j
+        flags = (np.arange(2 ** k)[:, np.newaxis] >> np.arange(k)) & 1
+        scaled_flags = (flags - mean[self.binary_idx]) / scale[self.binary_idx]
+        partial = ((scaled_flags[:, np.newaxis, :] - sv[np.newaxis, :, self.binary_idx]) ** 2).sum(axis=2)
+        self.table = np.exp(-self.gamma * partial) * np.asarray(model.dual_coef_[0], dtype=np.float64)
+        self.bit_weights = 1 << np.arange(k)
+
+    @property
+    def nbytes(self):
+        return self.support_vectors.nbytes + self.sv_sq_norms.nbytes + self.table.nbytes
+
+    def decision_function(self, X):
+        """Decision values for raw features X of shape (n, n_features)"""
+        X = np.asarray(X, dtype=np.float64)
+        combination = (X[:, self.binary_idx] > 0.5) @ self.bit_weights
+        continuous = (X[:, self.continuous_idx] - self.mean) / self.scale
+        sq_dist = np.maximum(
+            np.einsum('ij,ij->i', continuous, continuous)[:, np.newaxis]
+            - 2 * continuous @ self.support_vectors.T + self.sv_sq_norms, 0)
+        return np.einsum('ij,ij->i', np.exp(-self.gamma * sq_dist), self.table[combination]) + self.intercept
+
+    def predict_proba(self, X):
+        if self.prob_a is None:
+            raise ValueError("Model was trained without probability calibration")
+        p1 = _platt(self.decision_function(X), self.prob_a, self.prob_b)
+        return np.column_stack([1 - p1, p1])
+
+    def predict(self, X):
+        return self.classes[(self.decision_function(X) > 0).astype(int)]
+
+class JointRBFSVM:
+    """Several binary RBF SVMs that share gamma, scored from one kernel matrix.
+
+    The support vectors of every head are merged into one deduplicated set
+    with a (targets, vectors) coefficient matrix, zero where a vector is
+    not a support vector of that head.  One kernel evaluation then gives
+    every decision value, and the result is exactly that of the separate
+    models.  Models trained on the same rows share most of their support
+    vectors, so the merged set is close to the size of one of them.
+    """
+    def __init__(self, support_vectors, dual_coefs, intercepts, gamma, prob_a, prob_b, classes, targets):
+        self.targets = list(targets)
+        self.support_vectors = np.ascontiguousarray(support_vectors, dtype=np.float64)
+        self.dual_coefs = np.asarray(dual_coefs, dtype=np.float64)
+        self.intercepts = np.asarray(intercepts, dtype=np.float64)
+        self.gamma = float(gamma)
+        self.prob_a = np.asarray(prob_a, dtype=np.float64)
+        self.prob_b = np.asarray(prob_b, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.sv_sq_norms = np.einsum('ij,ij->i', self.support_vectors, self.support_vectors)
+
+    @classmethod
+    def from_sklearn(cls, models):
+        """Build from {target: fitted binary RBF SVC}, all trained with the same gamma"""
+        targets = list(models)
+        gammas = {float(model._gamma) for model in models.values()}
+        if len(gammas) != 1:
+            raise ValueError(f"Models must share gamma to be merged, got {sorted(gammas)}")
+
+        stacked = np.vstack([model.support_vectors_ for model in models.values()])
+        support_vectors, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        dual_coefs = np.zeros((len(targets), len(support_vectors)))
+        start = 0
+        for i, model in enumerate(models.values()):
+            count = len(model.support_vectors_)
+            # np.add.at in case a head lists the same row twice
+            np.add.at(dual_coefs[i], inverse[start:start + count], model.dual_coef_[0])
+            start += count
+
+        return cls(
+            support_vectors,
+            dual_coefs,
+            [model.intercept_[0] for model in models.values()],
+            gammas.pop(),
+            [model.probA_[0] for model in models.values()],
+            [model.probB_[0] for model in models.values()],
+            [model.classes_ for model in models.values()],
+            targets
+        )
+
+    @property
+    def nbytes(self):
+        return self.support_vectors.nbytes + self.dual_coefs.nbytes + self.sv_sq_norms.nbytes
+
+    def decision_function(self, X):
+        """(n, targets) decision values for scaled features X"""
+        X = np.asarray(X, dtype=np.float64)
+        sq_dist = np.maximum(
+            np.einsum('ij,ij->i', X, X)[:, np.newaxis]
+            - 2 * X @ self.support_vectors.T + self.sv_sq_norms, 0)
+        return np.exp(-self.gamma * sq_dist) @ self.dual_coefs.T + self.intercepts
+
+    def predict_all(self, X):
+        """{target: (P(class 1), predicted class)} from one kernel evaluation"""
+        decision = self.decision_function(X)
+        return {
+            target: (_platt(decision[:, i], self.prob_a[i], self.prob_b[i]),
+                     self.classes[i][(decision[:, i] > 0).astype(int)])
+            for i, target in enumerate(self.targets)
+        }
+
+def parity_report(model, variant, X_scaled, X_variant=None):
+    """Compare a reduced-precision or compiled variant against the sklearn model.
+
+    X_variant is the variant's input when it differs from the scaled
+    features (CompiledRBFSVM takes raw features).  Returns the largest
+    probability difference and how many patients get a different
+    recommendation.
+    """
+    X_variant = X_scaled if X_variant is None else X_variant
+    reference_prob = model.predict_proba(X_scaled)[:, 1]
+    reference_pred = model.predict(X_scaled)
+    prob = variant.predict_proba(X_variant)[:, 1]
+    pred = variant.predict(X_variant)
+    return {
+        'precision': getattr(variant, 'precision', 'float64'),
+        'samples': int(len(X_scaled)),
+        'max_probability_difference': float(np.max(np.abs(prob - reference_prob))),
+        'mean_probability_difference': float(np.mean(np.abs(prob - reference_prob))),
+        'recommendation_flips': int(np.sum(pred != reference_pred)),
+        'bytes': int(variant.nbytes)
+    }
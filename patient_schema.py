@@ -0,0 +1,147 @@
+import os
+import pickle
+from operator import itemgetter
+
+import numpy as np
+
+# (type, minimum, maximum) for each clinical feature.  'binary' features
+# must be 0 or 1 and 'int' features must be whole numbers.
+FEATURE_CONSTRAINTS = {
+    'age': ('float', 0, 120),
+    'anaemia': ('binary', 0, 1),
+    'creatinine_phosphokinase': ('int', 0, 100000),
+    'diabetes': ('binary', 0, 1),
+    'ejection_fraction': ('int', 0, 100),
+    'high_blood_pressure': ('binary', 0, 1),
+    'platelets': ('float', 0, 2000000),
+    'serum_creatinine': ('float', 0, 30),
+    'serum_sodium': ('int', 90, 200),
+    'sex': ('binary', 0, 1),
+    'smoking': ('binary', 0, 1),
+    'time': ('int', 0, 10000)
+}
+
+class SchemaError(ValueError):
+    """Raised when patient data fails validation.
+
+    errors is a list of {'row', 'field', 'error'} dicts.
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        summary = '; '.join(f"{e['field']}: {e['error']}" for e in errors[:5])
+        if len(errors) > 5:
+            summary += f" (and {len(errors) - 5} more)"
+        super().__init__(f"Invalid patient data: {summary}")
+
+class PatientSchema:
+    """Validates patient records and coerces them into a float matrix.
+
+    The constraints are compiled into arrays once, so a batch is checked
+    with a handful of vectorized comparisons.  Values are pulled out of
+    each record with a single itemgetter call; the per-field Python path
+    only runs to build error messages for records that fail.
+    """
+    def __init__(self, feature_names, constraints=FEATURE_CONSTRAINTS):
+        self.feature_names = list(feature_names)
+        unknown = [name for name in self.feature_names if name not in constraints]
+        if unknown:
+            raise ValueError(f"No constraints defined for features: {unknown}")
+
+        kinds = [constraints[name][0] for name in self.feature_names]
+        self.lower = np.array([constraints[name][1] for name in self.feature_names], dtype=float)
+        self.upper = np.array([constraints[name][2] for name in self.feature_names], dtype=float)
+        self.binary = np.array([kind == 'binary' for kind in kinds])
+        self.integer = np.array([kind in ('int', 'binary') for kind in kinds])
+        self._getter = itemgetter(*self.feature_names)
+        self._single = len(self.feature_names) == 1
+
+    @classmethod
+    def from_file(cls, path=os.path.join('models', 'feature_names.pkl')):
+        with open(path, 'rb') as f:
+            return cls(pickle.load(f))
+
+    def _extract(self, records):
+        """Pull values into a float matrix, or None if any record is malformed"""
+        try:
+            if self._single:
+                values = [(self._getter(record),) for record in records]
+            else:
+                values = [self._getter(record) for record in records]
+            # numpy converts numeric strings, bools and None (to nan) in C
+            return np.array(values, dtype=float).reshape(len(records), len(self.feature_names))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _extract_slowly(self, records):
+        """Per-field extraction that explains what is wrong with each record"""
+        X = np.full((len(records), len(self.feature_names)), np.nan)
+        errors = []
+        # (row, field) cells already explained, skipped by the range checks
+        reported = set()
+        for row, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors.append({'row': row, 'field': None, 'error': 'patient record must be an object'})
+                reported.update((row, name) for name in self.feature_names)
+                continue
+            for col, name in enumerate(self.feature_names):
+                if name not in record:
+                    errors.append({'row': row, 'field': name, 'error': 'missing'})
+                    reported.add((row, name))
+                    continue
+                value = record[name]
+                if value is None:
+                    continue
+                try:
+                    X[row, col] = float(value)
+                except (TypeError, ValueError):
+                    errors.append({'row': row, 'field': name, 'error': f'not a number: {value!r}'})
+                    reported.add((row, name))
+        return X, errors, reported
+
+    def coerce(self, records):
+        """Validate a list of patient dicts.
+
+        Returns (X, errors) where X is an (n, 12) float matrix in
+        feature_names order and errors lists every failing field.
+        Rows that appear in errors must not be scored.
+        """
+        X = self._extract(records)
+        errors = []
+        reported = set()
+        if X is None:
+            X, errors, reported = self._extract_slowly(records)
+
+        null = np.isnan(X)
+        with np.errstate(invalid='ignore'):
+            not_finite = ~np.isfinite(X) & ~null
+            out_of_range = (X < self.lower) | (X > self.upper)
+            not_binary = self.binary & (X != 0) & (X != 1)
+            not_integer = self.integer & (X != np.round(X))
+        invalid = null | not_finite | out_of_range | not_binary | not_integer
+
+        if invalid.any():
+            for row, col in zip(*np.nonzero(invalid)):
+                name = self.feature_names[col]
+                if (row, name) in reported:
+                    continue
+                if null[row, col]:
+                    message = 'must not be null'
+                elif not_finite[row, col]:
+                    message = 'must be a finite number'
+                elif not_binary[row, col]:
+                    message = 'must be 0 or 1'
+                elif out_of_range[row, col]:
+                    message = f'must be between {self.lower[col]:g} and {self.upper[col]:g}'
+                else:
+                    message = 'must be a whole number'
+                errors.append({'row': int(row), 'field': name, 'error': message})
+            errors.sort(key=lambda e: e['row'])
+
+        return X, errors
+
+    def coerce_one(self, record):
+        """Validate one patient, returning a (1, 12) matrix or raising SchemaError"""
+        X, errors = self.coerce([record])
+        if errors:
+            raise SchemaError(errors)
+        return X
@@ -0,0 +1,249 @@
+import cProfile
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Profiling is off unless HEART_PROFILING is set; when it is off no hooks
+# are registered, so requests pay nothing for it.
+ENABLED = os.environ.get('HEART_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get('HEART_PROFILE_DIR', 'profiles')
+SAMPLE_EVERY = int(os.environ.get('HEART_PROFILE_SAMPLE', '0'))
+SLOW_MS = float(os.environ.get('HEART_PROFILE_SLOW_MS', '0'))
+KEEP = int(os.environ.get('HEART_PROFILE_KEEP', '200'))
+
+# Per-request trigger: "X-Profile: 1" header or ?profile=1
+TRIGGER_HEADER = 'X-Profile'
+TRIGGER_PARAM = 'profile'
+
+# How often the slow-request monitor samples the stacks of running requests
+STACK_INTERVAL = 0.005
+
+class ProfileStore:
+    """Rotating on-disk store: one JSON summary per capture, plus a .prof for cProfile"""
+    def __init__(self, directory=PROFILE_DIR, keep=KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, summary, profile=None):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}-{summary['reason']}"
+        summary['name'] = name
+        if profile is not None:
+            profile.dump_stats(os.path.join(self.directory, f'{name}.prof'))
+            summary['prof_file'] = f'{name}.prof'
+        with open(os.path.join(self.directory, f'{name}.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        self._rotate()
+        return name
+
+    def _rotate(self):
+        with self._lock:
+            captures = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+            for name in captures[:max(0, len(captures) - self.keep)]:
+                for path in (name, name[:-5] + '.prof'):
+                    try:
+                        os.remove(os.path.join(self.directory, path))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self):
+        if not os.path.isdir(self.directory):
+            return []
+        captures = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                # Removed by rotation in another worker, or still being written
+                continue
+            captures.append({key: summary.get(key) for key in
+                             ('name', 'reason', 'path', 'method', 'duration_ms', 'timestamp', 'prof_file')})
+        return captures
+
+    def path_for(self, filename):
+        """Full path of a stored file, or None for anything outside the store"""
+        if os.path.basename(filename) != filename or not filename.endswith(('.json', '.prof')):
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.exists(path) else None
+
+def top_functions(profile, limit=25):
+    """Text summary of the most expensive functions, by cumulative time"""
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+class SlowRequestMonitor:
+    """Samples the stacks of requests that run longer than slow_ms.
+
+    A background thread wakes every STACK_INTERVAL seconds and, for each
+    request past the threshold, records its thread's current stack.  Fast
+    requests are never sampled, so the cost is one dict update per request.
+    """
+    def __init__(self, slow_ms):
+        self.slow_ms = slow_ms
+        self.in_flight = {}
+        self.samples = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each worker starts its own monitor
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='slow-request-monitor', daemon=True).start()
+            self._pid = os.getpid()
+
+    def begin(self, thread_id):
+        self._ensure_started()
+        with self._lock:
+            self.in_flight[thread_id] = time.perf_counter()
+            self.samples[thread_id] = Counter()
+
+    def end(self, thread_id):
+        """Stop watching a request; returns its stack samples"""
+        with self._lock:
+            self.in_flight.pop(thread_id, None)
+            return self.samples.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(STACK_INTERVAL)
+            now = time.perf_counter()
+            with self._lock:
+                slow = [tid for tid, start in self.in_flight.items() if 1000 * (now - start) > self.slow_ms]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            for tid in slow:
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = ''.join(traceback.format_stack(frame, limit=30))
+                with self._lock:
+                    if tid in self.samples:
+                        self.samples[tid][stack] += 1
+
+class RequestProfiler:
+    """Opt-in profiling for a Flask app.
+
+    A request is traced with cProfile when it carries the trigger header
+    or query parameter, or when it is the sample_every-th request.  Any
+    request slower than slow_ms also keeps a summary of the stacks it was
+    seen in.  Captures are written once the response has been sent.
+    Work done in the scoring process pool is not traced.
+    """
+    def __init__(self, store=None, sample_every=SAMPLE_EVERY, slow_ms=SLOW_MS):
+        self.store = store or ProfileStore()
+        self.sample_every = sample_every
+        self.slow_ms = slow_ms
+        self.monitor = SlowRequestMonitor(slow_ms) if slow_ms > 0 else None
+        self._counter = itertools.count(1)
+
+    def install(self, app):
+        from flask import g, request
+
+        @app.before_request
+        def start_profiling():
+            g.profile_start = time.perf_counter()
+            g.profile = None
+            g.profile_reason = None
+            if request.headers.get(TRIGGER_HEADER) == '1' or request.args.get(TRIGGER_PARAM) == '1':
+                g.profile_reason = 'requested'
+            elif self.sample_every and next(self._counter) % self.sample_every == 0:
+                g.profile_reason = 'sampled'
+            if g.profile_reason:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                    g.profile = profile
+                except ValueError:
+                    # Another profiler is already active on this interpreter
+                    g.profile_reason = None
+            if self.monitor:
+                self.monitor.begin(threading.get_ident())
+
+        @app.after_request
+        def finish_profiling(response):
+            profile = g.get('profile')
+            if profile is not None:
+                profile.disable()
+            duration_ms = 1000 * (time.perf_counter() - g.profile_start)
+            stacks = self.monitor.end(threading.get_ident()) if self.monitor else None
+
+            summary = {
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'duration_ms': duration_ms,
+                'timestamp': datetime.now().isoformat()
+            }
+            if profile is not None:
+                summary['reason'] = g.profile_reason
+                response.call_on_close(lambda: self._save(summary, profile))
+            elif stacks is not None and duration_ms > self.slow_ms:
+                summary['reason'] = 'slow'
+                summary['stack_samples'] = [
+                    {'count': count, 'stack': stack} for stack, count in stacks.most_common(10)
+                ]
+                response.call_on_close(lambda: self._save(summary))
+            return response
+
+    def _save(self, summary, profile=None):
+        try:
+            if profile is not None:
+                summary['top_functions'] = top_functions(profile)
+            self.store.save(summary, profile)
+        except Exception as e:
+            logger.error(f"Error saving profile: {str(e)}")
+
+def install(app):
+    """Register the profiling hooks and admin routes if HEART_PROFILING is set"""
+    if not ENABLED:
+        return None
+
+    from flask import jsonify, send_file
+
+    profiler = RequestProfiler()
+    profiler.install(app)
+
+    @app.route('/admin/profiles', methods=['GET'])
+    def list_profiles():
+        """Captured profiles, newest first"""
+        # In production, you might want to secure this endpoint
+        return jsonify({
+            'profiles': profiler.store.list(),
+            'sample_every': profiler.sample_every,
+            'slow_ms': profiler.slow_ms,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    @app.route('/admin/profiles/<filename>', methods=['GET'])
+    def download_profile(filename):
+        """Download a capture's JSON summary or its .prof file (open with pstats or snakeviz)"""
+        path = profiler.store.path_for(filename)
+        if path is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return send_file(os.path.abspath(path), as_attachment=filename.endswith('.prof'))
+
+    logger.info(f"Profiling enabled: 1 in {profiler.sample_every or 'no'} requests sampled, "
+                f"slow threshold {profiler.slow_ms or 'off'} ms, stored in {profiler.store.directory}")
+    return profiler
@@ -0,0 +1,144 @@
+import os
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = 'serving_config.json'
+
+DEFAULT_CONFIG = {
+    'app': 'simple_app',
+    'bind': '0.0.0.0:5000',
+    'workers': 2,
+    'threads': 4,
+    'scoring_processes': 0,
+    'scoring_timeout': 10.0,
+    'worker_timeout': 30,
+    # Admission control for the prediction endpoints (see admission.py);
+    # None derives the limit from threads and scoring_processes
+    'max_in_flight': None,
+    'max_queue': None,
+    'queue_timeout': 0.5,
+    # Written by check_installation.py --write-config from the hardware
+    # probe; None leaves the library defaults alone
+    'blas_threads': None,
+    'batch_rows': None,
+    'training_chunk_rows': None
+}
+
+# Environment variables take precedence over the config file
+ENV_OVERRIDES = {
+    'HEART_APP': ('app', str),
+    'HEART_BIND': ('bind', str),
+    'HEART_WORKERS': ('workers', int),
+    'HEART_THREADS': ('threads', int),
+    'HEART_SCORING_PROCESSES': ('scoring_processes', int),
+    'HEART_SCORING_TIMEOUT': ('scoring_timeout', float),
+    'HEART_WORKER_TIMEOUT': ('worker_timeout', int),
+    'HEART_MAX_IN_FLIGHT': ('max_in_flight', int),
+    'HEART_MAX_QUEUE': ('max_queue', int),
+    'HEART_QUEUE_TIMEOUT': ('queue_timeout', float),
+    'HEART_BLAS_THREADS': ('blas_threads', int),
+    'HEART_BATCH_ROWS': ('batch_rows', int),
+    'HEART_TRAINING_CHUNK_ROWS': ('training_chunk_rows', int)
+}
+
+# Thread-count variables read by the BLAS and OpenMP runtimes
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                   'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+def load_config(path=None):
+    """Load serving configuration from defaults, config file and environment"""
+    config = dict(DEFAULT_CONFIG)
+    config['workers'] = max(2, (os.cpu_count() or 1))
+
+    path = path or os.environ.get('HEART_SERVING_CONFIG', CONFIG_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                config.update(json.load(f))
+            logger.info(f"Loaded serving config from {path}")
+        except Exception as e:
+            logger.error(f"Error reading serving config {path}: {str(e)}")
+
+    for env_name, (key, cast) in ENV_OVERRIDES.items():
+        if env_name in os.environ:
+            config[key] = cast(os.environ[env_name])
+
+    return config
+
+def apply_thread_limits(config):
+    """Cap BLAS/OpenMP threads per process at config['blas_threads'].
+
+    Without a cap every worker and scoring process starts one BLAS thread
+    per core, so the machine runs many more threads than cores.  The
+    environment variables cover libraries loaded later and child
+    processes (variables already set are kept); threadpoolctl, when
+    installed, also resizes the pools of libraries already loaded.
+    """
+    threads = config.get('blas_threads')
+    if not threads:
+        return None
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(threads))
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return None
+    return threadpool_limits(limits=int(os.environ.get('OMP_NUM_THREADS', threads)))
+
+def _noop():
+    return None
+
+class ScoringPool:
+    """Runs CPU-bound scoring in forked processes instead of request threads.
+
+    The pool is forked after the models are loaded, so the child processes
+    share the model memory with their parent copy-on-write.  With zero
+    processes scoring runs inline in the calling thread.
+    """
+    def __init__(self):
+        self.executor = None
+        self.processes = 0
+        self.timeout = DEFAULT_CONFIG['scoring_timeout']
+
+    def start(self, processes, timeout=None):
+        """Fork the scoring processes (call after models are loaded)"""
+        if timeout is not None:
+            self.timeout = timeout
+        if processes <= 0 or self.executor is not None:
+            return
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            logger.warning("fork is not available on this platform, scoring will run inline")
+            return
+
+        context = multiprocessing.get_context('fork')
+        self.executor = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+        self.processes = processes
+
+        # Fork every process now, before request threads exist
+        for future in [self.executor.submit(_noop) for _ in range(processes)]:
+            future.result()
+        logger.info(f"Scoring pool started with {processes} processes")
+
+    def run(self, func, *args):
+        """Run func(*args) in the pool, or inline if no pool is running.
+
+        func must be a module-level function so it can be sent to the
+        child processes by reference.
+        """
+        if self.executor is None:
+            return func(*args)
+        return self.executor.submit(func, *args).result(timeout=self.timeout)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.processes = 0
+
+# Shared pool used by the Flask apps
+scoring_pool = ScoringPool()
@@ -5,6 +5,7 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.svm import SVC
 import joblib
 import os
+import memory_stats
 
 def setup_models():
     """Setup and train models from your dataset"""
@@ -65,7 +66,9 @@ def setup_models():
     }
 
 if __name__ == "__main__":
-    results = setup_models()
+    with memory_stats.measure_peak() as training_memory:
+        results = setup_models()
     print("\nModel Performance:")
     for key, value in results.items():
         print(f"{key}: {value}")
+    print(f"peak_memory_mb: {training_memory['peak_traced_mb']:.1f}")
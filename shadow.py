@@ -0,0 +1,132 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TARGETS = ['aspirin', 'heparin']
+
+# Latency samples kept per candidate for the percentiles
+LATENCY_WINDOW = 1000
+
+class ShadowMetrics:
+    """How a candidate model compares with the served predictions"""
+    def __init__(self):
+        self.scored = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.agreed = {target: 0 for target in TARGETS}
+        self.delta_sum = {target: 0.0 for target in TARGETS}
+        self.delta_max = {target: 0.0 for target in TARGETS}
+
+    def add(self, scores, predictions, latency_ms):
+        self.scored += 1
+        self.latencies.append(latency_ms)
+        for target in TARGETS:
+            delta = abs(float(scores[f'{target}_probability'][0]) - predictions[target]['probability'])
+            self.delta_sum[target] += delta
+            self.delta_max[target] = max(self.delta_max[target], delta)
+            self.agreed[target] += int(bool(scores[f'{target}_recommendation'][0]) ==
+                                       predictions[target]['recommendation'])
+
+    def summary(self):
+        latencies = np.array(self.latencies)
+        summary = {
+            'scored': self.scored,
+            'errors': self.errors,
+            'mean_ms': float(latencies.mean()) if len(latencies) else None,
+            'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else None
+        }
+        for target in TARGETS:
+            summary[f'{target}_agreement'] = self.agreed[target] / self.scored if self.scored else None
+            summary[f'{target}_mean_probability_delta'] = self.delta_sum[target] / self.scored if self.scored else None
+            summary[f'{target}_max_probability_delta'] = self.delta_max[target]
+        return summary
+
+class ShadowScorer:
+    """Scores live requests with candidate models in the background.
+
+    submit() only puts the validated feature row and the served
+    predictions on a bounded queue; a small pool of threads scores each
+    row with every candidate set listed in the registry's routing
+    ('shadow').  When the queue is full the request is dropped and
+    counted, so shadow work never holds up or piles behind live traffic.
+    """
+    def __init__(self, registry, workers=2, max_queue=1000):
+        self.registry = registry
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.submitted = 0
+        self.dropped = 0
+        self.metrics = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def candidates(self):
+        return self.registry.routing.get('shadow', [])
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each worker starts its own pool
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f'shadow-{i}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, features, predictions, model_name):
+        """Queue one scored request for the candidates other than model_name"""
+        candidates = [name for name in self.candidates if name != model_name]
+        if not candidates:
+            return
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((features, predictions, candidates))
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Shadow queue full, {self.dropped} requests dropped so far")
+
+    def _run(self):
+        while True:
+            features, predictions, candidates = self.queue.get()
+            for name in candidates:
+                with self._lock:
+                    metrics = self.metrics.setdefault(name, ShadowMetrics())
+                try:
+                    start = time.perf_counter()
+                    scores = self.registry.predict_batch(name, features)
+                    latency_ms = 1000 * (time.perf_counter() - start)
+                except Exception as e:
+                    # A candidate removed by a reload, or one that fails on this row
+                    with self._lock:
+                        metrics.errors += 1
+                    logger.error(f"Shadow scoring with {name} failed: {str(e)}")
+                    continue
+                with self._lock:
+                    metrics.add(scores, predictions, latency_ms)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'candidates': self.candidates,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'queued': self.queue.qsize(),
+                'models': {name: metrics.summary() for name, metrics in self.metrics.items()}
+            }
+
+    def reset(self):
+        with self._lock:
+            self.metrics = {}
+            self.submitted = 0
+            self.dropped = 0
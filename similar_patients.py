@@ -0,0 +1,164 @@
+import csv
+import logging
+import os
+
+import joblib
+import numpy as np
+
+from incremental import NEW_ROWS_FILE
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'similar_index.joblib'
+OUTCOMES = ['aspirin', 'heparin', 'DEATH_EVENT']
+
+# New rows are searched by brute force until there are this many, then
+# the tree is rebuilt to include them
+REBUILD_THRESHOLD = 256
+
+MAX_K = 50
+
+def read_rows(path, feature_names):
+    """Feature matrix and outcome columns from a CSV (missing outcomes are -1)"""
+    features, outcomes = [], []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            features.append([float(row[name]) for name in feature_names])
+            outcomes.append([int(float(row[name])) if row.get(name) not in (None, '') else -1
+                             for name in OUTCOMES])
+    return (np.array(features, dtype=float).reshape(-1, len(feature_names)),
+            np.array(outcomes, dtype=int).reshape(-1, len(OUTCOMES)))
+
+class SimilarPatients:
+    """Nearest historical patients in the scaled feature space.
+
+    A KD-tree is built over the cohort CSV plus any labelled rows added
+    through /update, in the space of the scaler that was current at build
+    time (kept with the index, so later scaler updates do not invalidate
+    it).  Rows added afterwards go to a small buffer that is searched by
+    brute force and merged into the tree once it reaches
+    REBUILD_THRESHOLD rows.
+    """
+    def __init__(self, feature_names, mean, scale):
+        self.feature_names = list(feature_names)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.tree = None
+        self.features = np.empty((0, len(self.feature_names)))
+        self.outcomes = np.empty((0, len(OUTCOMES)), dtype=int)
+        self.sources = np.empty(0, dtype='<U6')
+        self.indexed = 0
+        self.appended_rows = 0
+
+    def _scale(self, X):
+        return (np.asarray(X, dtype=float) - self.mean) / self.scale
+
+    def rebuild(self):
+        """Rebuild the tree over every row, emptying the buffer"""
+        from scipy.spatial import cKDTree
+
+        self.tree = cKDTree(self._scale(self.features))
+        self.indexed = len(self.features)
+
+    def add(self, X, outcomes, source='new'):
+        """Add labelled rows; the tree is rebuilt once the buffer is large enough"""
+        self.features = np.vstack([self.features, X])
+        self.outcomes = np.vstack([self.outcomes, outcomes])
+        self.sources = np.concatenate([self.sources, np.full(len(X), source)])
+        if self.tree is None or len(self.features) - self.indexed >= REBUILD_THRESHOLD:
+            self.rebuild()
+            return True
+        return False
+
+    def query(self, X, k=5):
+        """Indices and distances of the k nearest rows for each row of X"""
+        X_scaled = self._scale(X)
+        k = min(k, len(self.features))
+        distances, indices = self.tree.query(X_scaled, k=min(k, self.indexed))
+        distances = distances.reshape(len(X), -1)
+        indices = indices.reshape(len(X), -1)
+
+        buffered = self._scale(self.features[self.indexed:])
+        if len(buffered):
+            buffer_distances = np.sqrt(
+                ((X_scaled[:, np.newaxis, :] - buffered[np.newaxis, :, :]) ** 2).sum(axis=2))
+            distances = np.hstack([distances, buffer_distances])
+            indices = np.hstack([indices, np.broadcast_to(
+                np.arange(self.indexed, len(self.features)), buffer_distances.shape)])
+            order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            distances = np.take_along_axis(distances, order, axis=1)
+            indices = np.take_along_axis(indices, order, axis=1)
+        return distances, indices
+
+    def neighbours(self, X, k=5):
+        """Response dicts with features and outcomes for the k nearest rows"""
+        distances, indices = self.query(X, k)
+        # One tolist() per array for the selected rows, not a conversion per value
+        columns = zip(distances.tolist(), indices.tolist(), self.sources[indices].tolist(),
+                      self.features[indices].tolist(), self.outcomes[indices].tolist())
+        results = []
+        for row in columns:
+            results.append([
+                {
+                    'row': index,
+                    'source': source,
+                    'distance': distance,
+                    'features': dict(zip(self.feature_names, features)),
+                    'outcomes': {
+                        name.lower(): (value if value >= 0 else None)
+                        for name, value in zip(OUTCOMES, outcomes)
+                    }
+                }
+                for distance, index, source, features, outcomes in zip(*row)
+            ])
+        return results
+
+    def sync(self, models_dir):
+        """Add rows appended to new_outcomes.csv since the index last saw it"""
+        path = os.path.join(models_dir, NEW_ROWS_FILE)
+        if not os.path.exists(path):
+            return 0
+        X, outcomes = read_rows(path, self.feature_names)
+        new = len(X) - self.appended_rows
+        if new > 0:
+            self.add(X[self.appended_rows:], outcomes[self.appended_rows:])
+            self.appended_rows = len(X)
+        return max(new, 0)
+
+    def save(self, path):
+        # Written to a temporary file first, since workers may rebuild concurrently
+        temporary = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(self, temporary)
+        os.replace(temporary, path)
+
+def index_path(models_dir='models'):
+    return os.path.join(models_dir, INDEX_FILE)
+
+def load_or_build(models_dir, csv_path, scaler, feature_names):
+    """Load the saved index, or build it from the cohort CSV, then add new rows.
+
+    The index is saved whenever it was built or its tree was rebuilt.
+    """
+    path = index_path(models_dir)
+    index = None
+    if os.path.exists(path):
+        try:
+            index = joblib.load(path)
+            if index.feature_names != list(feature_names):
+                index = None
+        except Exception as e:
+            logger.error(f"Error loading similar-patient index: {str(e)}")
+            index = None
+
+    changed = False
+    if index is None:
+        index = SimilarPatients(feature_names, scaler.mean_, scaler.scale_)
+        X, outcomes = read_rows(csv_path, feature_names)
+        index.add(X, outcomes, source='cohort')
+        changed = True
+
+    indexed = index.indexed
+    index.sync(models_dir)
+    if changed or index.indexed != indexed:
+        index.save(path)
+    return index
@@ -1,11 +1,29 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
 import numpy as np
 import pickle
 import os
+import time
+import threading
 from datetime import datetime
 import logging
+import serving
+from serving import scoring_pool
+import model_store
+from audit_log import AuditLog
+from patient_schema import PatientSchema, SchemaError
+import profiling
+from fast_json import json_response, prediction_rows, columnar_predictions
+from evaluate_models import load_evaluation
+import incremental
+from model_registry import CASCADE_FILE, ModelRegistry, ModelSet, combine_usage, compiled_model_set
+from feature_store import FeatureStore, stored_scores
+from shadow import ShadowScorer
+import similar_patients
+import warmup
+import admission
+import memory_stats
+import artifacts
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,16 +32,71 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
+# Opt-in request profiling (HEART_PROFILING=1), no hooks otherwise
+profiling.install(app)
+
+MODEL_VERSION = '1.0'
+
+# serving_config.json, as tuned by check_installation.py --write-config
+serving_config = serving.load_config()
+
+# Every /predict input and output, written in the background
+audit_log = AuditLog()
+
+# Named model sets for per-request selection and A/B routing
+registry = ModelRegistry('models')
+
+# Candidate models scored on live traffic after the response is sent
+shadow = ShadowScorer(registry)
+
+# Warm-up state behind /readyz (see warmup.py)
+readiness = warmup.Readiness()
+
+# Patient features by patient_id, so clients can predict by ID
+feature_store = FeatureStore()
+
+# Bounded concurrency and fast 503s for the scoring endpoints; /health
+# and the admin routes are never queued
+admission.install(app, ['predict_treatment', 'predict_batch', 'similar'], serving_config)
+
+# Historical cohort searched by /similar
+COHORT_CSV = 'new heart clinical.csv'
+
+# How often scoring checks the model files for updates
+RELOAD_CHECK_SECONDS = 5.0
+
+def models_mtime(models_dir):
+    """Latest modification time of the served model files"""
+    files = ['scaler.pkl', 'aspirin_model.pkl', 'heparin_model.pkl', model_store.BUNDLE_FILE, CASCADE_FILE]
+    paths = [os.path.join(models_dir, name) for name in files]
+    return max((os.path.getmtime(path) for path in paths if os.path.exists(path)), default=None)
+
 class SimpleHeartPredictor:
     def __init__(self):
         self.scaler = None
         self.aspirin_model = None
         self.heparin_model = None
         self.feature_names = None
+        self.schema = None
+        self.similar = None
+        self.memory = None
         self.is_loaded = False
+        self.models_mtime = None
+        self._last_reload_check = 0.0
+        # One load at a time; the served models are swapped under _swap_lock
+        self._load_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        # Held while a background reload is running
+        self._reloading = threading.Lock()
         
     def load_models(self):
-        """Load pre-trained models"""
+        """Load pre-trained models.
+        
+        Everything is read, indexed and warmed up before it replaces the
+        models being served, so scoring never sees a partial set.  If the
+        model files change while they are read, the load is abandoned and
+        the next reload check tries again.
+        """
         try:
             models_dir = 'models'
             
@@ -32,76 +105,277 @@ class SimpleHeartPredictor:
                 logger.error("Models directory not found. Please run simple_setup.py first.")
                 return False
             
-            # Load models using pickle
-            with open(os.path.join(models_dir, 'scaler.pkl'), 'rb') as f:
-                self.scaler = pickle.load(f)
-            
-            with open(os.path.join(models_dir, 'aspirin_model.pkl'), 'rb') as f:
-                self.aspirin_model = pickle.load(f)
+            with self._load_lock:
+                mtime = models_mtime(models_dir)
+                models, bundle = self.read_models(models_dir)
+                scaler, feature_names = models['scaler'], models['feature_names']
+                sets = self.model_sets(models, bundle)
+                similar = self.build_similar_index(models_dir, scaler, feature_names)
+                if models_mtime(models_dir) != mtime:
+                    logger.warning("Model files changed while loading, keeping the current models")
+                    return False
+                warmup_summary = self.warm_up(models_dir, feature_names, sets, similar)
                 
-            with open(os.path.join(models_dir, 'heparin_model.pkl'), 'rb') as f:
-                self.heparin_model = pickle.load(f)
-            
-            with open(os.path.join(models_dir, 'feature_names.pkl'), 'rb') as f:
-                self.feature_names = pickle.load(f)
-            
-            self.is_loaded = True
-            logger.info("Models loaded successfully")
-            logger.info(f"Feature names: {self.feature_names}")
-            return True
+                with self._swap_lock:
+                    self.scaler = scaler
+                    self.aspirin_model = models['aspirin_model']
+                    self.heparin_model = models['heparin_model']
+                    self.feature_names = feature_names
+                    self.schema = PatientSchema(feature_names)
+                    self.similar = similar
+                    registry.install(sets)
+                    self.models_mtime = mtime
+                    self.is_loaded = True
+                logger.info(f"Model sets available: {sorted(sets)}")
+                logger.info(f"Feature names: {feature_names}")
+                self.record_warmup(warmup_summary, sets)
+                self.measure_memory()
+                self.load_feature_store()
+                return True
             
         except Exception as e:
             logger.error(f"Error loading models: {str(e)}")
             return False
     
+    def read_models(self, models_dir):
+        """Read the served pair, its scaler and the feature names.
+        
+        Returns (models, bundle): the shared memory-mapped bundle is
+        preferred (see model_store.py) and bundle is None without one.
+        """
+        bundle_file = model_store.bundle_path(models_dir)
+        if os.path.exists(bundle_file):
+            bundle = model_store.load_bundle(bundle_file)
+            logger.info(f"Models mapped from {bundle_file}")
+            return bundle, bundle
+        
+        # Load models using pickle
+        models = {}
+        for name in ('scaler', 'aspirin_model', 'heparin_model', 'feature_names'):
+            with open(os.path.join(models_dir, f'{name}.pkl'), 'rb') as f:
+                models[name] = pickle.load(f)
+        logger.info("Models loaded successfully")
+        return models, None
+    
+    def model_sets(self, models, bundle=None):
+        """Register the served pair as 'svm' alongside the other model sets.
+        
+        'compiled' is the same pair with the scaler folded in and the
+        binary features precomputed (see numpy_inference.CompiledRBFSVM).
+        """
+        scaler, aspirin_model, heparin_model = models['scaler'], models['aspirin_model'], models['heparin_model']
+        sets = {'svm': ModelSet('svm', scaler, aspirin_model, heparin_model, source='models')}
+        compiled = compiled_model_set('compiled', scaler, aspirin_model, heparin_model,
+                                      models['feature_names'], source='models')
+        if compiled is not None:
+            sets['compiled'] = compiled
+        return registry.discover(bundle, sets=sets)
+    
+    def build_similar_index(self, models_dir, scaler, feature_names):
+        """Load or build the similar-patient index; /similar is unavailable if this fails"""
+        try:
+            similar = similar_patients.load_or_build(models_dir, COHORT_CSV, scaler, feature_names)
+            logger.info(f"Similar-patient index covers {len(similar.features)} patients")
+            return similar
+        except Exception as e:
+            logger.error(f"Error building similar-patient index: {str(e)}")
+            return None
+    
+    def measure_memory(self):
+        """Record the size of every loaded model set (served on /admin/memory)"""
+        objects = {}
+        for name, model_set in registry.sets.items():
+            objects[f'{name}.scaler'] = model_set.scaler
+            for target, model in model_set.models.items():
+                objects[f'{name}.{target}'] = model
+            objects[f'{name}.joint'] = getattr(model_set, 'joint_model', None)
+        objects['similar_index'] = self.similar
+        self.memory = memory_stats.model_sizes(objects)
+        memory_stats.log_model_sizes(self.memory)
+    
+    def warm_up(self, models_dir, feature_names, sets, similar):
+        """Score representative patients through every model set before reporting ready.
+        
+        Returns the warm-up summary, or None if warm-up was skipped or failed.
+        """
+        if warmup.WARMUP_ROWS <= 0:
+            readiness.skip()
+            return None
+        X, source = warmup.warmup_features(feature_names, models_dir, COHORT_CSV)
+        scorers = {
+            name: (lambda features, model_set=model_set: format_predictions(model_set.predict_batch(features)))
+            for name, model_set in sets.items()
+        }
+        if similar is not None:
+            scorers['similar'] = similar.neighbours
+        return readiness.run(scorers, X, source=source)
+    
+    def record_warmup(self, summary, sets):
+        """Store per-model warm-up times from a warm_up() summary in the registry metrics"""
+        if summary is None:
+            return
+        for name, timings in summary['models'].items():
+            if name in sets:
+                registry.record_warmup(name, timings['duration_ms'])
+    
+    def warm_up_worker(self):
+        """Warm up the served models again in a freshly forked worker.
+        
+        A worker forked from a preloaded master inherits the master's
+        ready state, but not its BLAS threads or touched model pages.
+        """
+        if not self.is_loaded:
+            return
+        readiness.reset()
+        sets = registry.sets
+        self.record_warmup(self.warm_up('models', self.feature_names, sets, self.similar), sets)
+    
+    def load_feature_store(self):
+        """Open the patient store and bring its stored predictions up to the new models"""
+        try:
+            feature_store.open(self.feature_names)
+        except ValueError as e:
+            logger.error(f"Feature store not used: {str(e)}")
+            return
+        refresh_stored_predictions()
+    
+    def reload_if_changed(self):
+        """Reload when another process has written new models.
+        
+        Checked at most every RELOAD_CHECK_SECONDS, so /update in one
+        worker reaches every worker and scoring process.  The reload runs
+        in a background thread and the current models keep serving until
+        the new ones are loaded and warmed up.
+        """
+        now = time.monotonic()
+        if now - self._last_reload_check < RELOAD_CHECK_SECONDS:
+            return
+        self._last_reload_check = now
+        if (self.is_loaded and models_mtime('models') != self.models_mtime
+                and self._reloading.acquire(blocking=False)):
+            logger.info("Model files changed, reloading in the background")
+            threading.Thread(target=self._background_reload, name='model-reload', daemon=True).start()
+    
+    def _background_reload(self):
+        try:
+            self.load_models()
+        finally:
+            self._reloading.release()
+    
     def predict(self, patient_data):
         """Make predictions for a patient"""
         if not self.is_loaded:
             raise ValueError("Models not loaded")
         
+        # Raises SchemaError (a ValueError) with per-field details
+        features = self.schema.coerce_one(patient_data)
+        return format_predictions(self.predict_batch(features))[0]
+    
+    def predict_batch(self, features):
+        """Score a validated (n, 12) feature matrix.
+        
+        Returns a dict of arrays: probability and recommendation per target.
+        """
+        if not self.is_loaded:
+            raise ValueError("Models not loaded")
+        
+        # The scaler and models of one load, even if a reload swaps them meanwhile
+        with self._swap_lock:
+            scaler, aspirin_model, heparin_model = self.scaler, self.aspirin_model, self.heparin_model
+        
         try:
-            # Convert patient data to the correct format
-            # Ensure we have all required features in the correct order
-            patient_values = []
-            for feature in self.feature_names:
-                if feature in patient_data:
-                    patient_values.append(patient_data[feature])
-                else:
-                    raise ValueError(f"Missing feature: {feature}")
-            
-            # Convert to numpy array and reshape
-            patient_array = np.array(patient_values).reshape(1, -1)
-            
             # Scale the features
-            patient_scaled = self.scaler.transform(patient_array)
+            scaled = scaler.transform(features)
             
             # Get predictions and probabilities
-            aspirin_prob = self.aspirin_model.predict_proba(patient_scaled)[0][1]
-            heparin_prob = self.heparin_model.predict_proba(patient_scaled)[0][1]
-            
-            aspirin_prediction = self.aspirin_model.predict(patient_scaled)[0]
-            heparin_prediction = self.heparin_model.predict(patient_scaled)[0]
-            
             return {
-                'aspirin': {
-                    'probability': float(aspirin_prob),
-                    'recommendation': bool(aspirin_prediction),
-                    'confidence': float(aspirin_prob) if aspirin_prediction else float(1 - aspirin_prob)
-                },
-                'heparin': {
-                    'probability': float(heparin_prob),
-                    'recommendation': bool(heparin_prediction),
-                    'confidence': float(heparin_prob) if heparin_prediction else float(1 - heparin_prob)
-                }
+                'aspirin_probability': aspirin_model.predict_proba(scaled)[:, 1],
+                'aspirin_recommendation': aspirin_model.predict(scaled).astype(bool),
+                'heparin_probability': heparin_model.predict_proba(scaled)[:, 1],
+                'heparin_recommendation': heparin_model.predict(scaled).astype(bool)
             }
             
         except Exception as e:
             logger.error(f"Error making prediction: {str(e)}")
             raise e
 
+def format_predictions(scores):
+    """Turn predict_batch() arrays into per-patient response dicts"""
+    return prediction_rows(scores)
+
 # Initialize predictor
 predictor = SimpleHeartPredictor()
 
+def prediction_key():
+    """Identifies the default model set and model files behind a stored prediction"""
+    return f'{MODEL_VERSION}/{registry.default}@{predictor.models_mtime}'
+
+def refresh_stored_predictions(force=False):
+    """Score stored patients lacking a prediction from the current default models, in the background"""
+    model_name = registry.default
+    thread = threading.Thread(
+        target=feature_store.refresh_predictions,
+        args=(lambda features: registry.predict_batch(model_name, features), prediction_key(), force),
+        name='feature-store-refresh',
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+def score_patient(features):
+    """Score one patient (module-level so the scoring pool can run it)"""
+    predictor.reload_if_changed()
+    return format_predictions(predictor.predict_batch(features))[0]
+
+def score_with_model(features, model_name):
+    """Score one patient with a named model set.
+    
+    Returns (predictions, agreement, score_ms, usage) where agreement says,
+    per target, whether the recommendation matches the default set (None
+    when the default set was used), score_ms times the named set alone and
+    usage is for registry.record() in the serving process.
+    """
+    predictor.reload_if_changed()
+    start = time.perf_counter()
+    scores, usage = registry.score(model_name, features)
+    score_ms = 1000 * (time.perf_counter() - start)
+    if model_name == registry.default:
+        return format_predictions(scores)[0], None, score_ms, usage
+    
+    reference = registry.predict_batch(registry.default, features)
+    agreement = {
+        target: bool(scores[f'{target}_recommendation'][0] == reference[f'{target}_recommendation'][0])
+        for target in ('aspirin', 'heparin')
+    }
+    return format_predictions(scores)[0], agreement, score_ms, usage
+
+def score_batch(features, model_name=None):
+    """Score a feature matrix (module-level so the scoring pool can run it).
+    
+    Returns (scores, usage); usage is for registry.record_usage() in the
+    serving process.  Large batches are scored batch_rows rows at a time,
+    the size the hardware probe found fastest per row.
+    """
+    predictor.reload_if_changed()
+    rows = serving_config['batch_rows']
+    if rows and len(features) > rows:
+        parts = [score_batch(features[start:start + rows], model_name)
+                 for start in range(0, len(features), rows)]
+        scores = {key: np.concatenate([part[key] for part, _ in parts]) for key in parts[0][0]}
+        return scores, combine_usage(usage for _, usage in parts)
+    if model_name is not None:
+        return registry.score(model_name, features)
+    return predictor.predict_batch(features), None
+
+# Model sizes and opt-in per-stage allocations (HEART_MEMORY_TRACKING=1)
+memory_stats.install(app, lambda: predictor.memory)
+
+# Exported model files for the browser, with ETags and gzip variants
+artifacts.install(app)
+
+# /livez and /readyz for orchestrators; /health stays as it was
+warmup.install(app, readiness, lambda: predictor.is_loaded)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -109,6 +383,8 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'models_loaded': predictor.is_loaded,
+        'ready': predictor.is_loaded and readiness.ready,
+        'warmup': readiness.stats()['last_warmup'],
         'features': predictor.feature_names if predictor.is_loaded else None
     })
 
@@ -116,6 +392,8 @@ def health_check():
 def predict_treatment():
     """Predict treatment recommendations for a patient"""
     try:
+        start = time.perf_counter()
+        
         # Get patient data from request
         patient_data = request.json
         
@@ -126,31 +404,86 @@ def predict_treatment():
         if not predictor.is_loaded:
             return jsonify({'error': 'Models not loaded. Please contact administrator.'}), 500
         
-        # Validate required fields
-        missing_fields = []
-        for feature in predictor.feature_names:
-            if feature not in patient_data:
-                missing_fields.append(feature)
+        # A patient_id sent without features is looked up in the feature store
+        stored_id = None
+        if 'patient_id' in patient_data and not any(name in patient_data for name in predictor.feature_names):
+            if not feature_store.available:
+                return jsonify({'error': 'Feature store not available'}), 503
+            stored_id = str(patient_data['patient_id'])
+            with memory_stats.tracker.stage('predict', 'lookup'):
+                features, found = feature_store.get_many([stored_id])
+            if not found:
+                return jsonify({'error': f'Unknown patient: {stored_id}'}), 404
+        else:
+            # Validate and coerce all 12 features in one step
+            try:
+                with memory_stats.tracker.stage('predict', 'validate'):
+                    features = predictor.schema.coerce_one(patient_data)
+            except SchemaError as e:
+                return jsonify({
+                    'error': str(e),
+                    'errors': e.errors,
+                    'required_fields': predictor.feature_names
+                }), 400
         
-        if missing_fields:
+        # Requested with ?model= or "model" in the body, otherwise routed
+        try:
+            model_name = registry.choose(
+                request.args.get('model', patient_data.get('model')),
+                patient_data.get('patient_id')
+            )
+        except KeyError as e:
             return jsonify({
-                'error': f'Missing required fields: {missing_fields}',
-                'required_fields': predictor.feature_names
+                'error': f'Unknown model: {e.args[0]}',
+                'available_models': sorted(registry.sets)
             }), 400
         
+        validated = time.perf_counter()
+        
+        # A stored patient's precomputed prediction is used while it is current
+        stored = {}
+        if stored_id is not None and model_name == registry.default:
+            stored = feature_store.predictions([stored_id], prediction_key())
+        
         # Make prediction
-        predictions = predictor.predict(patient_data)
+        with memory_stats.tracker.stage('predict', 'score'):
+            if stored:
+                predictions = format_predictions(stored_scores(stored, [stored_id]))[0]
+            else:
+                predictions, agreement, score_ms, usage = scoring_pool.run(score_with_model, features, model_name)
+        scored = time.perf_counter()
+        if not stored:
+            registry.record(model_name, score_ms, agreement, usage)
         
         # Add metadata
         response = {
             'predictions': predictions,
             'patient_id': patient_data.get('patient_id', 'Unknown'),
             'timestamp': datetime.now().isoformat(),
-            'model_version': '1.0',
+            'model_version': MODEL_VERSION,
+            'model': model_name,
+            'precomputed': bool(stored),
             'features_used': predictor.feature_names
         }
         
-        return jsonify(response)
+        # Queued for the background writer, never written inline
+        audit_log.record(
+            patient_data.get('patient_id'),
+            features[0],
+            predictions,
+            MODEL_VERSION if model_name == registry.default else f'{MODEL_VERSION}/{model_name}',
+            {
+                'validate_ms': 1000 * (validated - start),
+                'score_ms': 1000 * (scored - validated),
+                'total_ms': 1000 * (time.perf_counter() - start)
+            }
+        )
+        
+        with memory_stats.tracker.stage('predict', 'serialize'):
+            response = json_response(response)
+        # Handed to the shadow pool only once the response has been sent
+        response.call_on_close(lambda: shadow.submit(features, predictions, model_name))
+        return response
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -158,6 +491,303 @@ def predict_treatment():
         logger.error(f"Prediction error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Predict treatment recommendations for a list of patients"""
+    try:
+        start = time.perf_counter()
+        body = request.json
+        patients = body.get('patients') if isinstance(body, dict) else None
+        # {"patient_ids": [...]} scores stored patients instead
+        stored_ids = body.get('patient_ids') if isinstance(body, dict) else None
+        
+        if stored_ids is not None:
+            if not isinstance(stored_ids, list) or not stored_ids:
+                return jsonify({'error': 'Expected {"patient_ids": [...]} with at least one ID'}), 400
+        elif not isinstance(patients, list) or not patients:
+            return jsonify({'error': 'Expected {"patients": [...]} with at least one patient'}), 400
+        
+        if not predictor.is_loaded:
+            return jsonify({'error': 'Models not loaded. Please contact administrator.'}), 500
+        
+        # A batch is scored by one model set, the default unless requested
+        model_name = request.args.get('model', body.get('model')) or registry.default
+        if model_name not in registry.sets:
+            return jsonify({
+                'error': f'Unknown model: {model_name}',
+                'available_models': sorted(registry.sets)
+            }), 400
+        
+        if stored_ids is not None:
+            if not feature_store.available:
+                return jsonify({'error': 'Feature store not available'}), 503
+            # One bulk lookup for the whole batch; unknown IDs are row errors
+            with memory_stats.tracker.stage('predict_batch', 'lookup'):
+                found_features, found = feature_store.get_many(stored_ids)
+            count = len(stored_ids)
+            features = np.zeros((count, len(predictor.feature_names)))
+            features[found] = found_features
+            found = set(found)
+            errors = [{'row': row, 'field': 'patient_id', 'error': 'unknown patient'}
+                      for row in range(count) if row not in found]
+            patient_ids = audit_ids = stored_ids
+        else:
+            # One vectorized validation pass over the whole batch
+            with memory_stats.tracker.stage('predict_batch', 'validate'):
+                features, errors = predictor.schema.coerce(patients)
+            count = len(patients)
+            patient_ids = [
+                patient.get('patient_id', 'Unknown') if isinstance(patient, dict) else 'Unknown'
+                for patient in patients
+            ]
+            # Audited as /predict does: no ID rather than 'Unknown'
+            audit_ids = [patient.get('patient_id') if isinstance(patient, dict) else None for patient in patients]
+        row_errors = {}
+        for error in errors:
+            row_errors.setdefault(error['row'], []).append(error)
+        valid_rows = [i for i in range(count) if i not in row_errors]
+        
+        # Precomputed predictions are used only when every stored patient has a current one
+        stored = {}
+        if valid_rows and stored_ids is not None and model_name == registry.default:
+            valid_ids = [stored_ids[row] for row in valid_rows]
+            stored = feature_store.predictions(valid_ids, prediction_key())
+            if len(stored) < len(set(map(str, valid_ids))):
+                stored = {}
+        
+        validated = time.perf_counter()
+        scores = None
+        if valid_rows:
+            with memory_stats.tracker.stage('predict_batch', 'score'):
+                if stored:
+                    scores = stored_scores(stored, valid_ids)
+                else:
+                    scores, usage = scoring_pool.run(score_batch, features[valid_rows], model_name)
+                    registry.record_usage(model_name, usage)
+            scored = time.perf_counter()
+            
+            # Every scored row is audited, as /predict does, in the background
+            audit_log.record_batch(
+                [audit_ids[row] for row in valid_rows],
+                features[valid_rows],
+                scores,
+                MODEL_VERSION if model_name == registry.default else f'{MODEL_VERSION}/{model_name}',
+                {
+                    'validate_ms': 1000 * (validated - start),
+                    'score_ms': 1000 * (scored - validated),
+                    'batch_rows': len(valid_rows)
+                }
+            )
+        
+        response = {
+            'count': count,
+            'error_count': len(row_errors),
+            'timestamp': datetime.now().isoformat(),
+            'model_version': MODEL_VERSION,
+            'model': model_name,
+            'precomputed': bool(stored)
+        }
+        
+        # "columnar" returns one array per field instead of one object per patient
+        if request.args.get('format', body.get('format')) == 'columnar':
+            response['format'] = 'columnar'
+            response['patient_id'] = patient_ids
+            response.update(columnar_predictions(scores, valid_rows, count))
+            response['errors'] = row_errors
+        else:
+            results = [None] * count
+            if scores is not None:
+                for row, prediction in zip(valid_rows, format_predictions(scores)):
+                    results[row] = prediction
+            response['results'] = [
+                {
+                    'patient_id': patient_id,
+                    'predictions': results[row],
+                    'errors': row_errors.get(row, [])
+                }
+                for row, patient_id in enumerate(patient_ids)
+            ]
+        
+        with memory_stats.tracker.stage('predict_batch', 'serialize'):
+            return json_response(response)
+        
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/similar', methods=['POST'])
+def similar():
+    """The k most similar historical patients and the treatment they received.
+    
+    Accepts one patient, or {"patients": [...]} for a batch; k is set with
+    ?k= or a "k" field (default 5).
+    """
+    try:
+        body = request.json
+        if not body or not isinstance(body, dict):
+            return jsonify({'error': 'No patient data provided'}), 400
+        
+        if predictor.similar is None:
+            return jsonify({'error': 'Similar-patient index not available'}), 503
+        
+        try:
+            k = int(request.args.get('k', body.get('k', 5)))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'k must be a whole number'}), 400
+        if not 1 <= k <= similar_patients.MAX_K:
+            return jsonify({'error': f'k must be between 1 and {similar_patients.MAX_K}'}), 400
+        
+        batch = 'patients' in body
+        patients = body['patients'] if batch else [body]
+        if not isinstance(patients, list) or not patients:
+            return jsonify({'error': 'Expected {"patients": [...]} with at least one patient'}), 400
+        
+        features, errors = predictor.schema.coerce(patients)
+        if errors and not batch:
+            return jsonify({'error': 'Invalid patient data', 'errors': errors}), 400
+        row_errors = {}
+        for error in errors:
+            row_errors.setdefault(error['row'], []).append(error)
+        valid_rows = [i for i in range(len(patients)) if i not in row_errors]
+        
+        neighbours = [None] * len(patients)
+        if valid_rows:
+            for row, found in zip(valid_rows, predictor.similar.neighbours(features[valid_rows], k)):
+                neighbours[row] = found
+        
+        if not batch:
+            return json_response({
+                'neighbours': neighbours[0],
+                'k': k,
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        return json_response({
+            'results': [
+                {'neighbours': neighbours[row], 'errors': row_errors.get(row, [])}
+                for row in range(len(patients))
+            ],
+            'k': k,
+            'count': len(patients),
+            'error_count': len(row_errors),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Similar-patient error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/patients', methods=['POST'])
+def store_patients():
+    """Store patients' features so they can be predicted by patient_id alone.
+    
+    Accepts one patient, or {"patients": [...]} for a batch; each needs a
+    patient_id and the 12 features.  The default model's predictions are
+    stored with them.
+    """
+    try:
+        body = request.json
+        if not body or not isinstance(body, dict):
+            return jsonify({'error': 'No patient data provided'}), 400
+        
+        if not predictor.is_loaded:
+            return jsonify({'error': 'Models not loaded. Please contact administrator.'}), 500
+        
+        if not feature_store.available:
+            return jsonify({'error': 'Feature store not available'}), 503
+        
+        batch = 'patients' in body
+        patients = body['patients'] if batch else [body]
+        if not isinstance(patients, list) or not patients:
+            return jsonify({'error': 'Expected {"patients": [...]} with at least one patient'}), 400
+        
+        features, errors = predictor.schema.coerce(patients)
+        for row, patient in enumerate(patients):
+            if isinstance(patient, dict) and patient.get('patient_id') in (None, ''):
+                errors.append({'row': row, 'field': 'patient_id', 'error': 'missing'})
+        if errors and not batch:
+            return jsonify({'error': 'Invalid patient data', 'errors': errors}), 400
+        row_errors = {}
+        for error in errors:
+            row_errors.setdefault(error['row'], []).append(error)
+        valid_rows = [i for i in range(len(patients)) if i not in row_errors]
+        
+        if valid_rows:
+            patient_ids = [str(patients[row]['patient_id']) for row in valid_rows]
+            key = prediction_key()
+            feature_store.put_many(patient_ids, features[valid_rows])
+            scores, usage = scoring_pool.run(score_batch, features[valid_rows], registry.default)
+            registry.record_usage(registry.default, usage)
+            feature_store.put_predictions(patient_ids, scores, key)
+        
+        return jsonify({
+            'stored': len(valid_rows),
+            'count': len(patients),
+            'error_count': len(row_errors),
+            'errors': row_errors,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error storing patients: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/patients/<patient_id>', methods=['GET'])
+def stored_patient(patient_id):
+    """A stored patient's features and, if current, their precomputed prediction"""
+    if not feature_store.available:
+        return jsonify({'error': 'Feature store not available'}), 503
+    
+    features, found = feature_store.get_many([patient_id])
+    if not found:
+        return jsonify({'error': f'Unknown patient: {patient_id}'}), 404
+    
+    stored = feature_store.predictions([patient_id], prediction_key())
+    return json_response({
+        'patient_id': patient_id,
+        'features': dict(zip(predictor.feature_names, features[0].tolist())),
+        'predictions': format_predictions(stored_scores(stored, [patient_id]))[0] if stored else None,
+        'model': registry.default,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/update', methods=['POST'])
+def update_models():
+    """Fold newly labelled patients into the models without a full retrain"""
+    try:
+        body = request.json
+        patients = body.get('patients') if isinstance(body, dict) else None
+        
+        if not isinstance(patients, list) or not patients:
+            return jsonify({'error': 'Expected {"patients": [...]} with features and aspirin/heparin labels'}), 400
+        
+        csv_path = body.get('csv_path', 'new heart clinical.csv')
+        if not os.path.exists(csv_path):
+            return jsonify({'error': 'CSV file not found'}), 400
+        
+        # Serialised across workers by incremental.update_lock
+        report = incremental.update(
+            patients,
+            models_dir='models',
+            csv_path=csv_path,
+            max_incremental_rows=body.get('max_incremental_rows', incremental.DEFAULT_MAX_INCREMENTAL_ROWS),
+            max_accuracy_drop=body.get('max_accuracy_drop', incremental.DEFAULT_MAX_ACCURACY_DROP),
+            compare_full=bool(body.get('compare_full', False))
+        )
+        predictor.load_models()
+        
+        return jsonify({
+            'message': 'Models updated successfully',
+            'report': report,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except SchemaError as e:
+        return jsonify({'error': str(e), 'errors': e.errors}), 400
+    except Exception as e:
+        logger.error(f"Update error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/model-info', methods=['GET'])
 def model_info():
     """Get information about the loaded models"""
@@ -170,10 +800,80 @@ def model_info():
         'feature_count': len(predictor.feature_names),
         'targets': ['aspirin', 'heparin'],
         'kernel': 'rbf',
+        'evaluation': load_evaluation('models'),
         'status': 'ready',
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/admin/models', methods=['GET', 'POST'])
+def admin_models():
+    """List model sets with their metrics, or change the routing.
+    
+    POST {"default": "svm", "split": {"compressed": 10}, "mode": "hash"}
+    sends 10% of patients to the compressed models.  "reload": true
+    picks up model sets written since startup.
+    """
+    # In production, you might want to secure this endpoint
+    if request.method == 'POST':
+        body = request.json or {}
+        try:
+            if body.get('reload'):
+                predictor.load_models()
+            registry.set_routing(body.get('default'), body.get('split'), body.get('mode'))
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'available_models': sorted(registry.sets),
+        **registry.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/admin/shadow', methods=['GET', 'POST'])
+def admin_shadow():
+    """Shadow scoring results, or change the candidate models.
+    
+    POST {"candidates": ["compressed"]} scores every /predict request with
+    the compressed models in the background; "reset": true clears the
+    aggregates.
+    """
+    # In production, you might want to secure this endpoint
+    if request.method == 'POST':
+        body = request.json or {}
+        try:
+            if 'candidates' in body:
+                registry.set_routing(shadow=body['candidates'])
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        if body.get('reset'):
+            shadow.reset()
+    
+    return jsonify({
+        **shadow.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/admin/feature-store', methods=['GET', 'POST'])
+def admin_feature_store():
+    """Stored patients, hot-tier hit rate and how many stored predictions are current.
+    
+    POST {"refresh": true} scores every stored patient without a current
+    prediction, e.g. after a CLI import, in the background.
+    """
+    # In production, you might want to secure this endpoint
+    refreshing = False
+    if request.method == 'POST' and (request.json or {}).get('refresh'):
+        if not predictor.is_loaded or not feature_store.available:
+            return jsonify({'error': 'Feature store not available'}), 503
+        refresh_stored_predictions(force=True)
+        refreshing = True
+    
+    return jsonify({
+        **feature_store.stats(prediction_key()),
+        'refreshing': refreshing,
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
@@ -198,6 +898,8 @@ if __name__ == '__main__':
     print("=" * 50)
     print("API will be available at: http://localhost:5000")
     print("Health check: http://localhost:5000/health")
+    print("This is the development server. For production use:")
+    print("  gunicorn -c gunicorn.conf.py wsgi:application")
     print("=" * 50)
     
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -4,9 +4,14 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.svm import SVC
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+import argparse
 import pickle
 import os
 import sys
+import time
+import model_store
+import serving
+import memory_stats
 
 def check_dependencies():
     """Check if all required packages are installed"""
@@ -27,8 +32,38 @@ def check_dependencies():
         return False
     return True
 
-def setup_models():
-    """Setup and train models from your dataset"""
+def compare_joint(joint, aspirin_model, heparin_model, X_test_scaled, y_aspirin_test, y_heparin_test):
+    """Accuracy and latency of the joint model against the two separate SVMs"""
+    def median_ms(func, X, repeats=200):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func(X)
+            timings.append(time.perf_counter() - start)
+        return 1000 * float(np.median(timings))
+    
+    def separate(X):
+        return (aspirin_model.predict_proba(X), aspirin_model.predict(X),
+                heparin_model.predict_proba(X), heparin_model.predict(X))
+    
+    scores = joint.predict_all(X_test_scaled)
+    print("\n=== JOINT MODEL COMPARISON ===")
+    print(f"Support vectors: {len(aspirin_model.support_vectors_)} + {len(heparin_model.support_vectors_)} "
+          f"separate, {len(joint.support_vectors)} shared")
+    print(f"Aspirin accuracy: separate {accuracy_score(y_aspirin_test, aspirin_model.predict(X_test_scaled)):.3f}, "
+          f"joint {accuracy_score(y_aspirin_test, scores['aspirin'][1]):.3f}")
+    print(f"Heparin accuracy: separate {accuracy_score(y_heparin_test, heparin_model.predict(X_test_scaled)):.3f}, "
+          f"joint {accuracy_score(y_heparin_test, scores['heparin'][1]):.3f}")
+    for label, X in (('1 patient', X_test_scaled[:1]), (f'{len(X_test_scaled)} patients', X_test_scaled)):
+        print(f"Latency for {label}: separate {median_ms(separate, X):.3f} ms, "
+              f"joint {median_ms(joint.predict_all, X):.3f} ms")
+
+def setup_models(joint=False):
+    """Setup and train models from your dataset
+    
+    With joint=True the two SVMs are also merged into one model that
+    scores both targets from a single kernel evaluation.
+    """
     
     if not check_dependencies():
         return None
@@ -130,6 +165,18 @@ def setup_models():
         with open('models/feature_names.pkl', 'wb') as f:
             pickle.dump(list(X.columns), f)
         
+        # Keep an existing joint model in sync, or create one when asked
+        if joint or os.path.exists(model_store.joint_path('models')):
+            _, joint_model = model_store.build_joint('models')
+            print("Joint model saved")
+            compare_joint(joint_model, aspirin_model, heparin_model,
+                          X_test_scaled, y_aspirin_test, y_heparin_test)
+        
+        # Keep an existing shared bundle in sync with the new pickles
+        if os.path.exists(model_store.bundle_path('models')):
+            model_store.build_bundle('models')
+            print("Shared model bundle rebuilt")
+        
         print("Models saved successfully in 'models' directory!")
         
         # Test a sample prediction
@@ -159,10 +206,19 @@ def setup_models():
         return None
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train and save the heart treatment models')
+    parser.add_argument('--joint', action='store_true',
+                        help='also save a joint model that scores aspirin and heparin together')
+    args = parser.parse_args()
+    
+    # BLAS thread cap from serving_config.json (see check_installation.py)
+    serving.apply_thread_limits(serving.load_config())
+    
     print("Heart Treatment Model Setup")
     print("=" * 40)
     
-    results = setup_models()
+    with memory_stats.measure_peak() as training_memory:
+        results = setup_models(joint=args.joint)
     
     if results:
         print("\n" + "=" * 40)
@@ -173,6 +229,8 @@ if __name__ == "__main__":
         print(f"Training samples: {results['training_samples']}")
         print(f"Test samples: {results['test_samples']}")
         print(f"Features used: {results['feature_count']}")
+        print(f"Peak memory: {training_memory['peak_traced_mb']:.1f} MB allocated during setup"
+              + (f", {training_memory['peak_rss_mb']:.0f} MB process peak" if training_memory['peak_rss_mb'] else ""))
         print("\nYou can now run the Flask app with: python simple_app.py")
     else:
         print("\n" + "=" * 40)
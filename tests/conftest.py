@@ -0,0 +1,44 @@
+"""Shared fixtures: models trained the way simple_setup.py trains them."""
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COHORT_CSV = os.path.join(ROOT, 'new heart clinical.csv')
+FEATURE_NAMES = [
+    'age', 'anaemia', 'creatinine_phosphokinase', 'diabetes',
+    'ejection_fraction', 'high_blood_pressure', 'platelets',
+    'serum_creatinine', 'serum_sodium', 'sex', 'smoking', 'time'
+]
+
+@pytest.fixture(scope='session')
+def split():
+    """simple_setup.py's train/test split of the cohort"""
+    from incremental import holdout_split
+    return holdout_split(COHORT_CSV, FEATURE_NAMES)
+
+@pytest.fixture(scope='session')
+def trained(split):
+    """Scaler and SVMs fitted on the training split, plus the feature names"""
+    from incremental import full_retrain
+    X_train, labels, _, _ = split
+    models = full_retrain(X_train, labels)
+    models['feature_names'] = FEATURE_NAMES
+    return models
+
+@pytest.fixture
+def models_dir(tmp_path, trained):
+    """A models/ directory in simple_setup.py's layout, with the cohort CSV next to it"""
+    import pickle
+
+    directory = tmp_path / 'models'
+    directory.mkdir()
+    for name, obj in trained.items():
+        with open(directory / f'{name}.pkl', 'wb') as f:
+            pickle.dump(obj, f)
+    shutil.copy(COHORT_CSV, tmp_path / 'new heart clinical.csv')
+    return directory
@@ -0,0 +1,90 @@
+"""AdmissionController slots, queueing and load shedding."""
+import threading
+import time
+
+from flask import Flask
+
+import admission
+from admission import AdmissionController
+
+def test_admits_up_to_max_in_flight_then_sheds_queue_full():
+    controller = AdmissionController(max_in_flight=2, max_queue=0, queue_timeout=1.0)
+    assert controller.acquire() == (True, None)
+    assert controller.acquire() == (True, None)
+    assert controller.acquire() == (False, 'queue_full')
+    controller.release()
+    assert controller.acquire() == (True, None)
+    assert controller.stats()['shed'] == {'queue_full': 1, 'timeout': 0}
+
+def test_waiter_times_out_at_its_deadline():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    controller.acquire()
+    start = time.monotonic()
+    assert controller.acquire() == (False, 'timeout')
+    assert time.monotonic() - start >= 0.05
+    stats = controller.stats()
+    assert stats['shed']['timeout'] == 1
+    assert stats['queue_depth'] == 0
+
+def test_release_admits_a_queued_request():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5.0)
+    controller.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(controller.acquire()))
+    waiter.start()
+    while controller.stats()['queue_depth'] == 0:
+        time.sleep(0.001)
+    controller.release(0.01)
+    waiter.join(5.0)
+    assert results == [(True, None)]
+    stats = controller.stats()
+    assert (stats['in_flight'], stats['queued'], stats['peak_queue_depth']) == (1, 1, 1)
+    assert stats['mean_service_ms'] == 10.0
+
+def test_retry_after_scales_with_backlog():
+    controller = AdmissionController(max_in_flight=2, max_queue=4, queue_timeout=1.0)
+    assert controller.retry_after() == 1
+    controller.acquire()
+    controller.release(3.0)
+    controller.acquire()
+    controller.acquire()
+    # 2 in flight, 3 s each, 2 at a time
+    assert controller.retry_after() == 3
+
+def test_limits_leave_a_thread_for_health():
+    config = {'threads': 8, 'scoring_processes': 0, 'queue_timeout': 0.5}
+    assert admission.limits(config) == (4, 3, 0.5)
+    assert admission.limits(dict(config, scoring_processes=2, max_queue=1)) == (2, 1, 0.5)
+
+def test_install_returns_503_with_retry_after():
+    app = Flask(__name__)
+    release = threading.Event()
+
+    @app.route('/predict')
+    def predict():
+        release.wait(5.0)
+        return 'ok'
+
+    @app.route('/health')
+    def health():
+        return 'healthy'
+
+    controller = admission.install(app, ['predict'], {
+        'threads': 4, 'scoring_processes': 1, 'max_queue': 0, 'queue_timeout': 0.1
+    })
+    client = app.test_client()
+    busy = threading.Thread(target=lambda: client.get('/predict'))
+    busy.start()
+    while controller.stats()['in_flight'] == 0:
+        time.sleep(0.001)
+
+    response = app.test_client().get('/predict')
+    assert response.status_code == 503
+    assert response.get_json()['reason'] == 'queue_full'
+    assert int(response.headers['Retry-After']) >= 1
+    # Routes outside the endpoint list bypass the queue
+    assert app.test_client().get('/health').status_code == 200
+
+    release.set()
+    busy.join(5.0)
+    assert controller.stats()['in_flight'] == 0
@@ -0,0 +1,81 @@
+"""Versioned artifact URLs, ETag revalidation and precompressed responses."""
+import gzip
+import json
+import os
+import time
+
+import pytest
+from flask import Flask
+
+import artifacts
+
+PARAMETERS = {'aspirin': {'intercept': [0.5], 'coef': [[1.0, 2.0]]}}
+
+@pytest.fixture
+def exported(tmp_path):
+    path = tmp_path / 'model_parameters.json'
+    path.write_text(json.dumps(PARAMETERS))
+    return str(path)
+
+@pytest.fixture
+def client(exported):
+    app = Flask(__name__)
+    store = artifacts.install(app, artifacts.ArtifactStore({'model_parameters.json': exported}))
+    return app.test_client(), store
+
+def test_manifest_versions_by_content_hash(client, exported):
+    client, store = client
+    entry = store.get('model_parameters.json')
+    assert entry['sha256'] == artifacts.sha256_file(exported)
+    manifest = client.get('/artifacts').get_json()['artifacts']
+    assert manifest['model_parameters.json']['url'] == f"/artifacts/{entry['version']}/model_parameters.json"
+    assert store.get('missing.json') is None
+
+def test_versioned_url_is_immutable_and_revalidates(client):
+    client, store = client
+    entry = store.get('model_parameters.json')
+    url = f"/artifacts/{entry['version']}/model_parameters.json"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json() == PARAMETERS
+    assert response.headers['Cache-Control'] == artifacts.IMMUTABLE_CACHE
+    assert response.headers['ETag'] == f'"{entry["sha256"]}"'
+
+    revalidated = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+    latest = client.get('/artifacts/latest/model_parameters.json')
+    assert latest.headers['Cache-Control'] == artifacts.LATEST_CACHE
+    assert client.get('/artifacts/0123456789abcdef/model_parameters.json').status_code == 404
+
+def test_gzip_variant_served_only_while_fresh(client, exported):
+    client, store = client
+    raw_bytes, gzip_bytes = artifacts.precompress(exported)
+    assert raw_bytes == os.path.getsize(exported)
+    # No timestamp in the header, so re-exporting gives identical bytes
+    with open(exported + '.gz', 'rb') as f:
+        first = f.read()
+    assert gzip_bytes == len(first)
+    artifacts.precompress(exported)
+    with open(exported + '.gz', 'rb') as f:
+        assert f.read() == first
+
+    response = client.get('/artifacts/latest/model_parameters.json', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == PARAMETERS
+    assert response.headers['ETag'].endswith('-gzip"')
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    plain = client.get('/artifacts/latest/model_parameters.json')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['ETag'] != response.headers['ETag']
+
+    # A newer export makes the .gz stale until it is precompressed again
+    time.sleep(0.01)
+    with open(exported, 'w') as f:
+        json.dump({'aspirin': {}}, f)
+    stale = client.get('/artifacts/latest/model_parameters.json', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in stale.headers
+    assert stale.get_json() == {'aspirin': {}}
@@ -0,0 +1,57 @@
+"""AuditLog background writes and the per-patient history read back."""
+import os
+
+import numpy as np
+
+from audit_log import AuditLog, patient_history
+
+def test_record_batch_writes_one_row_per_patient(tmp_path):
+    db = str(tmp_path / 'audit.db')
+    log = AuditLog(db)
+    scores = {
+        'aspirin_probability': np.array([0.9, 0.2]), 'aspirin_recommendation': np.array([True, False]),
+        'heparin_probability': np.array([0.4, 0.7]), 'heparin_recommendation': np.array([False, True])
+    }
+    log.record_batch(['p1', None], np.array([[1.0, 2.0], [3.0, 4.0]]), scores, '1.0', {'batch_rows': 2})
+    log.close()
+
+    assert log.stats() == {'queued': 0, 'written': 2, 'dropped': 0}
+    [entry] = patient_history('p1', db)
+    assert entry['features'] == [1.0, 2.0]
+    assert (entry['aspirin_probability'], entry['aspirin_recommendation']) == (0.9, 1)
+    assert (entry['heparin_probability'], entry['heparin_recommendation']) == (0.4, 0)
+    assert entry['model_version'] == '1.0'
+    assert entry['latencies'] == {'batch_rows': 2}
+
+def test_writer_batches_rows_and_history_is_newest_first(tmp_path):
+    db = str(tmp_path / 'audit.db')
+    log = AuditLog(db, batch_size=3)
+    predictions = {
+        'aspirin': {'probability': 0.6, 'recommendation': True},
+        'heparin': {'probability': 0.1, 'recommendation': False}
+    }
+    for visit in range(7):
+        log.record('p1', [visit, 1.5], predictions, f'v{visit}', {'total_ms': visit})
+    log.record(42, [0.0], predictions, 'v0', {})
+    log.close()
+
+    assert log.stats()['written'] == 8
+    history = patient_history('p1', db)
+    assert [entry['model_version'] for entry in history] == [f'v{visit}' for visit in reversed(range(7))]
+    assert history[0]['features'] == [6.0, 1.5]
+    assert history[0]['latencies'] == {'total_ms': 6}
+    assert len(patient_history('p1', db, limit=2)) == 2
+    # IDs are stored as text, so a numeric ID is found either way
+    assert len(patient_history('42', db)) == 1
+    assert patient_history('nobody', db) == []
+
+def test_full_queue_drops_rows_instead_of_blocking(tmp_path):
+    log = AuditLog(str(tmp_path / 'audit.db'), max_queue=2, block_timeout=0.001)
+    # Pretend the writer is running but stalled, so nothing drains the queue
+    log._pid = os.getpid()
+    scores = {
+        'aspirin_probability': np.zeros(5), 'aspirin_recommendation': np.zeros(5, dtype=bool),
+        'heparin_probability': np.zeros(5), 'heparin_recommendation': np.zeros(5, dtype=bool)
+    }
+    log.record_batch(list('abcde'), np.zeros((5, 2)), scores, '1.0', {})
+    assert log.stats() == {'queued': 2, 'written': 0, 'dropped': 3}
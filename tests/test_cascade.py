@@ -0,0 +1,95 @@
+"""Cascade band selection and routing of uncertain patients to the full model set."""
+import numpy as np
+
+from cascade import fit_linear_stage, tune_band
+from model_registry import TARGETS, CascadeModelSet, LinearStage, combine_usage
+
+class FixedStage:
+    """Linear stage returning preset probabilities, one column per target"""
+    def __init__(self, probability):
+        self.probability = np.asarray(probability, dtype=float)
+
+    def predict_proba(self, features):
+        return self.probability[features[:, 0].astype(int)]
+
+class FullSet:
+    name = 'svm'
+
+    def __init__(self):
+        self.rows = []
+
+    def predict_batch(self, features):
+        self.rows.extend(features[:, 0].astype(int).tolist())
+        return {
+            **{f'{target}_probability': np.full(len(features), 0.99) for target in TARGETS},
+            **{f'{target}_recommendation': np.ones(len(features), dtype=bool) for target in TARGETS}
+        }
+
+def test_band_covers_disagreements_within_tolerance():
+    probability = np.linspace(0.01, 0.99, 99)
+    full = probability > 0.5
+    # The full model disagrees with the cheap one just either side of 0.5
+    full[(probability > 0.4) & (probability < 0.6)] ^= True
+    low, high = tune_band(probability, full, tolerance=0.0)
+    wrong = (probability > 0.5) != full
+    inside = (probability >= low) & (probability <= high)
+    assert np.all(inside[wrong])
+    assert np.mean(inside) < 0.3
+
+    # Allowing some disagreement narrows the band
+    loose_low, loose_high = tune_band(probability, full, tolerance=0.1)
+    assert loose_high - loose_low < high - low
+
+def test_band_is_empty_when_models_agree():
+    probability = np.linspace(0.01, 0.99, 99)
+    low, high = tune_band(probability, probability > 0.5, tolerance=0.0)
+    assert np.mean((probability >= low) & (probability <= high)) <= 0.02
+
+def test_only_uncertain_patients_reach_the_full_set():
+    stage = FixedStage([[0.1, 0.2], [0.45, 0.9], [0.95, 0.55], [0.7, 0.05]])
+    full = FullSet()
+    cascade = CascadeModelSet('cascade', stage, full, {'aspirin': (0.4, 0.6), 'heparin': (0.5, 0.6)}, source='test')
+
+    scores, usage = cascade.score(np.arange(4, dtype=float)[:, np.newaxis])
+    assert full.rows == [1, 2]
+    assert scores['aspirin_stage'].tolist() == ['lr', 'svm', 'lr', 'lr']
+    assert scores['heparin_stage'].tolist() == ['lr', 'lr', 'svm', 'lr']
+    assert scores['aspirin_probability'].tolist() == [0.1, 0.99, 0.95, 0.7]
+    assert scores['heparin_recommendation'].tolist() == [False, True, True, False]
+
+    # Nothing is counted until the serving process records the usage
+    assert cascade.stats()['calls'] == 0
+    cascade.record(usage)
+    stats = cascade.stats()
+    assert stats['escalation_rate'] == 0.5
+    assert stats['aspirin_escalation_rate'] == 0.25
+
+def test_usage_from_chunks_adds_up_in_the_parent():
+    stage = FixedStage([[0.1, 0.1], [0.5, 0.1]])
+    cascade = CascadeModelSet('cascade', stage, FullSet(), {'aspirin': (0.4, 0.6), 'heparin': (0.4, 0.6)}, source='test')
+    # As score_batch does for a batch split into chunks in a pool process
+    usages = [cascade.score(np.array([[row]], dtype=float))[1] for row in (0, 1, 1)]
+    usage = combine_usage(usages + [None])
+    assert (usage['calls'], usage['rows'], usage['escalated_rows']) == (3, 3, 2)
+    assert usage['escalated'] == {'aspirin': 2, 'heparin': 0}
+    assert len(usage['full_ms']) == 2
+    assert combine_usage([None]) is None
+
+    cascade.record(usage)
+    stats = cascade.stats()
+    assert (stats['calls'], stats['escalated_calls']) == (3, 2)
+    assert stats['escalation_rate'] == 2 / 3
+
+def test_linear_stage_matches_logistic_regressions_and_round_trips(split):
+    X_train, labels, X_test, _ = split
+    stage = fit_linear_stage(X_train, labels)
+    restored = LinearStage.from_params(stage.to_params())
+    np.testing.assert_allclose(restored.predict_proba(X_test), stage.predict_proba(X_test))
+
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    scaler = StandardScaler().fit(X_train)
+    for i, target in enumerate(TARGETS):
+        model = LogisticRegression(max_iter=1000).fit(scaler.transform(X_train), labels[target])
+        np.testing.assert_allclose(stage.predict_proba(X_test)[:, i],
+                                   model.predict_proba(scaler.transform(X_test))[:, 1], atol=1e-9)
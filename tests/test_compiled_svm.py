@@ -0,0 +1,17 @@
+"""CompiledRBFSVM on raw features against the scaler plus sklearn SVM it replaces."""
+import numpy as np
+
+from numpy_inference import CompiledRBFSVM
+from patient_schema import FEATURE_CONSTRAINTS
+
+TARGETS = ['aspirin', 'heparin']
+
+def test_compiled_svm_scores_raw_features(trained, split):
+    X_test = split[2]
+    scaler = trained['scaler']
+    binary = [name for name in trained['feature_names'] if FEATURE_CONSTRAINTS[name][0] == 'binary']
+    for target in TARGETS:
+        model = trained[f'{target}_model']
+        compiled = CompiledRBFSVM(model, scaler, trained['feature_names'], binary)
+        expected = model.predict_proba(scaler.transform(X_test))
+        np.testing.assert_allclose(compiled.predict_proba(X_test), expected, atol=1e-9)
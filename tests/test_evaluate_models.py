@@ -0,0 +1,20 @@
+"""Bootstrap intervals of the evaluation harness."""
+import numpy as np
+
+from evaluate_models import bootstrap_intervals, fold_metrics
+
+def test_interval_covers_the_per_repeat_mean():
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, size=300)
+    # Noisy, weakly informative repeats; their average is much smoother
+    oof = np.clip(0.5 + 0.1 * (y - 0.5) + rng.normal(0, 0.3, size=(10, 300)), 0, 1)
+    per_repeat = np.array([fold_metrics(y, prob) for prob in oof])
+    intervals = bootstrap_intervals(y, oof, n_bootstrap=1000)
+    for i, metric in enumerate(['accuracy', 'auc', 'brier']):
+        assert intervals[metric]['lower'] <= per_repeat[:, i].mean() <= intervals[metric]['upper']
+
+def test_single_prediction_set():
+    y = np.array([0, 1] * 50)
+    intervals = bootstrap_intervals(y, y.astype(float), n_bootstrap=200)
+    assert intervals['accuracy'] == {'lower': 1.0, 'upper': 1.0}
+    assert intervals['brier'] == {'lower': 0.0, 'upper': 0.0}
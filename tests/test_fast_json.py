@@ -0,0 +1,67 @@
+"""fast_json encoding, columnar batch output and gzipped responses."""
+import gzip
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+import fast_json
+
+SCORES = {
+    'aspirin_probability': np.array([[0.2, 0.9], [0.6, 0.3], [0.1, 0.75]])[:, 1],
+    'aspirin_recommendation': np.array([True, False, True]),
+    'heparin_probability': np.array([0.4, 0.55, 0.8]),
+    'heparin_recommendation': np.array([False, True, True])
+}
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(fast_json, 'orjson', None)
+    return request.param
+
+def test_dumps_numpy_round_trip(encoder):
+    obj = {'values': np.arange(3, dtype=np.float32), 'count': np.int64(3), 'flag': np.bool_(True)}
+    assert json.loads(fast_json.dumps(obj)) == {'values': [0.0, 1.0, 2.0], 'count': 3, 'flag': True}
+
+def test_columnar_predictions_match_rows(encoder):
+    columns = json.loads(fast_json.dumps(fast_json.columnar_predictions(SCORES, [0, 1, 2], 3)))
+    rows = fast_json.prediction_rows(SCORES)
+    for target in fast_json.TARGETS:
+        for field in ('probability', 'recommendation', 'confidence'):
+            assert columns[f'{target}_{field}'] == pytest.approx([row[target][field] for row in rows])
+    assert columns['aspirin_confidence'] == pytest.approx([0.9, 0.7, 0.75])
+
+def test_columnar_predictions_leave_invalid_rows_null(encoder):
+    scores = {key: values[:2] for key, values in SCORES.items()}
+    columns = json.loads(fast_json.dumps(fast_json.columnar_predictions(scores, [0, 2], 3)))
+    assert columns['heparin_probability'] == [0.4, None, 0.55]
+    assert columns['heparin_recommendation'] == [False, None, True]
+
+    empty = json.loads(fast_json.dumps(fast_json.columnar_predictions(None, [], 2)))
+    assert empty['aspirin_probability'] == [None, None]
+
+def test_cascade_stage_is_kept():
+    scores = dict(SCORES, aspirin_stage=np.array(['cheap', 'full', 'cheap']))
+    assert fast_json.columnar_predictions(scores, [0, 1, 2], 3)['aspirin_stage'].tolist() == ['cheap', 'full', 'cheap']
+    assert [row['aspirin']['stage'] for row in fast_json.prediction_rows(scores)] == ['cheap', 'full', 'cheap']
+    assert 'stage' not in fast_json.prediction_rows(scores)[0]['heparin']
+
+def test_large_responses_are_gzipped():
+    app = Flask(__name__)
+    large = {'values': np.linspace(0, 1, fast_json.GZIP_MIN_BYTES)}
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = fast_json.json_response(large)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert json.loads(gzip.decompress(response.get_data()))['values'] == pytest.approx(large['values'].tolist())
+
+        small = fast_json.json_response({'ok': True}, status=201)
+        assert small.status_code == 201
+        assert 'Content-Encoding' not in small.headers
+
+    with app.test_request_context():
+        assert 'Content-Encoding' not in fast_json.json_response(large).headers
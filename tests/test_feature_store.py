@@ -0,0 +1,71 @@
+"""FeatureStore round-trips of patient features and stored predictions."""
+import numpy as np
+import pytest
+
+from feature_store import FeatureStore, stored_scores
+
+from conftest import FEATURE_NAMES
+
+@pytest.fixture
+def store(tmp_path):
+    store = FeatureStore(str(tmp_path / 'patients.db'), hot_patients=2)
+    store.open(FEATURE_NAMES)
+    return store
+
+def patients(count, seed=0):
+    return np.random.default_rng(seed).uniform(0, 100, size=(count, len(FEATURE_NAMES)))
+
+def test_features_round_trip(store, tmp_path):
+    X = patients(5)
+    ids = ['p1', 'p2', 'p3', 'p4', 'p5']
+    store.put_many(ids, X)
+
+    found_X, found = store.get_many(['p3', 'missing', 'p1'])
+    assert found == [0, 2]
+    np.testing.assert_array_equal(found_X, X[[2, 0]])
+
+    # A fresh store (another process) reads the same rows from SQLite
+    other = FeatureStore(str(tmp_path / 'patients.db'))
+    other.open(FEATURE_NAMES)
+    np.testing.assert_array_equal(other.get_many(ids)[0], X)
+
+def test_put_replaces_features_and_drops_predictions(store):
+    store.put_many(['p1'], patients(1, seed=1))
+    scores = {
+        'aspirin_probability': np.array([0.8]), 'aspirin_recommendation': np.array([True]),
+        'heparin_probability': np.array([0.3]), 'heparin_recommendation': np.array([False])
+    }
+    store.put_predictions(['p1'], scores, 'v1')
+    restored = stored_scores(store.predictions(['p1'], 'v1'), ['p1'])
+    for key, values in scores.items():
+        np.testing.assert_array_equal(restored[key], values)
+    assert store.predictions(['p1'], 'v2') == {}
+
+    replacement = patients(1, seed=2)
+    store.put_many(['p1'], replacement)
+    np.testing.assert_array_equal(store.get_many(['p1'])[0], replacement)
+    assert store.predictions(['p1'], 'v1') == {}
+
+def test_refresh_scores_missing_predictions_once_per_key(store):
+    store.put_many(['p1', 'p2', 'p3'], patients(3))
+    calls = []
+
+    def score(X):
+        calls.append(len(X))
+        return {
+            'aspirin_probability': X[:, 0] / 100, 'aspirin_recommendation': X[:, 0] > 50,
+            'heparin_probability': X[:, 1] / 100, 'heparin_recommendation': X[:, 1] > 50
+        }
+
+    assert store.refresh_predictions(score, 'v1') == 3
+    assert store.refresh_predictions(score, 'v1') is None
+    assert store.refresh_predictions(score, 'v1', force=True) == 0
+    assert calls == [3]
+    assert store.stats('v1')['fresh_predictions'] == 3
+
+def test_store_for_other_features_is_refused(store, tmp_path):
+    store.put_many(['p1'], patients(1))
+    other = FeatureStore(str(tmp_path / 'patients.db'))
+    with pytest.raises(ValueError):
+        other.open(FEATURE_NAMES[::-1])
+    assert not other.available
@@ -0,0 +1,23 @@
+"""Import-time budget of the entry points, enforced by check_import_time.py.
+
+Set HEART_IMPORT_BUDGET_SCALE (e.g. 2) on a slow machine.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from check_import_time import BUDGETS  # noqa: E402
+
+@pytest.mark.parametrize('module', sorted(BUDGETS))
+def test_import_time_budget(module):
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'check_import_time.py'), module,
+         '--budget-scale', os.environ.get('HEART_IMPORT_BUDGET_SCALE', '1')],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
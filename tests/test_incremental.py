@@ -0,0 +1,76 @@
+"""Incremental model updates and the server picking up the updated files."""
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+import incremental
+
+from conftest import FEATURE_NAMES
+
+def labelled_rows(split, count):
+    _, _, X_test, labels = split
+    return [
+        {**dict(zip(FEATURE_NAMES, X_test[i].tolist())),
+         'aspirin': int(labels['aspirin'][i]), 'heparin': int(labels['heparin'][i])}
+        for i in range(count)
+    ]
+
+def load(models_dir, name):
+    with open(os.path.join(models_dir, f'{name}.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+def test_incremental_update(models_dir, tmp_path, split, trained):
+    report = incremental.update(labelled_rows(split, 5), str(models_dir), str(tmp_path / 'new heart clinical.csv'))
+
+    assert report['mode'] == 'incremental'
+    assert report['rows_since_full'] == 5
+    assert load(models_dir, 'scaler').n_samples_seen_ == trained['scaler'].n_samples_seen_ + 5
+    assert not [name for name in os.listdir(models_dir) if name.endswith('.tmp')]
+    state = incremental.load_state(str(models_dir))
+    assert state['rows_since_full'] == 5 and len(state['updates']) == 1
+
+    X, labels = incremental.load_appended_rows(str(models_dir), FEATURE_NAMES)
+    assert X.shape == (5, len(FEATURE_NAMES))
+
+def test_full_retrain_after_row_limit(models_dir, tmp_path, split):
+    csv_path = str(tmp_path / 'new heart clinical.csv')
+    incremental.update(labelled_rows(split, 3), str(models_dir), csv_path, max_incremental_rows=4)
+    report = incremental.update(labelled_rows(split, 3), str(models_dir), csv_path, max_incremental_rows=4)
+
+    assert report['mode'] == 'full'
+    assert incremental.load_state(str(models_dir))['rows_since_full'] == 0
+    # The retrain covers the training split plus every appended row
+    assert load(models_dir, 'scaler').n_samples_seen_ == len(split[0]) + 6
+
+def test_invalid_rows_leave_models_untouched(models_dir, tmp_path, split):
+    rows = labelled_rows(split, 2)
+    rows[1]['aspirin'] = 'maybe'
+    before = os.path.getmtime(models_dir / 'scaler.pkl')
+    with pytest.raises(ValueError):
+        incremental.update(rows, str(models_dir), str(tmp_path / 'new heart clinical.csv'))
+    assert os.path.getmtime(models_dir / 'scaler.pkl') == before
+    assert not os.path.exists(models_dir / incremental.NEW_ROWS_FILE)
+
+def test_server_reloads_updated_models(models_dir, tmp_path, split, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    simple_app = pytest.importorskip('simple_app')
+    predictor = simple_app.SimpleHeartPredictor()
+    assert predictor.load_models()
+    loaded_mtime = predictor.models_mtime
+    X = split[2][:10]
+    before = predictor.predict_batch(X)
+
+    incremental.update(labelled_rows(split, 20), 'models', 'new heart clinical.csv')
+
+    # The next check after RELOAD_CHECK_SECONDS starts a background reload
+    predictor._last_reload_check = 0.0
+    predictor.reload_if_changed()
+    with predictor._reloading:
+        pass
+
+    assert predictor.models_mtime != loaded_mtime
+    assert predictor.scaler.n_samples_seen_ == load('models', 'scaler').n_samples_seen_
+    after = predictor.predict_batch(X)
+    assert not np.allclose(before['aspirin_probability'], after['aspirin_probability'])
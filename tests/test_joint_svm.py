@@ -0,0 +1,14 @@
+"""JointRBFSVM against the separate aspirin and heparin SVMs it merges."""
+import numpy as np
+
+from numpy_inference import JointRBFSVM
+
+TARGETS = ['aspirin', 'heparin']
+
+def test_joint_svm_matches_separate_models(trained, split):
+    X_test = trained['scaler'].transform(split[2])
+    joint = JointRBFSVM.from_sklearn({target: trained[f'{target}_model'] for target in TARGETS})
+    for target, (probability, prediction) in joint.predict_all(X_test).items():
+        model = trained[f'{target}_model']
+        np.testing.assert_allclose(probability, model.predict_proba(X_test)[:, 1], atol=1e-9)
+        np.testing.assert_array_equal(prediction, model.predict(X_test))
@@ -0,0 +1,69 @@
+"""ModelRegistry selection, A/B routing and its persistence in routing.json."""
+import json
+import os
+
+import pytest
+
+from model_registry import ROUTING_FILE, ModelRegistry
+
+class Stub:
+    """Stands in for a ModelSet; routing only looks at the names"""
+
+def registry_with(models_dir, *names):
+    registry = ModelRegistry(str(models_dir))
+    registry.install({name: Stub() for name in names})
+    return registry
+
+def test_requested_model_wins(tmp_path):
+    registry = registry_with(tmp_path, 'svm', 'compressed')
+    registry.set_routing(split={'compressed': 100})
+    assert registry.choose('svm') == 'svm'
+    with pytest.raises(KeyError):
+        registry.choose('missing')
+
+def test_split_and_hash_routing(tmp_path):
+    registry = registry_with(tmp_path, 'svm', 'compressed')
+    assert registry.choose() == 'svm'
+
+    registry.set_routing(split={'compressed': 100})
+    assert registry.choose() == 'compressed'
+
+    registry.set_routing(split={'compressed': 50}, mode='hash')
+    chosen = {registry.choose(patient_id=patient_id) for patient_id in range(200)}
+    assert chosen == {'svm', 'compressed'}
+    for patient_id in range(20):
+        assert len({registry.choose(patient_id=patient_id) for _ in range(5)}) == 1
+
+def test_invalid_routing_is_refused(tmp_path):
+    registry = registry_with(tmp_path, 'svm', 'compressed')
+    with pytest.raises(ValueError):
+        registry.set_routing(default='missing')
+    with pytest.raises(ValueError):
+        registry.set_routing(split={'compressed': 120})
+    assert not os.path.exists(tmp_path / ROUTING_FILE)
+
+def test_routing_persists_across_registries(tmp_path):
+    registry = registry_with(tmp_path, 'svm', 'compressed')
+    routing = registry.set_routing(default='compressed', split={'svm': 10}, mode='hash', shadow=['svm'])
+    assert sorted(os.listdir(tmp_path)) == [ROUTING_FILE]
+
+    other = registry_with(tmp_path, 'svm', 'compressed')
+    assert other.routing == routing
+    assert other.default == 'compressed'
+
+def test_unreadable_routing_keeps_previous(tmp_path):
+    registry = registry_with(tmp_path, 'svm', 'compressed')
+    registry.set_routing(split={'compressed': 30})
+    previous, mtime = registry.routing, registry._routing_mtime
+
+    # A file caught half-written by another worker
+    with open(tmp_path / ROUTING_FILE, 'w') as f:
+        f.write('{"default": "compr')
+    registry._load_routing()
+    assert registry.routing == previous
+    assert registry._routing_mtime == mtime
+
+    with open(tmp_path / ROUTING_FILE, 'w') as f:
+        json.dump({'default': 'compressed', 'mode': 'percentage', 'split': {}, 'shadow': []}, f)
+    registry._load_routing()
+    assert registry.default == 'compressed'
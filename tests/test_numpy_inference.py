@@ -0,0 +1,32 @@
+"""The numpy RBFSVM against the sklearn SVMs it is exported from."""
+import numpy as np
+
+from numpy_inference import RBFSVM, parity_report
+
+TARGETS = ['aspirin', 'heparin']
+
+def test_rbfsvm_matches_sklearn(trained, split):
+    X_test = trained['scaler'].transform(split[2])
+    for target in TARGETS:
+        model = trained[f'{target}_model']
+        variant = RBFSVM.from_sklearn(model)
+        np.testing.assert_allclose(variant.decision_function(X_test), model.decision_function(X_test), atol=1e-9)
+        np.testing.assert_allclose(variant.predict_proba(X_test), model.predict_proba(X_test), atol=1e-9)
+        np.testing.assert_array_equal(variant.predict(X_test), model.predict(X_test))
+
+def test_rbfsvm_params_round_trip(trained, split):
+    X_test = trained['scaler'].transform(split[2])
+    variant = RBFSVM.from_sklearn(trained['aspirin_model'])
+    restored = RBFSVM.from_params(variant.to_params())
+    np.testing.assert_allclose(restored.predict_proba(X_test), variant.predict_proba(X_test), atol=1e-12)
+
+def test_reduced_precision_stays_close(trained, split):
+    X_test = trained['scaler'].transform(split[2])
+    model = trained['aspirin_model']
+    reference = RBFSVM.from_sklearn(model)
+    for precision, tolerance in (('float32', 1e-4), ('int8', 0.05)):
+        variant = RBFSVM.from_params(RBFSVM.from_sklearn(model, precision).to_params())
+        report = parity_report(model, variant, X_test)
+        assert report['precision'] == precision
+        assert report['max_probability_difference'] < tolerance
+        assert report['bytes'] < reference.nbytes
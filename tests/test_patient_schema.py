@@ -0,0 +1,64 @@
+"""PatientSchema.coerce on valid, out-of-range and malformed batches."""
+import numpy as np
+import pytest
+
+from patient_schema import PatientSchema, SchemaError
+
+from conftest import FEATURE_NAMES
+
+PATIENT = {
+    'age': 65, 'anaemia': 0, 'creatinine_phosphokinase': 582, 'diabetes': 1,
+    'ejection_fraction': 38, 'high_blood_pressure': 1, 'platelets': 263358.0,
+    'serum_creatinine': 1.1, 'serum_sodium': 136, 'sex': 1, 'smoking': 0, 'time': 115
+}
+
+@pytest.fixture(scope='module')
+def schema():
+    return PatientSchema(FEATURE_NAMES)
+
+def test_valid_records_coerce_in_feature_order(schema):
+    # Numeric strings and bools are accepted as numbers
+    records = [PATIENT, dict(PATIENT, age='70', smoking=True)]
+    X, errors = schema.coerce(records)
+    assert errors == []
+    np.testing.assert_array_equal(X[0], [PATIENT[name] for name in FEATURE_NAMES])
+    assert X[1, FEATURE_NAMES.index('age')] == 70
+    assert X[1, FEATURE_NAMES.index('smoking')] == 1
+
+def test_range_errors_name_row_and_field(schema):
+    records = [
+        PATIENT,
+        dict(PATIENT, age=150, sex=2),
+        dict(PATIENT, ejection_fraction=38.5, platelets=None),
+        dict(PATIENT, serum_creatinine=float('inf'))
+    ]
+    _, errors = schema.coerce(records)
+    assert {(e['row'], e['field'], e['error']) for e in errors} == {
+        (1, 'age', 'must be between 0 and 120'),
+        (1, 'sex', 'must be 0 or 1'),
+        (2, 'ejection_fraction', 'must be a whole number'),
+        (2, 'platelets', 'must not be null'),
+        (3, 'serum_creatinine', 'must be a finite number')
+    }
+    assert [e['row'] for e in errors] == sorted(e['row'] for e in errors)
+
+def test_malformed_records_are_explained_once(schema):
+    missing = dict(PATIENT)
+    del missing['time']
+    records = [PATIENT, missing, dict(PATIENT, age='old'), 'not a patient']
+    X, errors = schema.coerce(records)
+    assert X.shape == (4, len(FEATURE_NAMES))
+    assert (1, 'time', 'missing') in {(e['row'], e['field'], e['error']) for e in errors}
+    assert (2, 'age', "not a number: 'old'") in {(e['row'], e['field'], e['error']) for e in errors}
+    assert [e for e in errors if e['row'] == 3] == [
+        {'row': 3, 'field': None, 'error': 'patient record must be an object'}
+    ]
+    # Each bad cell gets one message, not a second one from the range checks
+    assert len(errors) == 3
+    assert not any(e['row'] == 0 for e in errors)
+
+def test_coerce_one_raises_schema_error(schema):
+    assert schema.coerce_one(PATIENT).shape == (1, len(FEATURE_NAMES))
+    with pytest.raises(SchemaError) as info:
+        schema.coerce_one(dict(PATIENT, serum_sodium=50))
+    assert info.value.errors == [{'row': 0, 'field': 'serum_sodium', 'error': 'must be between 90 and 200'}]
@@ -0,0 +1,70 @@
+"""Warm-up patient selection, Readiness state and the /readyz probe."""
+import numpy as np
+from flask import Flask
+
+import warmup
+
+from conftest import COHORT_CSV, FEATURE_NAMES
+
+def readyz(readiness, loaded=True):
+    app = Flask(__name__)
+    warmup.install(app, readiness, lambda: loaded)
+    response = app.test_client().get('/readyz')
+    return response.status_code, response.get_json()
+
+def test_warmup_features_prefer_stored_file_then_csv(tmp_path):
+    X, source = warmup.warmup_features(FEATURE_NAMES, str(tmp_path), COHORT_CSV, rows=8)
+    assert (X.shape, source) == ((8, len(FEATURE_NAMES)), COHORT_CSV)
+    # The sample spans the cohort: first and last rows are included
+    cohort = warmup.read_features(COHORT_CSV, FEATURE_NAMES)
+    np.testing.assert_array_equal(X[[0, -1]], cohort[[0, -1]])
+
+    stored = warmup.warmup_path(str(tmp_path))
+    with open(stored, 'w') as f:
+        f.write(','.join(FEATURE_NAMES) + '\n' + ','.join(['1'] * len(FEATURE_NAMES)) + '\n')
+    X, source = warmup.warmup_features(FEATURE_NAMES, str(tmp_path), COHORT_CSV)
+    assert (X.tolist(), source) == ([[1.0] * len(FEATURE_NAMES)], stored)
+
+    X, source = warmup.warmup_features(FEATURE_NAMES, str(tmp_path / 'none'), None)
+    assert source == 'midpoint'
+    assert X[0, FEATURE_NAMES.index('sex')] in (0, 1)
+
+def test_run_scores_single_and_batch_calls():
+    calls = []
+    readiness = warmup.Readiness()
+    status, body = readyz(readiness)
+    assert (status, body['state']) == (503, 'starting')
+
+    summary = readiness.run({'svm': lambda X: calls.append(len(X))}, np.zeros((3, 2)), passes=2)
+    # Per pass: three single patients and one batch of three, then one warm call
+    assert calls == [1, 1, 1, 3, 1, 1, 1, 3, 1]
+    assert (summary['patients'], summary['passes']) == (3, 2)
+    assert set(summary['models']['svm']) == {'duration_ms', 'first_call_ms', 'warm_call_ms'}
+
+    status, body = readyz(readiness)
+    assert (status, body['status'], body['state']) == (200, 'ready', 'ready')
+    assert body['warmup_ms'] == summary['duration_ms']
+    # Ready but without models loaded is still not ready
+    assert readyz(readiness, loaded=False)[0] == 503
+
+def test_failed_warmup_only_fails_a_server_that_was_not_ready():
+    def broken(X):
+        raise RuntimeError('no BLAS')
+
+    readiness = warmup.Readiness()
+    assert readiness.run({'svm': broken}, np.zeros((1, 2))) is None
+    status, body = readyz(readiness)
+    assert (status, body['state'], body['error']) == (503, 'failed', 'svm: no BLAS')
+
+    readiness.run({'svm': lambda X: None}, np.zeros((1, 2)))
+    readiness.run({'svm': broken}, np.zeros((1, 2)))
+    assert readyz(readiness)[0] == 200
+    assert readiness.stats()['warmups'] == 1
+
+def test_reset_after_fork_waits_for_the_next_warmup():
+    readiness = warmup.Readiness()
+    readiness.skip()
+    assert readyz(readiness)[0] == 200
+    readiness.reset()
+    assert readyz(readiness)[1]['state'] == 'starting'
+    assert readyz(readiness)[0] == 503
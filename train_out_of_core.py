@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import serving
+from compress_svm import save_models
+from memory_stats import peak_rss_mb
+from patient_schema import FEATURE_CONSTRAINTS
+
+REPORT_FILE = 'out_of_core.json'
+TARGETS = ['aspirin', 'heparin']
+
+DEFAULT_CHUNK_ROWS = 10000
+DEFAULT_COMPONENTS = 500
+DEFAULT_EPOCHS = 5
+DEFAULT_TEST_PERCENT = 20
+
+def read_chunks(csv_path, chunk_rows):
+    """The CSV as DataFrames of at most chunk_rows rows"""
+    import pandas as pd
+
+    return pd.read_csv(csv_path, chunksize=chunk_rows)
+
+def test_mask(chunk, key_columns, test_percent):
+    """True for rows in the test split.
+
+    The split is decided by a hash of the key columns, so a row lands in
+    the same split on every pass and every run without any split arrays
+    being kept.
+    """
+    import pandas as pd
+
+    hashes = pd.util.hash_pandas_object(chunk[key_columns], index=False).to_numpy()
+    return hashes % 100 < test_percent
+
+class OutOfCoreTrainer:
+    """Trains the aspirin/heparin models in bounded memory, one chunk at a time.
+
+    The first pass computes the scaler statistics with
+    StandardScaler.partial_fit.  Each following pass maps the scaled rows
+    through random Fourier features (RBFSampler, approximating the SVMs'
+    RBF kernel) and updates a logistic-loss SGDClassifier per target with
+    partial_fit.  Only one chunk and its feature map are held at a time,
+    so peak memory grows with chunk_rows x n_components, not the file size.
+    Rows are shuffled within a chunk but not across chunks.
+    """
+    def __init__(self, csv_path, chunk_rows=DEFAULT_CHUNK_ROWS, n_components=DEFAULT_COMPONENTS,
+                 epochs=DEFAULT_EPOCHS, test_percent=DEFAULT_TEST_PERCENT, key_columns=None,
+                 alpha=1e-4, seed=42):
+        self.csv_path = csv_path
+        self.chunk_rows = chunk_rows
+        self.n_components = n_components
+        self.epochs = epochs
+        self.test_percent = test_percent
+        self.key_columns = key_columns
+        self.alpha = alpha
+        self.seed = seed
+        self.feature_names = None
+        self.scaler = None
+        self.sampler = None
+        self.classifiers = {}
+        self.counts = {'train': 0, 'test': 0}
+
+    def _split(self, chunk):
+        """(X_train, y_train, X_test, y_test) for one chunk"""
+        if self.feature_names is None:
+            # The clinical features in file order; IDs and other columns are not features
+            self.feature_names = [column for column in chunk.columns if column in FEATURE_CONSTRAINTS]
+            # Hash the whole feature row unless a patient key was given
+            self.key_columns = self.key_columns or self.feature_names
+        test = test_mask(chunk, self.key_columns, self.test_percent)
+        X = chunk[self.feature_names].to_numpy(dtype=float)
+        y = {target: chunk[target].to_numpy(dtype=int) for target in TARGETS}
+        return (X[~test], {t: y[t][~test] for t in TARGETS},
+                X[test], {t: y[t][test] for t in TARGETS})
+
+    def fit_scaler(self):
+        from sklearn.preprocessing import StandardScaler
+
+        self.scaler = StandardScaler()
+        for chunk in read_chunks(self.csv_path, self.chunk_rows):
+            X_train, _, X_test, _ = self._split(chunk)
+            if len(X_train):
+                self.scaler.partial_fit(X_train)
+            self.counts['train'] += len(X_train)
+            self.counts['test'] += len(X_test)
+        if not self.counts['train']:
+            raise ValueError(f"No training rows in {self.csv_path}")
+
+    def fit(self):
+        from sklearn.kernel_approximation import RBFSampler
+        from sklearn.linear_model import SGDClassifier
+
+        start = time.perf_counter()
+        self.fit_scaler()
+        # gamma='scale' on standardized features, as the SVMs use
+        self.sampler = RBFSampler(gamma=1.0 / len(self.feature_names),
+                                  n_components=self.n_components, random_state=self.seed)
+        self.sampler.fit(np.zeros((1, len(self.feature_names))))
+        self.classifiers = {
+            target: SGDClassifier(loss='log_loss', alpha=self.alpha, random_state=self.seed)
+            for target in TARGETS
+        }
+
+        rng = np.random.default_rng(self.seed)
+        for _ in range(self.epochs):
+            for chunk in read_chunks(self.csv_path, self.chunk_rows):
+                X_train, y_train, _, _ = self._split(chunk)
+                if not len(X_train):
+                    continue
+                order = rng.permutation(len(X_train))
+                Z = self.sampler.transform(self.scaler.transform(X_train[order]))
+                for target, classifier in self.classifiers.items():
+                    classifier.partial_fit(Z, y_train[target][order], classes=[0, 1])
+        return time.perf_counter() - start
+
+    def models(self):
+        """The trained models in the layout the serving code loads"""
+        from sklearn.pipeline import make_pipeline
+
+        models = {'scaler': self.scaler, 'feature_names': self.feature_names}
+        for target, classifier in self.classifiers.items():
+            # Takes scaled features, like the SVMs it stands in for
+            models[f'{target}_model'] = make_pipeline(self.sampler, classifier)
+        return models
+
+    def evaluate(self):
+        """Accuracy and log loss per target over the test split, streamed by chunk"""
+        models = self.models()
+        correct = {target: 0 for target in TARGETS}
+        log_loss = {target: 0.0 for target in TARGETS}
+        total = 0
+        for chunk in read_chunks(self.csv_path, self.chunk_rows):
+            _, _, X_test, y_test = self._split(chunk)
+            if not len(X_test):
+                continue
+            X_scaled = self.scaler.transform(X_test)
+            total += len(X_test)
+            for target in TARGETS:
+                probability = np.clip(models[f'{target}_model'].predict_proba(X_scaled)[:, 1], 1e-15, 1 - 1e-15)
+                y = y_test[target]
+                correct[target] += int(np.sum((probability >= 0.5) == (y == 1)))
+                log_loss[target] -= float(np.sum(y * np.log(probability) + (1 - y) * np.log(1 - probability)))
+        metrics = {'test_rows': total}
+        for target in TARGETS:
+            metrics[f'{target}_accuracy'] = correct[target] / total if total else None
+            metrics[f'{target}_log_loss'] = log_loss[target] / total if total else None
+        return metrics
+
+def main():
+    # Thread caps and chunk size from serving_config.json (see check_installation.py)
+    config = serving.load_config()
+    serving.apply_thread_limits(config)
+
+    parser = argparse.ArgumentParser(description='Train the treatment models from a CSV too large for memory')
+    parser.add_argument('--csv', default='new heart clinical.csv')
+    parser.add_argument('--output-dir', default='models_out_of_core')
+    parser.add_argument('--chunk-rows', type=int, default=config['training_chunk_rows'] or DEFAULT_CHUNK_ROWS,
+                        help='rows held in memory at a time')
+    parser.add_argument('--components', type=int, default=DEFAULT_COMPONENTS,
+                        help='random Fourier features approximating the RBF kernel')
+    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS)
+    parser.add_argument('--test-percent', type=int, default=DEFAULT_TEST_PERCENT)
+    parser.add_argument('--key', nargs='+', help='columns identifying a patient for the split (default: all features)')
+    args = parser.parse_args()
+
+    print("Out-of-Core Training")
+    print("=" * 60)
+    trainer = OutOfCoreTrainer(args.csv, args.chunk_rows, args.components, args.epochs,
+                               args.test_percent, args.key)
+    seconds = trainer.fit()
+    metrics = trainer.evaluate()
+    print(f"Trained on {trainer.counts['train']} rows in chunks of {args.chunk_rows} "
+          f"({args.epochs} epochs, {seconds:.1f}s)")
+    for target in TARGETS:
+        print(f"  {target}: accuracy {metrics[f'{target}_accuracy']:.3f}, "
+              f"log loss {metrics[f'{target}_log_loss']:.3f} on {metrics['test_rows']} test rows")
+
+    save_models(args.output_dir, trainer.models())
+    report = {
+        'csv': args.csv,
+        'rows': trainer.counts,
+        'chunk_rows': args.chunk_rows,
+        'components': args.components,
+        'epochs': args.epochs,
+        'test_percent': args.test_percent,
+        'key_columns': trainer.key_columns,
+        'training_seconds': seconds,
+        'peak_memory_mb': peak_rss_mb(),
+        'metrics': metrics
+    }
+    with open(os.path.join(args.output_dir, REPORT_FILE), 'w') as f:
+        json.dump(report, f, indent=2)
+    if report['peak_memory_mb'] is not None:
+        print(f"Peak memory: {report['peak_memory_mb']:.0f} MB")
+    print(f"\n✓ Models saved to {args.output_dir}/ (served as the 'out_of_core' model set)")
+
+if __name__ == "__main__":
+    main()
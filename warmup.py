@@ -0,0 +1,206 @@
+"""Start-up warm-up and readiness for the model servers.
+
+The first requests after load_models() pay for lazy library set-up,
+first-touch page faults on the model arrays and the BLAS thread pool
+starting.  Warm-up scores a set of representative patients through
+every loaded model before the server reports ready on /readyz.
+
+Write a stored warm-up file from the training CSV with:
+    python warmup.py --rows 32
+"""
+import argparse
+import csv
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from patient_schema import FEATURE_CONSTRAINTS
+
+logger = logging.getLogger(__name__)
+
+WARMUP_FILE = 'warmup_patients.csv'
+DEFAULT_CSV = 'new heart clinical.csv'
+
+# Patients scored per warm-up (0 turns warm-up off) and passes over them
+WARMUP_ROWS = int(os.environ.get('HEART_WARMUP_ROWS', '32'))
+WARMUP_PASSES = int(os.environ.get('HEART_WARMUP_PASSES', '3'))
+
+def warmup_path(models_dir='models'):
+    return os.path.join(models_dir, WARMUP_FILE)
+
+def read_features(path, feature_names):
+    """Feature matrix from a CSV with (at least) the named columns"""
+    with open(path, newline='') as f:
+        rows = [[float(row[name]) for name in feature_names] for row in csv.DictReader(f)]
+    return np.array(rows, dtype=float).reshape(-1, len(feature_names))
+
+def representative_rows(X, rows):
+    """Evenly spaced rows of X, so the sample spans the whole cohort"""
+    if len(X) <= rows:
+        return X
+    return X[np.linspace(0, len(X) - 1, rows).round().astype(int)]
+
+def midpoint_patient(feature_names):
+    """One in-range patient, used when there is no CSV to warm up from"""
+    row = []
+    for name in feature_names:
+        kind, lower, upper = FEATURE_CONSTRAINTS[name]
+        value = (lower + upper) / 2
+        row.append(round(value) if kind in ('int', 'binary') else value)
+    return np.array([row], dtype=float)
+
+def warmup_features(feature_names, models_dir='models', csv_path=DEFAULT_CSV, rows=WARMUP_ROWS):
+    """Patients to warm up with: the stored warm-up file, else rows of the training CSV.
+
+    Returns (features, source).
+    """
+    for path in (warmup_path(models_dir), csv_path):
+        if path and os.path.exists(path):
+            try:
+                return representative_rows(read_features(path, feature_names), rows), path
+            except (KeyError, ValueError) as e:
+                logger.error(f"Cannot read warm-up patients from {path}: {str(e)}")
+    return midpoint_patient(feature_names), 'midpoint'
+
+class Readiness:
+    """Warm-up state for one server process.
+
+    The server is ready once its models are loaded and a warm-up has
+    finished.  Later warm-ups (after a model reload) update the timings
+    without taking the server out of readiness.
+    """
+    def __init__(self):
+        self.ready = False
+        self.state = 'starting'
+        self.error = None
+        self.last = None
+        self.warmups = 0
+        self._lock = threading.Lock()
+
+    def run(self, scorers, X, passes=WARMUP_PASSES, source=None):
+        """Score X through each scorer; scorers maps model name -> func(features).
+
+        Each pass scores the patients one at a time and then as one batch,
+        so both the single-patient and batch code paths are exercised.
+        Returns the warm-up summary; a failing scorer marks the server
+        failed rather than ready.
+        """
+        with self._lock:
+            self.state = 'warming' if not self.ready else self.state
+        start = time.perf_counter()
+        models = {}
+        try:
+            for name, score in scorers.items():
+                model_start = time.perf_counter()
+                first = None
+                for _ in range(max(1, passes)):
+                    for i in range(len(X)):
+                        t = time.perf_counter()
+                        score(X[i:i + 1])
+                        if first is None:
+                            first = 1000 * (time.perf_counter() - t)
+                    score(X)
+                t = time.perf_counter()
+                score(X[:1])
+                models[name] = {
+                    'duration_ms': 1000 * (time.perf_counter() - model_start),
+                    'first_call_ms': first,
+                    'warm_call_ms': 1000 * (time.perf_counter() - t)
+                }
+        except Exception as e:
+            logger.error(f"Warm-up failed for {name}: {str(e)}")
+            with self._lock:
+                self.error = f"{name}: {str(e)}"
+                if not self.ready:
+                    self.state = 'failed'
+            return None
+
+        summary = {
+            'duration_ms': 1000 * (time.perf_counter() - start),
+            'patients': len(X),
+            'passes': max(1, passes),
+            'source': source,
+            'models': models,
+            'finished': datetime.now().isoformat()
+        }
+        with self._lock:
+            self.ready = True
+            self.state = 'ready'
+            self.error = None
+            self.last = summary
+            self.warmups += 1
+        logger.info(f"Warm-up of {len(models)} models on {len(X)} patients took {summary['duration_ms']:.1f} ms")
+        return summary
+
+    def reset(self):
+        """Not ready until the next warm-up, e.g. in a worker forked from a warmed-up master"""
+        with self._lock:
+            self.ready = False
+            self.state = 'starting'
+
+    def skip(self):
+        """Mark ready without warming up (HEART_WARMUP_ROWS=0)"""
+        with self._lock:
+            self.ready = True
+            self.state = 'ready'
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'state': self.state,
+                'error': self.error,
+                'warmups': self.warmups,
+                'last_warmup': self.last
+            }
+
+def install(app, readiness, is_loaded):
+    """Register /livez and /readyz; is_loaded() says whether models are loaded"""
+    from flask import jsonify
+
+    @app.route('/livez', methods=['GET'])
+    def liveness():
+        """The process is up and serving requests"""
+        return jsonify({'status': 'alive', 'timestamp': datetime.now().isoformat()})
+
+    @app.route('/readyz', methods=['GET'])
+    def readiness_check():
+        """Models are loaded and warmed up; 503 until then"""
+        stats = readiness.stats()
+        ready = bool(is_loaded()) and stats['ready']
+        body = {
+            'status': 'ready' if ready else 'not ready',
+            'models_loaded': bool(is_loaded()),
+            'state': stats['state'],
+            'error': stats['error'],
+            'warmup_ms': stats['last_warmup']['duration_ms'] if stats['last_warmup'] else None,
+            'timestamp': datetime.now().isoformat()
+        }
+        return jsonify(body), 200 if ready else 503
+
+def main():
+    import pickle
+
+    parser = argparse.ArgumentParser(description='Write the patients used to warm up the model servers')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--rows', type=int, default=WARMUP_ROWS)
+    args = parser.parse_args()
+
+    with open(os.path.join(args.models_dir, 'feature_names.pkl'), 'rb') as f:
+        feature_names = pickle.load(f)
+    X = representative_rows(read_features(args.csv, feature_names), args.rows)
+
+    path = warmup_path(args.models_dir)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(feature_names)
+        writer.writerows(X.tolist())
+    print(f"✓ {len(X)} warm-up patients written to {path}")
+
+if __name__ == "__main__":
+    main()
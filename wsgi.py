@@ -0,0 +1,45 @@
+"""Production entry point for the heart treatment prediction API.
+
+Linux/macOS (multi-worker, models preloaded and shared after fork):
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Windows (single process, multi-threaded):
+    python wsgi.py
+
+Set HEART_APP=app to serve app.py instead of simple_app.py.
+"""
+import importlib
+import logging
+
+import serving
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+config = serving.load_config()
+
+# Before the app (and NumPy) is imported, so BLAS starts with the capped pool
+serving.apply_thread_limits(config)
+
+# Load the models once; with gunicorn's preload_app every worker
+# inherits them from the master process and warms them up again in
+# post_fork (see gunicorn.conf.py)
+module = importlib.import_module(config['app'])
+if not module.predictor.load_models():
+    logger.warning("No pre-trained models found. Run simple_setup.py before serving.")
+
+application = module.app
+
+if __name__ == '__main__':
+    try:
+        from waitress import serve
+    except ImportError:
+        print("waitress is not installed. Please install it with:")
+        print("pip install waitress")
+        print("or on Linux/macOS run: gunicorn -c gunicorn.conf.py wsgi:application")
+        raise SystemExit(1)
+
+    serving.scoring_pool.start(config['scoring_processes'], config['scoring_timeout'])
+    host, port = config['bind'].rsplit(':', 1)
+    print(f"Serving {config['app']} on http://{host}:{port} with {config['threads']} threads")
+    serve(application, host=host, port=int(port), threads=config['threads'])